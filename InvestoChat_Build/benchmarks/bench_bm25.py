@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark: in-process BM25 index vs the pg_trgm lexical query.
+
+Offline (always): build time, incremental segment add, save/load and
+per-query latency over a synthetic brochure-like corpus.
+
+With DATABASE_URL set: the same queries through the BM25 index built from
+`documents` and through the trigram ILIKE/word_similarity statement used by
+the hybrid mode's lexical branch.
+
+Usage:
+    python benchmarks/bench_bm25.py
+    python benchmarks/bench_bm25.py --docs 50000 --repeat 50
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+HERE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(HERE))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv(HERE / ".env")
+
+from retrieval.bm25 import BM25Index, LexicalIndex, TABLES  # noqa: E402
+
+QUERIES = [
+    "payment plan construction linked",
+    "clubhouse amenities swimming pool",
+    "possession date tower B",
+    "3 BHK carpet area sq ft",
+    "distance to metro and expressway",
+]
+
+VOCAB = (
+    "payment plan clp plp possession construction linked tower unit bhk carpet area sq ft price "
+    "booking amount clubhouse pool gym amenities metro expressway airport school hospital rera "
+    "floor plan balcony parking lift lobby garden jogging track security power backup"
+).split()
+
+
+def _corpus(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    for i in range(n):
+        words = rng.choice(VOCAB, size=int(rng.integers(40, 200)))
+        yield i + 1, int(rng.integers(1, 20)), (" ".join(words), int(rng.integers(1, 40)), None, f"{i % 50}.pdf")
+
+
+def _median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def bench_offline(n: int, repeat: int) -> None:
+    rows = list(_corpus(n))
+    index = BM25Index()
+    start = time.perf_counter()
+    index.add(rows[: n - n // 10])
+    print(f"build {n - n // 10} docs: {(time.perf_counter() - start) * 1000:.0f} ms, {len(index.vocab)} terms")
+    print(f"add segment of {n // 10} docs: {_median_ms(lambda: index.add(rows[n - n // 10:]), 1):.0f} ms")
+    for q in QUERIES:
+        print(f"  {q:<36} {_median_ms(lambda: index.search(q, 48), repeat):>8.3f} ms"
+              f"  (project: {_median_ms(lambda: index.search(q, 48, project=3), repeat):.3f} ms)")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bm25_documents.npz"
+        save_ms = _median_ms(lambda: index.save(path), 1)
+        load_ms = _median_ms(lambda: BM25Index.load(path), 3)
+        print(f"save {save_ms:.0f} ms ({path.stat().st_size / 1e6:.1f} MB), load {load_ms:.0f} ms")
+
+
+def bench_db(repeat: int) -> None:
+    from main import keyword_terms
+    from utils.db import _pg
+
+    index = LexicalIndex({"documents": TABLES["documents"]}, directory=Path(tempfile.mkdtemp()))
+    start = time.perf_counter()
+    index.refresh(save=False)
+    print(f"\nbuild from documents: {(time.perf_counter() - start) * 1000:.0f} ms")
+    sql = """
+        SELECT id FROM (
+            SELECT id, word_similarity(%s, text) AS sim FROM documents WHERE text ILIKE ANY(%s)
+            ORDER BY sim DESC LIMIT 48
+        ) s
+    """
+    print(f"{'query':<36} {'trigram ms':>11} {'bm25 ms':>9}")
+    with _pg() as con, con.cursor() as cur:
+        for q in QUERIES:
+            terms = keyword_terms(q) or [q]
+            params = (" ".join(terms), [f"%{t}%" for t in terms])
+            trgm = _median_ms(lambda: cur.execute(sql, params).fetchall(), repeat)
+            bm25 = _median_ms(lambda: index.search_ids("documents", q, 48), repeat)
+            print(f"{q:<36} {trgm:>11.2f} {bm25:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the in-process BM25 index")
+    parser.add_argument("--docs", type=int, default=20_000, help="Synthetic documents")
+    parser.add_argument("--repeat", type=int, default=30, help="Runs per query")
+    args = parser.parse_args()
+
+    bench_offline(args.docs, args.repeat)
+    if os.getenv("DATABASE_URL"):
+        bench_db(args.repeat)
+    else:
+        print("DATABASE_URL not set; offline numbers only")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark: hybrid (vector + trigram, RRF-fused in one statement) retrieval vs
+the sequential chain (vector search, then trigram, then ILIKE OCR fallbacks).
+
+Runs every query in workspace/test_queries.json through both modes with the
+caches bypassed. Query embeddings are computed once up front (and come from
+the embedding store on re-runs), so the timings compare database work + MMR.
+
+Usage:
+    python benchmarks/bench_hybrid.py
+    python benchmarks/bench_hybrid.py --repeat 5 --category payment
+"""
+
+import sys
+import json
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(HERE))
+
+from main import _embed, _retrieve_uncached, schema_registry, project_directory  # noqa: E402
+
+TEST_QUERIES_PATH = HERE / "workspace" / "test_queries.json"
+
+
+def _pages(result: dict) -> set:
+    return {(m.get("source"), m.get("page")) for m in result.get("metas", [])}
+
+
+def _keyword_hit(result: dict, keywords) -> bool:
+    text = " ".join(result.get("answers", [])).lower()
+    return all(kw.lower() in text for kw in keywords) if keywords else True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hybrid RRF retrieval against the sequential fallback chain")
+    parser.add_argument("--category", type=str, help="Only queries of this category")
+    parser.add_argument("-k", type=int, default=3, help="Top-k")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per query and mode (median reported)")
+    args = parser.parse_args()
+
+    queries = json.loads(TEST_QUERIES_PATH.read_text(encoding="utf-8"))["queries"]
+    if args.category:
+        queries = [q for q in queries if q["category"] == args.category]
+    if not queries:
+        raise SystemExit("no queries to run")
+
+    schema_registry.refresh()
+    project_directory.refresh()
+    vectors = _embed([q["query"] for q in queries])
+
+    stats = {mode: {"ms": [], "keyword_hits": 0, "modes": {}} for mode in ("vector", "hybrid")}
+    overlaps = []
+    for qd, qvec in zip(queries, vectors):
+        results = {}
+        for mode in ("vector", "hybrid"):
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results[mode] = _retrieve_uncached(qd["query"], k=args.k, project_id=qd.get("project_id"),
+                                                   qvec=qvec, retrieval_mode=mode)
+                samples.append((time.perf_counter() - start) * 1000)
+            st = stats[mode]
+            st["ms"].append(statistics.median(samples))
+            st["keyword_hits"] += _keyword_hit(results[mode], qd.get("expected_keywords", []))
+            st["modes"][results[mode]["mode"]] = st["modes"].get(results[mode]["mode"], 0) + 1
+        a, b = _pages(results["vector"]), _pages(results["hybrid"])
+        overlaps.append(len(a & b) / max(1, len(a | b)))
+
+    n = len(queries)
+    print(f"{'mode':>8} {'p50 ms':>9} {'p95 ms':>9} {'keyword hits':>14}  result modes")
+    print("-" * 70)
+    for mode, st in stats.items():
+        ms = sorted(st["ms"])
+        p95 = ms[min(len(ms) - 1, int(0.95 * len(ms)))]
+        print(f"{mode:>8} {statistics.median(ms):>9.1f} {p95:>9.1f} {st['keyword_hits']:>7d}/{n:<6d}  {st['modes']}")
+    print(f"\nmean Jaccard overlap of returned pages: {statistics.mean(overlaps):.2f}")
+
+
+if __name__ == "__main__":
+    main()
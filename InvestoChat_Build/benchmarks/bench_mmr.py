@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: vectorized MMR (main.mmr) vs the original per-round rescoring loop.
+
+Candidates are built from the OCR page dumps under outputs/*/*.jsonl the same
+way the OCR SQL path builds them (prev + cur + next page text).
+
+Usage:
+    python benchmarks/bench_mmr.py                    # n = 24, 48, 96, 500
+    python benchmarks/bench_mmr.py --sizes 96 --repeat 50
+    python benchmarks/bench_mmr.py --intent payment
+"""
+
+import sys
+import json
+import random
+import argparse
+import statistics
+import time
+from pathlib import Path
+from typing import List, Optional
+
+HERE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(HERE))
+
+from main import mmr, score, tokenize  # noqa: E402
+
+QUESTION = "What is the payment plan and possession timeline for 3 BHK units?"
+
+
+def _sim_token_overlap(si: set, sj: set) -> float:
+    inter = len(si & sj)
+    return inter / max(1, min(len(si), len(sj)))
+
+
+def legacy_mmr(documents, metadatas, qtokens, lambda_=0.75, topk=3, intent: Optional[str] = None):
+    """The pre-vectorization implementation, kept verbatim for comparison."""
+    cand = list(range(len(documents)))
+    selected = []
+    token_sets = [set(d.lower().split()) for d in documents]
+    while cand and len(selected) < topk:
+        best, best_s = None, -1e9
+        for i in cand:
+            rel = score(documents[i], metadatas[i], qtokens, intent=intent)
+            div = 0 if not selected else max(_sim_token_overlap(token_sets[i], token_sets[j]) for j in selected)
+            s = lambda_ * rel - (1 - lambda_) * div
+            if s > best_s:
+                best, best_s = i, s
+        selected.append(best)
+        cand.remove(best)
+    return [documents[i] for i in selected], [metadatas[i] for i in selected]
+
+
+def load_pages() -> List[dict]:
+    pages = []
+    for fp in sorted((HERE / "outputs").glob("*/*.jsonl")):
+        with open(fp, "r", encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    pages.append(json.loads(line))
+    return pages
+
+
+def build_candidates(pages: List[dict], n: int, seed: int = 7):
+    rng = random.Random(seed)
+    docs, metas = [], []
+    for _ in range(n):
+        i = rng.randrange(len(pages))
+        window = pages[max(0, i - 1): i + 2]
+        docs.append(" ".join(p.get("text", "") for p in window))
+        metas.append({"source": pages[i].get("pdf"), "page": pages[i].get("page"), "score": 0.0})
+    return docs, metas
+
+
+def _time(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized MMR against the legacy loop")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[24, 48, 96, 500], help="Candidate counts")
+    parser.add_argument("-k", type=int, default=5, help="Top-k to select")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per measurement (median reported)")
+    parser.add_argument("--intent", type=str, default="payment", help="Intent tag passed to score()")
+    args = parser.parse_args()
+
+    pages = load_pages()
+    if not pages:
+        raise SystemExit("no OCR pages found under outputs/")
+    qtokens = tokenize(QUESTION)
+    intent = args.intent or None
+
+    print(f"{'n':>6} {'legacy ms':>12} {'vectorized ms':>15} {'speedup':>9}  same")
+    print("-" * 52)
+    for n in args.sizes:
+        docs, metas = build_candidates(pages, n)
+        old = legacy_mmr(docs, metas, qtokens, topk=args.k, intent=intent)
+        new = mmr(docs, metas, qtokens, topk=args.k, intent=intent)
+        same = old[1] == new[1]
+        t_old = _time(lambda: legacy_mmr(docs, metas, qtokens, topk=args.k, intent=intent), args.repeat)
+        t_new = _time(lambda: mmr(docs, metas, qtokens, topk=args.k, intent=intent), args.repeat)
+        print(f"{n:>6} {t_old:>12.2f} {t_new:>15.2f} {t_old / t_new:>8.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
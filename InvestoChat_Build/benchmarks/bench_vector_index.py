@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Benchmark: pgvector ANN search (hnsw.ef_search / ivfflat.probes sweep) vs exact search.
+
+For each table, the current vector index is queried with every parameter
+value; recall@k is measured against an exact scan (index scans disabled) on
+the same query vectors, along with median latency. The measured curve is
+written to workspace/index_calibration.json, which retrieval uses to map a
+requested recall_target to the cheapest parameter that reaches it.
+
+Queries are the workspace/test_queries.json questions plus --sample stored
+embeddings from the table itself.
+
+Usage:
+    python benchmarks/bench_vector_index.py
+    python benchmarks/bench_vector_index.py --table documents -k 24 --sample 100
+    python benchmarks/bench_vector_index.py --no-save
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import statistics
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+import psycopg
+
+HERE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(HERE))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv(HERE / ".env")
+
+from retrieval.vector_index import CALIBRATION_PATH, VECTOR_TABLES  # noqa: E402
+from utils.ai import _embed  # noqa: E402
+from utils.vector import register_vector, to_vector  # noqa: E402
+
+TEST_QUERIES_PATH = HERE / "workspace" / "test_queries.json"
+EF_SEARCH_SWEEP = [10, 20, 40, 80, 120, 200, 400]
+
+
+def _query_vectors(cur, table: str, sample: int) -> List[np.ndarray]:
+    vecs = []
+    if TEST_QUERIES_PATH.exists():
+        queries = json.loads(TEST_QUERIES_PATH.read_text(encoding="utf-8"))["queries"]
+        vecs += [to_vector(v) for v in _embed([q["query"] for q in queries])]
+    if sample:
+        cur.execute(f"SELECT embedding FROM {table} WHERE embedding IS NOT NULL ORDER BY random() LIMIT %s", (sample,))
+        vecs += [r[0] for r in cur.fetchall()]
+    return vecs
+
+
+def _search(con, table: str, qvec: np.ndarray, k: int, settings) -> List[int]:
+    with con.transaction(), con.cursor() as cur:
+        for name, value in settings:
+            cur.execute("SELECT set_config(%s, %s, true)", (name, str(value)))
+        cur.execute(
+            f"SELECT id FROM {table} WHERE embedding IS NOT NULL ORDER BY embedding <=> %s::vector LIMIT %s",
+            (qvec, k),
+        )
+        return [r[0] for r in cur.fetchall()]
+
+
+def _index(cur, table: str):
+    cur.execute(
+        "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexdef ~* 'USING (hnsw|ivfflat)'", (table,)
+    )
+    row = cur.fetchone()
+    if not row:
+        return None, None
+    definition = row[0]
+    if "hnsw" in definition.lower():
+        return "hnsw", None
+    m = re.search(r"lists\s*=\s*'?(\d+)", definition)
+    return "ivfflat", int(m.group(1)) if m else 100
+
+
+def bench_table(con, table: str, k: int, sample: int, repeat: int):
+    with con.cursor() as cur:
+        method, lists = _index(cur, table)
+        if method is None:
+            print(f"[{table}] no vector index; skipped")
+            return None
+        qvecs = _query_vectors(cur, table, sample)
+    if not qvecs:
+        print(f"[{table}] no query vectors; skipped")
+        return None
+
+    exact_settings = [("enable_indexscan", "off"), ("enable_bitmapscan", "off")]
+    truth = [set(_search(con, table, q, k, exact_settings)) for q in qvecs]
+
+    if method == "hnsw":
+        param, sweep = "hnsw.ef_search", [v for v in EF_SEARCH_SWEEP if v >= k] or [k]
+    else:
+        param = "ivfflat.probes"
+        sweep = sorted({max(1, int(lists * f)) for f in (0.01, 0.02, 0.05, 0.1, 0.2, 0.35, 0.5, 1.0)})
+
+    print(f"\n[{table}] {method} ({len(qvecs)} queries, k={k})")
+    print(f"{param:>16} {'recall@k':>10} {'p50 ms':>9}")
+    points = []
+    for value in sweep:
+        recalls, samples = [], []
+        for q, exact in zip(qvecs, truth):
+            for _ in range(repeat):
+                start = time.perf_counter()
+                got = _search(con, table, q, k, [(param, value)])
+                samples.append((time.perf_counter() - start) * 1000)
+            recalls.append(len(exact & set(got)) / max(1, len(exact)))
+        recall, p50 = statistics.mean(recalls), statistics.median(samples)
+        points.append([value, round(recall, 4), round(p50, 2)])
+        print(f"{value:>16} {recall:>10.3f} {p50:>9.2f}")
+    return {"method": method, "param": param, "k": k, "points": points}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep pgvector search parameters against exact search")
+    parser.add_argument("--table", choices=[*VECTOR_TABLES, "all"], default="all")
+    parser.add_argument("-k", type=int, default=24, help="LIMIT used for recall@k (retrieval overfetch)")
+    parser.add_argument("--sample", type=int, default=50, help="Stored embeddings added as extra queries")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per query and parameter value")
+    parser.add_argument("--no-save", action="store_true", help="Do not write the calibration file")
+    args = parser.parse_args()
+
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        raise SystemExit("DATABASE_URL not set")
+    tables = list(VECTOR_TABLES) if args.table == "all" else [args.table]
+
+    calibration = {}
+    with psycopg.connect(url, autocommit=True) as con:
+        register_vector(con)
+        for table in tables:
+            with con.cursor() as cur:
+                cur.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+                if not cur.fetchone()[0]:
+                    continue
+            result = bench_table(con, table, args.k, args.sample, args.repeat)
+            if result:
+                calibration[table] = result
+
+    if calibration and not args.no_save:
+        existing = json.loads(CALIBRATION_PATH.read_text(encoding="utf-8")) if CALIBRATION_PATH.exists() else {}
+        existing.update(calibration)
+        CALIBRATION_PATH.parent.mkdir(parents=True, exist_ok=True)
+        CALIBRATION_PATH.write_text(json.dumps(existing, indent=2), encoding="utf-8")
+        print(f"\ncalibration written to {CALIBRATION_PATH}")
+
+
+if __name__ == "__main__":
+    main()
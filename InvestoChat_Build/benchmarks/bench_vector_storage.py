@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark: compact ANN storage modes (halfvec / bit / sub256 / sub512) with
+full-precision rerank vs the full float32 index.
+
+For every table and every storage mode that has an index (build them with
+`manage_indexes.py compact`), the retrieval statement from nearest_sql() is
+run for the same query vectors; recall@k is measured against an exact scan,
+together with median latency and the on-disk index size.
+
+Usage:
+    python benchmarks/bench_vector_storage.py
+    python benchmarks/bench_vector_storage.py --table documents -k 12 --rerank-factor 4 8
+"""
+
+import sys
+import json
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(HERE))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv(HERE / ".env")
+
+import retrieval.vector_index as vi  # noqa: E402
+from utils.ai import _embed  # noqa: E402
+from utils.db import _pg  # noqa: E402
+from utils.schema import schema_registry  # noqa: E402
+from utils.vector import to_vector  # noqa: E402
+
+TEST_QUERIES_PATH = HERE / "workspace" / "test_queries.json"
+
+
+def _query_vectors(cur, table: str, sample: int):
+    vecs = []
+    if TEST_QUERIES_PATH.exists():
+        queries = json.loads(TEST_QUERIES_PATH.read_text(encoding="utf-8"))["queries"]
+        vecs += [to_vector(v) for v in _embed([q["query"] for q in queries])]
+    if sample:
+        cur.execute(f"SELECT embedding FROM {table} WHERE embedding IS NOT NULL ORDER BY random() LIMIT %s", (sample,))
+        vecs += [r[0] for r in cur.fetchall()]
+    return vecs
+
+
+def _ids(con, table: str, qvec, k: int, settings) -> list:
+    sql = "WITH q AS MATERIALIZED (SELECT %s::vector AS v) " + vi.nearest_sql(
+        table, "id", "embedding IS NOT NULL", "(SELECT v FROM q)", k
+    )
+    with con.transaction(), con.cursor() as cur:
+        for name, value in settings:
+            cur.execute("SELECT set_config(%s, %s, true)", (name, str(value)))
+        cur.execute(sql, (qvec, k))
+        return [r[0] for r in cur.fetchall()]
+
+
+def _index_mb(cur, name: str) -> float:
+    cur.execute("SELECT pg_relation_size(to_regclass(%s))", (name,))
+    return (cur.fetchone()[0] or 0) / 1024 / 1024
+
+
+def bench_table(con, table: str, k: int, sample: int, repeat: int, factors) -> None:
+    indexes = vi.vector_indexes(table)
+    if not indexes:
+        print(f"[{table}] no vector index; skipped")
+        return
+    with con.cursor() as cur:
+        qvecs = _query_vectors(cur, table, sample)
+        sizes = {mode: _index_mb(cur, info["name"]) for mode, info in indexes.items()}
+    if not qvecs:
+        print(f"[{table}] no query vectors; skipped")
+        return
+
+    vi.VECTOR_STORAGE = "full"
+    exact = [("enable_indexscan", "off"), ("enable_bitmapscan", "off")]
+    truth = [set(_ids(con, table, q, k, exact)) for q in qvecs]
+
+    print(f"\n[{table}] {len(qvecs)} queries, k={k}")
+    print(f"{'mode':>8} {'rerank':>7} {'bytes/vec':>10} {'index MB':>9} {'recall@k':>9} {'p50 ms':>8}")
+    for mode in indexes:
+        for factor in (factors if mode != "full" else [1]):
+            vi.VECTOR_STORAGE, vi.VECTOR_RERANK_FACTOR = mode, factor
+            settings = vi.search_settings((table,), k)
+            recalls, samples = [], []
+            for q, want in zip(qvecs, truth):
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    got = _ids(con, table, q, k, settings)
+                    samples.append((time.perf_counter() - start) * 1000)
+                recalls.append(len(want & set(got)) / max(1, len(want)))
+            print(f"{mode:>8} {factor:>7} {vi.STORAGE_MODES[mode].bytes_per_vector:>10} {sizes[mode]:>9.1f} "
+                  f"{statistics.mean(recalls):>9.3f} {statistics.median(samples):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare compact ANN storage modes against the full index")
+    parser.add_argument("--table", choices=[*vi.VECTOR_TABLES, "all"], default="all")
+    parser.add_argument("-k", type=int, default=12)
+    parser.add_argument("--sample", type=int, default=50, help="Stored embeddings added as extra queries")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--rerank-factor", type=int, nargs="+", default=[vi.VECTOR_RERANK_FACTOR])
+    args = parser.parse_args()
+
+    schema_registry.refresh()
+    tables = list(vi.VECTOR_TABLES) if args.table == "all" else [args.table]
+    with _pg() as con:
+        for table in tables:
+            if schema_registry.has_table(table):
+                bench_table(con, table, args.k, args.sample, args.repeat, args.rerank_factor)
+
+
+if __name__ == "__main__":
+    main()
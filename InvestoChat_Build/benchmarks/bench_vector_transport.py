@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark: pgvector parameters as `%.8f` text vs the binary float32 adapter.
+
+Client side (always): cost of turning one 1536-d query vector, and a 10k-row
+batch, into a bound parameter.
+
+With DATABASE_URL set: one nearest-neighbour query against `documents` and a
+10k-row executemany into a TEMP table, each run with text parameters
+(the old `_to_pgvector` path) and with binary parameters.
+
+Usage:
+    python benchmarks/bench_vector_transport.py
+    python benchmarks/bench_vector_transport.py --rows 10000 --dim 1536 --repeat 20
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+import psycopg
+
+HERE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(HERE))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv(HERE / ".env")
+
+from utils.vector import register_vector, to_pgvector_binary, to_vector  # noqa: E402
+
+
+def _text(vec) -> str:
+    # The serialization previously duplicated across main.py and the ingest scripts
+    return "[" + ",".join(f"{x:.8f}" for x in vec) + "]"
+
+
+def _median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _row(label: str, text_ms: float, binary_ms: float) -> None:
+    print(f"{label:<34} {text_ms:>10.2f} {binary_ms:>10.2f} {text_ms / max(binary_ms, 1e-9):>8.1f}x")
+
+
+def bench_client(vectors, repeat: int) -> None:
+    one = vectors[0].tolist()
+    batch = [v.tolist() for v in vectors]
+    _row("encode 1 vector", _median_ms(lambda: _text(one), repeat),
+         _median_ms(lambda: to_pgvector_binary(to_vector(one)), repeat))
+    _row(f"encode {len(batch)} vectors", _median_ms(lambda: [_text(v) for v in batch], 3),
+         _median_ms(lambda: [to_pgvector_binary(to_vector(v)) for v in batch], 3))
+    size_text, size_bin = len(_text(one)), len(to_pgvector_binary(one))
+    print(f"{'bytes per vector':<34} {size_text:>10d} {size_bin:>10d}")
+
+
+def bench_db(url: str, vectors, repeat: int) -> None:
+    dim = vectors.shape[1]
+    with psycopg.connect(url, autocommit=True) as con:
+        if not register_vector(con):
+            print("vector extension not installed; skipping database runs")
+            return
+        with con.cursor() as cur:
+            cur.execute("SELECT to_regclass('documents') IS NOT NULL")
+            if cur.fetchone()[0]:
+                sql = "SELECT id FROM documents ORDER BY embedding <=> %s::vector LIMIT 12"
+                q = vectors[0]
+                _row("1 query (documents, k=12)",
+                     _median_ms(lambda: cur.execute(sql, (_text(q.tolist()),)).fetchall(), repeat),
+                     _median_ms(lambda: cur.execute(sql, (to_vector(q.tolist()),)).fetchall(), repeat))
+
+            cur.execute(f"CREATE TEMP TABLE bench_vectors (id int, embedding vector({dim}))")
+            insert = "INSERT INTO bench_vectors (id, embedding) VALUES (%s, %s::vector)"
+            batch = [v.tolist() for v in vectors]
+
+            def ingest(encode):
+                cur.execute("TRUNCATE bench_vectors")
+                cur.executemany(insert, [(i, encode(v)) for i, v in enumerate(batch)])
+
+            _row(f"ingest {len(batch)} rows", _median_ms(lambda: ingest(_text), 3),
+                 _median_ms(lambda: ingest(to_vector), 3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark text vs binary pgvector parameters")
+    parser.add_argument("--rows", type=int, default=10_000, help="Rows in the ingest batch")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per single-vector measurement")
+    args = parser.parse_args()
+
+    vectors = np.random.default_rng(0).standard_normal((args.rows, args.dim)).astype(np.float32)
+    print(f"{'':<34} {'text ms':>10} {'binary ms':>10} {'speedup':>9}")
+    print("-" * 66)
+    bench_client(vectors, args.repeat)
+    url = os.getenv("DATABASE_URL")
+    if url:
+        bench_db(url, vectors, args.repeat)
+    else:
+        print("DATABASE_URL not set; client-side numbers only")
+
+
+if __name__ == "__main__":
+    main()
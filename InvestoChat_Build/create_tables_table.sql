@@ -29,7 +29,7 @@ CREATE INDEX IF NOT EXISTS idx_document_tables_project ON document_tables(projec
 CREATE INDEX IF NOT EXISTS idx_document_tables_type ON document_tables(table_type);
 CREATE INDEX IF NOT EXISTS idx_document_tables_source ON document_tables(source_path);
 CREATE INDEX IF NOT EXISTS idx_document_tables_embedding ON document_tables
-    USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
+    USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
 
 -- Composite index for project + type queries
 CREATE INDEX IF NOT EXISTS idx_document_tables_project_type ON document_tables(project_id, table_type);
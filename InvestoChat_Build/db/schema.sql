@@ -1,6 +1,7 @@
 -- Core schema for InvestoChat brochure ingestion + retrieval
 
 CREATE EXTENSION IF NOT EXISTS vector;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 CREATE TABLE IF NOT EXISTS projects (
     id          SERIAL PRIMARY KEY,
@@ -39,7 +40,11 @@ CREATE TABLE IF NOT EXISTS documents (
 );
 
 CREATE INDEX IF NOT EXISTS idx_documents_project ON documents(project_id);
-CREATE INDEX IF NOT EXISTS idx_documents_embedding ON documents USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
+-- HNSW needs no training data, so it is safe to create on an empty table
+-- (existing ivfflat indexes: python manage_indexes.py hnsw --table documents)
+CREATE INDEX IF NOT EXISTS idx_documents_embedding ON documents USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+-- Lexical candidates for hybrid retrieval (ILIKE prefilter + word_similarity ranking)
+CREATE INDEX IF NOT EXISTS idx_documents_text_trgm ON documents USING gin (text gin_trgm_ops);
 
 CREATE TABLE IF NOT EXISTS facts (
     id          BIGSERIAL PRIMARY KEY,
@@ -53,4 +58,32 @@ CREATE TABLE IF NOT EXISTS facts (
 );
 
 CREATE UNIQUE INDEX IF NOT EXISTS idx_facts_project_key ON facts(project_id, key);
-CREATE INDEX IF NOT EXISTS idx_facts_embedding ON facts USING ivfflat (embedding vector_cosine_ops) WITH (lists = 50);
+CREATE INDEX IF NOT EXISTS idx_facts_embedding ON facts USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+
+-- Page-level OCR text: the SQL fallback when vector search finds nothing
+CREATE TABLE IF NOT EXISTS ocr_pages (
+    id          BIGSERIAL PRIMARY KEY,
+    source_pdf  TEXT NOT NULL,
+    page        INTEGER NOT NULL,
+    text        TEXT NOT NULL,
+    project     TEXT,
+    tags        TEXT,
+    prev_page   INTEGER,
+    next_page   INTEGER,
+    created_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Tables created before these columns existed
+ALTER TABLE ocr_pages ADD COLUMN IF NOT EXISTS prev_page INTEGER;
+ALTER TABLE ocr_pages ADD COLUMN IF NOT EXISTS next_page INTEGER;
+ALTER TABLE ocr_pages ADD COLUMN IF NOT EXISTS tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(text, ''))) STORED;
+
+-- One row per page; also the join key for neighbour pages (setup_db.py ocr-windows)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_ocr_pages_source_page ON ocr_pages(source_pdf, page);
+-- ILIKE '%term%' and word-similarity (<%) matches
+CREATE INDEX IF NOT EXISTS idx_ocr_pages_text_trgm ON ocr_pages USING gin (text gin_trgm_ops);
+-- Full-text matches (tsv @@ websearch_to_tsquery(...))
+CREATE INDEX IF NOT EXISTS idx_ocr_pages_tsv ON ocr_pages USING gin (tsv);
+CREATE INDEX IF NOT EXISTS idx_ocr_pages_project ON ocr_pages(project);
+CREATE INDEX IF NOT EXISTS idx_ocr_pages_tags ON ocr_pages(tags);
@@ -9,10 +9,12 @@ Usage:
     python evaluate.py --category payment       # Test only payment queries
     python evaluate.py --save results.json      # Save detailed results
     python evaluate.py --verbose                # Show detailed output
+    python evaluate.py --retrieval-mode hybrid  # Vector + trigram RRF fusion
 """
 
 import os
 import json
+import time
 import argparse
 from pathlib import Path
 from datetime import datetime
@@ -38,13 +40,14 @@ def load_test_queries() -> Dict[str, Any]:
         return json.load(f)
 
 
-def evaluate_query(query_data: Dict[str, Any], verbose: bool = False) -> Dict[str, Any]:
+def evaluate_query(query_data: Dict[str, Any], verbose: bool = False, retrieve_opts: Dict[str, Any] = None) -> Dict[str, Any]:
     """
     Evaluate a single query.
 
     Args:
         query_data: Query specification from test_queries.json
         verbose: Print detailed output
+        retrieve_opts: Extra keyword arguments for retrieve() (e.g. diversity)
 
     Returns:
         Evaluation results dictionary
@@ -65,7 +68,9 @@ def evaluate_query(query_data: Dict[str, Any], verbose: bool = False) -> Dict[st
 
     # Run retrieval
     try:
-        result = retrieve(query, k=3, project_id=project_id)
+        start = time.perf_counter()
+        result = retrieve(query, k=3, project_id=project_id, **(retrieve_opts or {}))
+        latency_ms = (time.perf_counter() - start) * 1000
         mode = result.get("mode", "empty")
         answers = result.get("answers", [])
         metas = result.get("metas", [])
@@ -91,6 +96,7 @@ def evaluate_query(query_data: Dict[str, Any], verbose: bool = False) -> Dict[st
             print(f"  Mode: {mode} (expected: {expected_mode}) {'✓' if mode_match else '✗'}")
             print(f"  Top Score: {top_score:.3f} (min: {expected_min_score}) {'✓' if score_ok else '✗'}")
             print(f"  Keywords: {len(keywords_found)}/{len(expected_keywords)} {'✓' if keyword_ok else '✗'}")
+            print(f"  Latency: {latency_ms:.1f} ms")
             print(f"  Found: {keywords_found}")
             print(f"  Status: {'PASS ✓' if passed else 'FAIL ✗'}")
 
@@ -120,6 +126,7 @@ def evaluate_query(query_data: Dict[str, Any], verbose: bool = False) -> Dict[st
             "keyword_coverage": keyword_coverage,
             "keyword_ok": keyword_ok,
             "num_results": len(answers),
+            "latency_ms": latency_ms,
         }
 
     except Exception as e:
@@ -164,6 +171,7 @@ def print_summary(results: List[Dict[str, Any]], test_data: Dict[str, Any]):
     # Score statistics
     scores = [r.get("top_score", 0) for r in results if "top_score" in r]
     avg_top_score = sum(scores) / len(scores) if scores else 0.0
+    latencies = sorted(r["latency_ms"] for r in results if "latency_ms" in r)
 
     print("\n" + "="*80)
     print("EVALUATION SUMMARY")
@@ -172,6 +180,9 @@ def print_summary(results: List[Dict[str, Any]], test_data: Dict[str, Any]):
     print(f"  ✓ Passed: {passed}")
     print(f"  ✗ Failed: {failed}")
     print(f"  Average Top Score: {avg_top_score:.3f}")
+    if latencies:
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"  Retrieval Latency: avg {sum(latencies) / len(latencies):.1f} ms, p95 {p95:.1f} ms")
 
     print(f"\nBy Category:")
     for cat, stats in sorted(category_stats.items()):
@@ -210,8 +221,19 @@ def main():
     parser.add_argument("--query-id", type=int, help="Test only specific query ID")
     parser.add_argument("--save", type=str, help="Save results to file (e.g., results.json)")
     parser.add_argument("--verbose", "-v", action="store_true", help="Show detailed output")
+    parser.add_argument("--diversity", choices=["tokens", "embedding"], help="MMR diversity signal to evaluate")
+    parser.add_argument("--retrieval-mode", choices=["vector", "hybrid", "bm25"], help="Candidate generation to evaluate")
+    parser.add_argument("--recall-target", type=float, help="ANN recall target (sets hnsw.ef_search / ivfflat.probes)")
     args = parser.parse_args()
 
+    retrieve_opts = {}
+    if args.diversity:
+        retrieve_opts["diversity"] = args.diversity
+    if args.retrieval_mode:
+        retrieve_opts["retrieval_mode"] = args.retrieval_mode
+    if args.recall_target:
+        retrieve_opts["recall_target"] = args.recall_target
+
     # Load test queries
     test_data = load_test_queries()
     queries = test_data["queries"]
@@ -235,7 +257,7 @@ def main():
 
     results = []
     for query_data in queries:
-        result = evaluate_query(query_data, verbose=args.verbose)
+        result = evaluate_query(query_data, verbose=args.verbose, retrieve_opts=retrieve_opts)
         results.append(result)
 
         # Show progress in non-verbose mode
@@ -11,6 +11,7 @@ from typing import List
 from dotenv import load_dotenv
 
 from table_processor import process_text_with_tables, get_table_summary
+from utils.vector import register_vector, to_vector
 
 load_dotenv()
 
@@ -19,15 +20,9 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 
 def _embed_texts(texts: List[str]) -> List[List[float]]:
-    """Generate embeddings for table summaries"""
-    from openai import OpenAI
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    resp = client.embeddings.create(model="text-embedding-3-small", input=texts)
-    return [d.embedding for d in resp.data]
-
-
-def _to_pgvector(vec: List[float]) -> str:
-    return "[" + ",".join(f"{x:.8f}" for x in vec) + "]"
+    """Generate embeddings for table summaries (unchanged summaries come from the embedding store)"""
+    from utils.ai import _embed
+    return _embed(texts)
 
 
 def create_tables_table():
@@ -125,6 +120,7 @@ def extract_tables_from_ocr():
 
         # Insert tables
         with psycopg.connect(DATABASE_URL) as conn:
+            register_vector(conn)
             with conn.cursor() as cur:
                 for table, embedding in zip(result['tables'], embeddings):
                     summary = get_table_summary(table)
@@ -147,7 +143,7 @@ def extract_tables_from_ocr():
                         table['markdown'],
                         table['original'],
                         summary,
-                        _to_pgvector(embedding)
+                        to_vector(embedding)
                     ))
 
                     tables_inserted += 1
@@ -43,10 +43,12 @@ class RateLimiter:
 
 API_RATE_LIMIT = int(os.getenv("API_RATE_LIMIT", "30"))
 WHATSAPP_RATE_LIMIT = int(os.getenv("WHATSAPP_RATE_LIMIT", "12"))
+BATCH_RATE_LIMIT = int(os.getenv("BATCH_RATE_LIMIT", "5"))  # batch requests, not questions
 RATE_WINDOW = int(os.getenv("RATE_LIMIT_WINDOW", "60"))
 
 api_rate_limiter = RateLimiter(API_RATE_LIMIT, RATE_WINDOW)
 whatsapp_rate_limiter = RateLimiter(WHATSAPP_RATE_LIMIT, RATE_WINDOW)
+batch_rate_limiter = RateLimiter(BATCH_RATE_LIMIT, RATE_WINDOW)
 
 
 def guard_question(question: str) -> Tuple[bool, Optional[str]]:
@@ -9,6 +9,9 @@ import psycopg
 from dotenv import load_dotenv
 
 from cleaner import clean_brochure_text, drop_too_small_chunks
+from retrieval.bm25 import update_persisted
+from utils.answer_cache import answer_cache
+from utils.vector import register_vector, to_vector
 from collections import Counter
 
 # -----------------------------------------------------------------------------
@@ -21,14 +24,9 @@ DATABASE_URL   = os.getenv("DATABASE_URL")
 
 # Lazy import to avoid hard dependency if not running ingest
 def _embed_texts(texts: List[str]) -> List[List[float]]:
-    import openai
-    openai.api_key = OPENAI_API_KEY
-    resp = openai.embeddings.create(model="text-embedding-3-small", input=texts)
-    return [d.embedding for d in resp.data]
-
-def _to_pgvector(vec: List[float]) -> str:
-    # psycopg3 does not natively adapt pgvector without extra adapter; cast via text
-    return "[" + ",".join(f"{x:.8f}" for x in vec) + "]"
+    # Chunks already embedded on an earlier run come from the embedding store
+    from utils.ai import _embed
+    return _embed(texts)
 
 def _detect_repeated_lines(page_texts: List[str], min_pages: int = 3, min_len: int = 15) -> List[str]:
     """
@@ -209,6 +207,7 @@ def ingest_ocr_json(
     # Insert into Postgres
     inserted = 0
     with psycopg.connect(DATABASE_URL) as con, con.cursor() as cur:
+        register_vector(con)
         for (page, section, txt), emb in zip(chunks, embeddings):
             # Skip if this text was filtered out by min_len
             if txt not in texts:
@@ -218,10 +217,13 @@ def ingest_ocr_json(
                 INSERT INTO documents (project_id, source_path, page, section, text, meta, embedding)
                 VALUES (%s, %s, %s, %s, %s, '{}', %s::vector)
                 """,
-                (project_id, source_path, page, section, txt, _to_pgvector(emb)),
+                (project_id, source_path, page, section, txt, to_vector(emb)),
             )
             inserted += 1
     print(f"[ingested] {inserted} chunks from {ocr_json_path.name}")
+    if inserted:
+        # Cached answers quoting this brochure were built from its old chunks
+        answer_cache.invalidate_sources([source_path])
     return inserted
 
 def main():
@@ -245,6 +247,9 @@ def main():
         deduplicate=not args.no_dedup,
     )
     print(f"[done] total inserted: {count}")
+    if count and not args.dry_run:
+        # Index the new chunks in the persisted BM25 snapshot (BM25_INDEX=1 only)
+        update_persisted(["documents"])
 
 if __name__ == "__main__":
     main()
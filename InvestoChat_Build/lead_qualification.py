@@ -13,9 +13,10 @@ import re
 from typing import Optional, Dict, Tuple
 from datetime import datetime
 
-import psycopg
 from dotenv import load_dotenv
 
+from utils.db import _pg
+
 # Load .env.local first, fallback to .env
 load_dotenv('.env.local')
 load_dotenv()  # Fallback to .env if .env.local doesn't exist
@@ -57,8 +58,8 @@ QUALIFICATION_QUESTIONS = {
 # =====================================================
 
 def _get_connection():
-    """Get database connection"""
-    return psycopg.connect(DATABASE_URL)
+    """Borrow a connection from the shared pool"""
+    return _pg()
 
 def get_or_create_lead(phone: str, name: Optional[str] = None) -> Dict:
     """Get existing lead or create new one"""
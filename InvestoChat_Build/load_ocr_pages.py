@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Bulk loader: OCR JSONL (outputs/<project>/<project>.jsonl) -> ocr_pages.
+
+Files are streamed line by line; pages are cleaned with
+cleaner.clean_brochure_text in a process pool and written with a binary
+COPY into a temp staging table, then upserted by (source_pdf, page) in one
+statement, so re-running on unchanged files touches no rows. Neighbour-page
+links for the OCR fallback are refreshed for the loaded PDFs afterwards.
+
+Usage:
+    python load_ocr_pages.py                          # every outputs/*/*.jsonl
+    python load_ocr_pages.py outputs/Trevoc_56/Trevoc_56.jsonl --project "Trevoc 56"
+    python load_ocr_pages.py --workers 8 --prune
+"""
+
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import psycopg
+from dotenv import load_dotenv
+
+from cleaner import clean_brochure_text
+from main import PROJECT_HINTS, intent_tag
+from retrieval.bm25 import update_persisted
+from retrieval.ocr_windows import has_window_columns, refresh_windows
+from retrieval.projects import ProjectDirectory
+from utils.answer_cache import answer_cache
+
+load_dotenv()
+DATABASE_URL = os.getenv("DATABASE_URL")
+HERE = Path(__file__).parent
+DEFAULT_GLOB = "outputs/*/*.jsonl"
+
+PageRow = Tuple[str, int, str, Optional[str], Optional[str]]  # source_pdf, page, text, project, tags
+
+_STAGE_SQL = """
+    CREATE TEMP TABLE ocr_pages_stage (
+        source_pdf TEXT, page INTEGER, text TEXT, project TEXT, tags TEXT
+    ) ON COMMIT DROP
+"""
+
+_UPSERT_SQL = """
+    INSERT INTO ocr_pages (source_pdf, page, text, project, tags)
+    SELECT DISTINCT ON (source_pdf, page) source_pdf, page, text, project, tags
+    FROM ocr_pages_stage
+    ORDER BY source_pdf, page
+    ON CONFLICT (source_pdf, page) DO UPDATE
+    SET text = EXCLUDED.text, project = EXCLUDED.project, tags = EXCLUDED.tags
+    WHERE (ocr_pages.text, ocr_pages.project, ocr_pages.tags)
+          IS DISTINCT FROM (EXCLUDED.text, EXCLUDED.project, EXCLUDED.tags)
+    RETURNING source_pdf
+"""
+
+# Pages of the loaded PDFs that are no longer in the input
+_PRUNE_SQL = """
+    DELETE FROM ocr_pages o
+    WHERE o.source_pdf IN (SELECT DISTINCT source_pdf FROM ocr_pages_stage)
+      AND NOT EXISTS (
+          SELECT 1 FROM ocr_pages_stage s WHERE s.source_pdf = o.source_pdf AND s.page = o.page
+      )
+    RETURNING o.source_pdf
+"""
+
+
+def clean_page(line: str, project: Optional[str]) -> Optional[PageRow]:
+    """One JSONL line ({"pdf", "page", "text", ...}) -> ocr_pages row, or None if unusable."""
+    try:
+        obj = json.loads(line)
+        page = int(obj["page"])
+    except (ValueError, KeyError, TypeError):
+        return None
+    text = clean_brochure_text(obj.get("text") or "")
+    if not text:
+        return None
+    return Path(obj.get("pdf") or "").name, page, text, project, intent_tag(text)
+
+
+def _clean_batch(args: Tuple[List[str], Optional[str]]) -> List[PageRow]:
+    lines, project = args
+    return [row for row in (clean_page(line, project) for line in lines) if row]
+
+
+def _batches(fp: Path, size: int) -> Iterator[List[str]]:
+    batch: List[str] = []
+    with open(fp, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                batch.append(line)
+                if len(batch) >= size:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+
+def project_for(fp: Path, directory: ProjectDirectory) -> Optional[str]:
+    """Project name from the file stem (Trevoc_56.jsonl -> "Trevoc 56"), or the stem itself."""
+    stem = fp.stem.replace("_", " ")
+    return directory.match(stem) or stem
+
+
+def load_files(files: Iterable[Path], project: Optional[str], workers: int, batch_size: int, prune: bool) -> int:
+    if not DATABASE_URL:
+        raise SystemExit("DATABASE_URL not set")
+    directory = ProjectDirectory(PROJECT_HINTS)
+    files = list(files)
+    start = time.perf_counter()
+    pages = 0
+    with psycopg.connect(DATABASE_URL) as con, con.cursor() as cur, ProcessPoolExecutor(max_workers=workers) as pool:
+        cur.execute(_STAGE_SQL)
+        with cur.copy("COPY ocr_pages_stage (source_pdf, page, text, project, tags) FROM STDIN (FORMAT BINARY)") as copy:
+            copy.set_types(["text", "int4", "text", "text", "text"])
+            for fp in files:
+                name = project or project_for(fp, directory)
+                jobs = ((batch, name) for batch in _batches(fp, batch_size))
+                n = 0
+                for rows in pool.map(_clean_batch, jobs):
+                    for row in rows:
+                        copy.write_row(row)
+                    n += len(rows)
+                pages += n
+                print(f"[stage] {fp.name}: {n} pages (project={name})")
+        staged = time.perf_counter()
+
+        cur.execute(_UPSERT_SQL)
+        changed = cur.rowcount
+        touched = {r[0] for r in cur.fetchall()}
+        removed = 0
+        if prune:
+            cur.execute(_PRUNE_SQL)
+            removed = cur.rowcount
+            touched.update(r[0] for r in cur.fetchall())
+        cur.execute("SELECT array_agg(DISTINCT source_pdf) FROM ocr_pages_stage")
+        sources = cur.fetchone()[0] or []
+        if has_window_columns(cur):
+            refresh_windows(cur, sources)
+        else:
+            print("[ocr_pages] no prev_page/next_page columns; run `python setup_db.py ocr-windows` once")
+        con.commit()
+    # Cached answers built from pages that just changed are stale
+    answer_cache.invalidate_sources(touched)
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"[ocr_pages] {pages} pages from {len(files)} files in {elapsed:.2f}s "
+        f"({pages / max(elapsed, 1e-9):.0f} pages/s; clean+copy {staged - start:.2f}s) "
+        f"-> {changed} inserted/updated, {removed} pruned"
+    )
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load OCR JSONL pages into ocr_pages")
+    parser.add_argument("files", nargs="*", type=Path, help=f"JSONL files (default: {DEFAULT_GLOB})")
+    parser.add_argument("--project", help="Project name for every page (default: from the file name)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Cleaning processes")
+    parser.add_argument("--batch-size", type=int, default=64, help="Lines per worker task")
+    parser.add_argument("--prune", action="store_true", help="Delete pages of loaded PDFs missing from the input")
+    args = parser.parse_args()
+
+    files = args.files or sorted(HERE.glob(DEFAULT_GLOB))
+    if not files:
+        raise SystemExit(f"no JSONL files found ({DEFAULT_GLOB})")
+    if load_files(files, args.project, args.workers, args.batch_size, args.prune) or args.prune:
+        update_persisted(["ocr_pages"])
+
+
+if __name__ == "__main__":
+    main()
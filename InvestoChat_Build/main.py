@@ -4,6 +4,7 @@ from typing import Optional, List, Tuple, Sequence, Dict
 import os
 import re
 import html
+import time
 import argparse
 
 import psycopg
@@ -11,9 +12,22 @@ from dotenv import load_dotenv
 from cachetools import TTLCache
 
 # Import from new utils modules
-from utils.db import _pg, _table_exists, _doc_tuple_to_meta
-from utils.ai import _embed, _chat, _to_pgvector
-from utils.text import strip_tags, normalize, tokenize, keyword_terms
+from utils.db import _pg, _apg, _doc_tuple_to_meta
+from utils.schema import schema_registry
+from retrieval.projects import ProjectDirectory
+from retrieval.semantic_cache import SemanticCache, SEMANTIC_CACHE_ENABLED
+from retrieval.ann import local_index
+from retrieval.bm25 import lexical_index
+from retrieval.ocr_windows import WINDOW_COLUMNS, assemble as assemble_windows, window_sql
+from retrieval.vector_index import applied, aapplied, nearest_sql, search_settings
+from utils.ai import _embed, _aembed, _chat, _achat, _achat_stream
+from utils.text import strip_tags, normalize, tokenize, keyword_terms, domain_tokens
+from retrieval.context import count_tokens, pack_context
+from retrieval.mmr import token_overlap_matrix, cosine_similarity_matrix, mmr_select
+from utils.vector import as_vector, to_vector
+from utils.singleflight import SingleFlight
+from utils.timing import collect, note, span
+from utils.answer_cache import ANSWER_CACHE_ENABLED, answer_cache, answer_key, context_ids
 
 # -----------------------------
 # Env
@@ -40,12 +54,38 @@ PROJECT_HINTS = {
     "anant raj": "The Estate Residences",
 }
 
+# Names/slugs/aliases from `projects` plus the hints above, matched in one pass
+project_directory = ProjectDirectory(PROJECT_HINTS)
+
 # -----------------------------
 # Query result cache
 # -----------------------------
 # Cache query results for 5 minutes to avoid repeated retrieval
 _query_cache = TTLCache(maxsize=100, ttl=300)
 
+# Identical concurrent misses (same normalized key) share one retrieval / one chat completion
+retrieve_flight = SingleFlight("retrieve")
+answer_flight = SingleFlight("answer")
+
+def _normalize_question(q: str) -> str:
+    """Case- and whitespace-insensitive form of a question, for cache and coalescing keys."""
+    return " ".join(q.split()).casefold()
+
+def _cache_key(q: str, k: int, overfetch: int, project_id: Optional[int], project_name: Optional[str],
+               diversity: str, retrieval_mode: str, recall_target: Optional[float]) -> str:
+    return (f"{_normalize_question(q)}:{k}:{overfetch}:{project_id}:{project_name}:{diversity}"
+            f":{retrieval_mode}:{recall_target}")
+
+# Second tier: paraphrased repeats matched by query-embedding similarity
+semantic_cache = SemanticCache()
+
+# MMR diversity signal: "tokens" (word overlap) or "embedding" (cosine between chunk vectors)
+MMR_DIVERSITY = os.getenv("MMR_DIVERSITY", "tokens")
+
+# "vector": vector search, then trigram/ILIKE OCR fallbacks; "hybrid": vector + trigram (or BM25) fused with RRF;
+# "bm25": in-process BM25 index (BM25_INDEX=1) first, then the "vector" chain
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+
 # ----------------------------------------
 # Helper: Derive intent tag from question
 # ----------------------------------------
@@ -86,29 +126,8 @@ def intent_tag(question: str) -> Optional[str]:
 # -----------------------------
 # Token + MMR utils
 # -----------------------------
-DOMAIN_TERMS = {
-    "bhk","sq","sft","sqft","acre","acres","tower","core","aravalli","gurgaon","gurugram","sector",
-    "clp","plp","possession","rera","super","area","carpet","price","launch","amenities","lakh",
-    "crore","flexi","payment","green","club","wellness","noida"
-}
-SAFE_CHARS = r"[^a-z0-9 ₹.%/-]+"
-
 def tokenize(text: str):
-    t = re.sub(SAFE_CHARS, " ", text.lower())
-    raw = [w for w in t.split() if w]
-    stop = {"the","a","an","and","or","of","to","in","on","for","with","at","by","from",
-            "is","are","was","were","be","as","that","this","these","those"}
-    keep = []
-    for w in raw:
-        if w in stop:
-            continue
-        if w in DOMAIN_TERMS:
-            keep.append(w); continue
-        if w.replace(".","",1).isdigit():
-            keep.append(w); continue
-        if any(s in w for s in ["bhk","sq","ft","sft","₹","cr","lakh","%"]):
-            keep.append(w); continue
-        keep.append(w)
+    keep = domain_tokens(text)
     if os.getenv("DEBUG_RAG") == "1":
         print("[tokens]", keep[:40])
     return keep
@@ -156,60 +175,25 @@ def detect_project_filter(question: str, explicit: Optional[str] = None) -> Opti
     """
     if explicit:
         return explicit
-    ql = question.lower()
-    for k, v in PROJECT_HINTS.items():
-        if k in ql:
-            return v
-    return None
+    return project_directory.match(question)
 
 def get_project_id_from_name(project_name: str) -> Optional[int]:
     """
-    Convert project name to project_id by querying the database.
-    Returns None if project not found.
+    Convert project name to project_id via the in-memory project directory
+    (name, case-insensitive name, then slug). Returns None if not found.
     """
-    if not project_name:
-        return None
-
-    try:
-        with _pg() as con, con.cursor() as cur:
-            # Try exact match first
-            cur.execute("SELECT id FROM projects WHERE name = %s", (project_name,))
-            result = cur.fetchone()
-            if result:
-                return result[0]
-
-            # Try case-insensitive match
-            cur.execute("SELECT id FROM projects WHERE LOWER(name) = LOWER(%s)", (project_name,))
-            result = cur.fetchone()
-            if result:
-                return result[0]
-
-            # Try slug match
-            slug = project_name.lower().replace(' ', '-')
-            cur.execute("SELECT id FROM projects WHERE slug = %s", (slug,))
-            result = cur.fetchone()
-            if result:
-                return result[0]
-
-    except Exception as e:
-        print(f"[warn] Failed to get project_id for '{project_name}': {e}")
-
-    return None
-
-def _sim_token_overlap(si: set, sj: set) -> float:
-    inter = len(si & sj)
-    return inter / max(1, min(len(si), len(sj)))
+    return project_directory.resolve_id(project_name)
 
 def _has_payment_table(text: str) -> bool:
     """
     Detect if text contains a structured payment schedule table.
     Looks for table indicators with payment-related headers.
     """
-    text_lower = text.lower()
-    lines = text_lower.split('\n')
+    if text.count('|') < 2:
+        return False
 
     # Look for lines with table structure (2+ pipe characters)
-    table_lines = [ln for ln in lines if ln.count('|') >= 2]
+    table_lines = [ln.lower() for ln in text.split('\n') if ln.count('|') >= 2]
     if not table_lines:
         return False
 
@@ -241,7 +225,8 @@ def score(doc: str, meta: dict, qtokens, intent: Optional[str] = None) -> float:
         Relevance score (higher is better)
     """
     dl = doc.lower()
-    overlap = sum(1 for t in qtokens if f" {t} " in f" {dl} ")
+    padded = f" {dl} "
+    overlap = sum(1 for t in qtokens if f" {t} " in padded)
 
     # Base metadata boost
     boost = 0.0
@@ -289,10 +274,16 @@ def score(doc: str, meta: dict, qtokens, intent: Optional[str] = None) -> float:
 
     return (overlap + boost) * length_norm
 
-def mmr(documents, metadatas, qtokens, lambda_=0.75, topk=3, intent: Optional[str] = None):
+def mmr(documents, metadatas, qtokens, lambda_=0.75, topk=3, intent: Optional[str] = None,
+        diversity: str = "tokens", embeddings=None):
     """
     Maximal Marginal Relevance for diverse chunk selection.
 
+    Relevance is scored once per candidate and diversity uses a similarity
+    matrix built in one vectorized pass (see retrieval.mmr): token overlap by
+    default, or cosine similarity between candidate embeddings when
+    diversity="embedding" and embeddings are supplied.
+
     Args:
         documents: List of document texts
         metadatas: List of metadata dicts
@@ -300,28 +291,139 @@ def mmr(documents, metadatas, qtokens, lambda_=0.75, topk=3, intent: Optional[st
         lambda_: Balance between relevance (higher) and diversity (lower)
         topk: Number of documents to select
         intent: Intent tag for intent-aware scoring
+        diversity: "tokens" or "embedding"
+        embeddings: Candidate vectors (required for diversity="embedding")
 
     Returns:
         Tuple of (selected_documents, selected_metadatas)
     """
-    cand = list(range(len(documents)))
-    selected = []
-    token_sets = [set(d.lower().split()) for d in documents]
-    while cand and len(selected) < topk:
-        best, best_s = None, -1e9
-        for i in cand:
-            rel = score(documents[i], metadatas[i], qtokens, intent=intent)
-            div = 0 if not selected else max(_sim_token_overlap(token_sets[i], token_sets[j]) for j in selected)
-            s = lambda_ * rel - (1 - lambda_) * div
-            if s > best_s:
-                best, best_s = i, s
-        selected.append(best)
-        cand.remove(best)
+    if not documents:
+        return [], []
+    with span("mmr"):
+        relevance = [score(d, m, qtokens, intent=intent) for d, m in zip(documents, metadatas)]
+        if diversity == "embedding" and embeddings is not None:
+            similarity = cosine_similarity_matrix(embeddings)
+        else:
+            similarity = token_overlap_matrix([set(d.lower().split()) for d in documents])
+        selected = mmr_select(relevance, similarity, lambda_=lambda_, topk=topk)
     return [documents[i] for i in selected], [metadatas[i] for i in selected]
 
-def _table_exists(cur, name: str) -> bool:
-    cur.execute("SELECT to_regclass(%s)", (name,))
-    return cur.fetchone()[0] is not None
+def _ocr_filters(project_like: Optional[str], tag: Optional[str]) -> Tuple[List[str], List[object]]:
+    where_parts: List[str] = []
+    params: List[object] = []
+    if project_like:
+        where_parts.append("project ILIKE %s")
+        params.append(f"%{project_like}%")
+    if tag:
+        where_parts.append("tags = %s")
+        params.append(tag)
+    return where_parts, params
+
+def _ocr_windowed() -> bool:
+    """ocr_pages has materialized neighbour pages (see retrieval/ocr_windows.py)."""
+    return all(schema_registry.has_column("ocr_pages", c) for c in WINDOW_COLUMNS)
+
+def _ocr_indexed() -> bool:
+    """ocr_pages is the managed table from db/schema.sql (tsvector column + trigram/full-text GIN indexes)."""
+    return schema_registry.has_column("ocr_pages", "tsv")
+
+# Full-text configuration of ocr_pages.tsv (db/schema.sql)
+OCR_TS_CONFIG = "english"
+
+def _websearch(terms: List[str]) -> str:
+    """websearch_to_tsquery input matching any of the terms (multi-word terms as phrases)."""
+    parts = []
+    for t in terms:
+        t = t.replace('"', " ").strip()
+        if t:
+            parts.append(f'"{t}"' if " " in t else t)
+    return " or ".join(parts)
+
+def _ocr_statement(score: str, score_params: List[object], where_parts: List[str], where_params: List[object],
+                   order: str, legacy_order: str, overfetch: int, tag: Optional[str], windowed: bool) -> Tuple[str, tuple]:
+    where_clause = "WHERE " + " AND ".join(where_parts) if where_parts else ""
+    if windowed:
+        sql = window_sql(score, order, where_clause)
+        return sql, tuple(score_params + [tag, tag] + where_params + [overfetch])
+    sql = [
+        "SELECT source_pdf, page,",
+        "       lag(text)  OVER (PARTITION BY source_pdf ORDER BY page) AS prev_text,",
+        "       text AS cur_text,",
+        "       lead(text) OVER (PARTITION BY source_pdf ORDER BY page) AS next_text,",
+        f"       {score} AS s",
+        "FROM ocr_pages",
+        where_clause,
+        f"ORDER BY (CASE WHEN %s::TEXT IS NOT NULL AND tags = %s::TEXT THEN 0 ELSE 1 END), {legacy_order}",
+        "LIMIT %s",
+    ]
+    params = score_params + where_params + [tag, tag, overfetch]
+    return "\n".join([s for s in sql if s]), tuple(params)
+
+def _ocr_ilike_sql(terms: List[str], overfetch: int, project_like: Optional[str], tag: Optional[str],
+                   windowed: bool = False, indexed: bool = False) -> Tuple[str, tuple]:
+    """
+    Keyword match on OCR pages. On the managed table, pages matching the
+    terms as full-text (tsv @@ ...) or substrings (ILIKE, trigram GIN) are
+    ranked by ts_rank_cd; otherwise substring matches, shortest page first.
+    """
+    where_parts: List[str] = []
+    params: List[object] = []
+    score, score_params = "0.0", []
+    if terms:
+        # (text ILIKE %term1% OR text ILIKE %term2% ...)
+        match = ["text ILIKE %s"] * len(terms)
+        params.extend([f"%{t}%" for t in terms])
+        if indexed:
+            query = _websearch(terms)
+            match.insert(0, f"tsv @@ websearch_to_tsquery('{OCR_TS_CONFIG}', %s)")
+            params.insert(0, query)
+            score, score_params = f"ts_rank_cd(tsv, websearch_to_tsquery('{OCR_TS_CONFIG}', %s))", [query]
+        where_parts.append("(" + " OR ".join(match) + ")")
+    filter_parts, filter_params = _ocr_filters(project_like, tag)
+    where_parts += filter_parts
+    params += filter_params
+    if indexed and terms:
+        order, legacy_order = "pri, s DESC, len", "s DESC, length(text) ASC"
+    else:
+        order, legacy_order = "pri, len", "length(text) ASC"
+    return _ocr_statement(score, score_params, where_parts, params, order, legacy_order, overfetch, tag, windowed)
+
+def _ocr_trgm_sql(terms: List[str], overfetch: int, project_like: Optional[str], tag: Optional[str],
+                  windowed: bool = False, indexed: bool = False) -> Tuple[str, tuple]:
+    """
+    Fuzzy match on OCR pages. On the managed table only pages containing a
+    word-level trigram match of some term (term <% text, served by the
+    trigram GIN index) are scored, by word_similarity; otherwise every page
+    is scored by similarity().
+    """
+    if indexed:
+        # Build GREATEST(word_similarity(t1, text), ...) over the (t1 <% text OR ...) matches
+        score = "GREATEST(" + ",".join(["word_similarity(%s, text)"] * len(terms)) + ")"
+        where_parts = ["(" + " OR ".join(["%s <%% text"] * len(terms)) + ")"]
+        where_params: List[object] = list(terms)
+    else:
+        # Build GREATEST(similarity(text, t1), similarity(text, t2), ...)
+        score = "GREATEST(" + ",".join(["similarity(text, %s)"] * len(terms)) + ")"
+        where_parts, where_params = [], []
+    filter_parts, filter_params = _ocr_filters(project_like, tag)
+    return _ocr_statement(score, list(terms), where_parts + filter_parts, where_params + filter_params,
+                          "pri, s DESC", "s DESC", overfetch, tag, windowed)
+
+def _ocr_rows_to_result(rows, question: str, k: int, tag: Optional[str], mode: str, windowed: bool = False) -> dict:
+    if windowed:
+        # One window per hit (prev + hit + next), shared neighbour pages sent once
+        docs, metas = assemble_windows(rows)
+    else:
+        docs, metas = [], []
+        for source_pdf, page, prev_text, cur_text, next_text, s in rows:
+            combined = "\n\n".join(t for t in [prev_text, cur_text, next_text] if t)
+            docs.append(combined)
+            metas.append({"source": source_pdf, "page": page, "score": float(s)})
+    if not docs:
+        return {"mode":"empty", "answers":[], "metas":[]}
+    qtokens = tokenize(question)
+    top_docs, top_metas = mmr(docs, metas, qtokens, lambda_=0.75, topk=max(1, k), intent=tag)
+    return {"mode":mode, "answers": top_docs, "metas": top_metas}
 
 def retrieve_sql_ilike(
     question: str,
@@ -331,48 +433,32 @@ def retrieve_sql_ilike(
     tag: Optional[str] = None
 ):
     terms = keyword_terms(question)
-    with _pg() as con, con.cursor() as cur:
-        if not _table_exists(cur, "ocr_pages"):
-            return {"mode":"empty", "answers":[], "metas":[]}
-        where_parts = []
-        params: List[object] = []
-        # (text ILIKE %term1% OR text ILIKE %term2% ...)
-        if terms:
-            where_parts.append("(" + " OR ".join(["text ILIKE %s"] * len(terms)) + ")")
-            params.extend([f"%{t}%" for t in terms])
-        if project_like:
-            where_parts.append("project ILIKE %s")
-            params.append(f"%{project_like}%")
-        if tag:
-            where_parts.append("tags = %s")
-            params.append(tag)
-        where_clause = "WHERE " + " AND ".join(where_parts) if where_parts else ""
-        sql = [
-            "SELECT source_pdf, page,",
-            "       lag(text)  OVER (PARTITION BY source_pdf ORDER BY page) AS prev_text,",
-            "       text AS cur_text,",
-            "       lead(text) OVER (PARTITION BY source_pdf ORDER BY page) AS next_text",
-            "FROM ocr_pages",
-            where_clause,
-            "ORDER BY (CASE WHEN %s::TEXT IS NOT NULL AND tags = %s::TEXT THEN 0 ELSE 1 END), length(text) ASC",
-            "LIMIT %s",
-        ]
-        params.extend([tag, tag])
-        params.append(overfetch)
-        cur.execute("\n".join([s for s in sql if s]), tuple(params))
+    if not schema_registry.has_table("ocr_pages"):
+        return {"mode":"empty", "answers":[], "metas":[]}
+    windowed, indexed = _ocr_windowed(), _ocr_indexed()
+    with span("ocr_ilike"), _pg() as con, con.cursor() as cur:
+        cur.execute(*_ocr_ilike_sql(terms, overfetch, project_like, tag, windowed, indexed))
         rows = cur.fetchall()
-    docs = []
-    metas = []
-    for r in rows:
-        source_pdf, page, prev_text, cur_text, next_text = r
-        combined = " ".join(t for t in [prev_text, cur_text, next_text] if t)
-        metas.append({"source": source_pdf, "page": page, "score": 0.0})
-        docs.append(combined)
-    if not docs:
+    note(ocr_candidates=len(rows))
+    return _ocr_rows_to_result(rows, question, k, tag, "ocr_ilike", windowed)
+
+async def aretrieve_sql_ilike(
+    question: str,
+    k: int = 3,
+    overfetch: int = 24,
+    project_like: Optional[str] = None,
+    tag: Optional[str] = None
+):
+    terms = keyword_terms(question)
+    if not schema_registry.has_table("ocr_pages"):
         return {"mode":"empty", "answers":[], "metas":[]}
-    qtokens = tokenize(question)
-    top_docs, top_metas = mmr(docs, metas, qtokens, lambda_=0.75, topk=max(1, k), intent=tag)
-    return {"mode":"ocr_ilike", "answers": top_docs, "metas": top_metas}
+    windowed, indexed = _ocr_windowed(), _ocr_indexed()
+    with span("ocr_ilike"):
+        async with _apg() as con, con.cursor() as cur:
+            await cur.execute(*_ocr_ilike_sql(terms, overfetch, project_like, tag, windowed, indexed))
+            rows = await cur.fetchall()
+    note(ocr_candidates=len(rows))
+    return _ocr_rows_to_result(rows, question, k, tag, "ocr_ilike", windowed)
 
 def retrieve_sql_trgm(
     question: str,
@@ -381,50 +467,33 @@ def retrieve_sql_trgm(
     project_like: Optional[str] = None,
     tag: Optional[str] = None
 ):
-    terms = keyword_terms(question)
-    with _pg() as con, con.cursor() as cur:
-        if not _table_exists(cur, "ocr_pages"):
-            return {"mode":"empty", "answers":[], "metas":[]}
-        # Build GREATEST(similarity(text, t1), similarity(text, t2), ...)
-        if not terms:
-            terms = [question]
-        sim_expr = "GREATEST(" + ",".join(["similarity(text, %s)"] * len(terms)) + ")"
-        params: List[object] = terms.copy()
-        where_parts = []
-        if project_like:
-            where_parts.append("project ILIKE %s")
-            params.append(f"%{project_like}%")
-        if tag:
-            where_parts.append("tags = %s")
-            params.append(tag)
-        where_clause = "WHERE " + " AND ".join(where_parts) if where_parts else ""
-        sql = [
-            "SELECT source_pdf, page,",
-            "       lag(text)  OVER (PARTITION BY source_pdf ORDER BY page) AS prev_text,",
-            "       text AS cur_text,",
-            "       lead(text) OVER (PARTITION BY source_pdf ORDER BY page) AS next_text,",
-            f"       {sim_expr} AS s",
-            "FROM ocr_pages",
-            where_clause,
-            "ORDER BY (CASE WHEN %s::TEXT IS NOT NULL AND tags = %s::TEXT THEN 0 ELSE 1 END), s DESC",
-            "LIMIT %s",
-        ]
-        params.extend([tag, tag])
-        params.append(overfetch)
-        cur.execute("\n".join([s for s in sql if s]), tuple(params))
+    terms = keyword_terms(question) or [question]
+    if not schema_registry.has_table("ocr_pages"):
+        return {"mode":"empty", "answers":[], "metas":[]}
+    windowed, indexed = _ocr_windowed(), _ocr_indexed()
+    with span("ocr_trgm"), _pg() as con, con.cursor() as cur:
+        cur.execute(*_ocr_trgm_sql(terms, overfetch, project_like, tag, windowed, indexed))
         rows = cur.fetchall()
-    docs = []
-    metas = []
-    for r in rows:
-        source_pdf, page, prev_text, cur_text, next_text, s = r
-        combined = " ".join(t for t in [prev_text, cur_text, next_text] if t)
-        docs.append(combined)
-        metas.append({"source": source_pdf, "page": page, "score": float(s)})
-    if not docs:
+    note(ocr_candidates=len(rows))
+    return _ocr_rows_to_result(rows, question, k, tag, "ocr_trgm", windowed)
+
+async def aretrieve_sql_trgm(
+    question: str,
+    k: int = 3,
+    overfetch: int = 24,
+    project_like: Optional[str] = None,
+    tag: Optional[str] = None
+):
+    terms = keyword_terms(question) or [question]
+    if not schema_registry.has_table("ocr_pages"):
         return {"mode":"empty", "answers":[], "metas":[]}
-    qtokens = tokenize(question)
-    top_docs, top_metas = mmr(docs, metas, qtokens, lambda_=0.75, topk=max(1, k), intent=tag)
-    return {"mode":"ocr_trgm", "answers": top_docs, "metas": top_metas}
+    windowed, indexed = _ocr_windowed(), _ocr_indexed()
+    with span("ocr_trgm"):
+        async with _apg() as con, con.cursor() as cur:
+            await cur.execute(*_ocr_trgm_sql(terms, overfetch, project_like, tag, windowed, indexed))
+            rows = await cur.fetchall()
+    note(ocr_candidates=len(rows))
+    return _ocr_rows_to_result(rows, question, k, tag, "ocr_trgm", windowed)
 
 # -----------------------------
 # Postgres retrieval
@@ -433,119 +502,591 @@ def _doc_tuple_to_meta(row) -> dict:
     # row order: text, page, section, source_path, score
     return {"page": row[1], "section": row[2], "source": row[3], "score": float(row[4])}
 
-def search_facts(qvec: List[float], k: int = 8, project_id: Optional[int] = None) -> List[Tuple[str, dict]]:
-    with _pg() as con, con.cursor() as cur:
-        if not _table_exists(cur, "facts"):
-            return []
-        qvec_str = _to_pgvector(qvec)
-        where_clauses = ["embedding IS NOT NULL"]
-        if project_id is not None:
-            where_clauses.insert(0, "project_id = %s")
-            # Placeholders: $1=qvec(SELECT), $2=project_id(WHERE), $3=qvec(ORDER), $4=k(LIMIT)
-            params = [qvec_str, project_id, qvec_str, k]
-        else:
-            # Placeholders: $1=qvec(SELECT), $2=qvec(ORDER), $3=k(LIMIT)
-            params = [qvec_str, qvec_str, k]
-        cur.execute(
-            """
-            SELECT value, source_page, key, 1 - (embedding <=> %s::vector) AS score
-            FROM facts
-            WHERE """ + " AND ".join(where_clauses) + """
-            ORDER BY embedding <=> %s::vector
-            LIMIT %s
-            """,
-            tuple(params),
-        )
-        rows = cur.fetchall()
+def _facts_sql(qvec: List[float], k: int, project_id: Optional[int]) -> Tuple[str, tuple]:
+    where = "project_id = %s AND embedding IS NOT NULL" if project_id is not None else "embedding IS NOT NULL"
+    # Placeholders: qvec (CTE), [project_id (WHERE)], k (LIMIT)
+    sql = "WITH q AS MATERIALIZED (SELECT %s::vector AS v) " + nearest_sql(
+        "facts", "value, source_page, key, 1 - (embedding <=> (SELECT v FROM q)) AS score",
+        where, "(SELECT v FROM q)", k,
+    )
+    params = [to_vector(qvec)] + ([project_id] if project_id is not None else []) + [k]
+    return sql, tuple(params)
+
+def _facts_rows(rows) -> List[Tuple[str, dict]]:
     out = []
     for value, page, key, score in rows:
         out.append((value, {"page": page, "key": key, "score": float(score)}))
     return out
 
-def search_docs(qvec: List[float], k: int = 12, project_id: Optional[int] = None) -> List[Tuple[str, dict]]:
-    with _pg() as con, con.cursor() as cur:
-        if not _table_exists(cur, "documents"):
-            return []
-        qvec_str = _to_pgvector(qvec)
-        if project_id is not None:
-            where_clause = "WHERE project_id = %s"
-            # Placeholders: $1=qvec(SELECT), $2=project_id(WHERE), $3=qvec(ORDER), $4=k(LIMIT)
-            params = [qvec_str, project_id, qvec_str, k]
-        else:
-            where_clause = ""
-            # Placeholders: $1=qvec(SELECT), $2=qvec(ORDER), $3=k(LIMIT)
-            params = [qvec_str, qvec_str, k]
-        query = """
-            SELECT text, page, section, source_path, 1 - (embedding <=> %s::vector) AS score
-            FROM documents
-            """ + where_clause + """
-            ORDER BY embedding <=> %s::vector
-            LIMIT %s
-            """
-        cur.execute(query, tuple(params))
+def _docs_sql(qvec: List[float], k: int, project_id: Optional[int], with_embeddings: bool = False) -> Tuple[str, tuple]:
+    where = "project_id = %s" if project_id is not None else ""
+    # Placeholders: qvec (CTE), [project_id (WHERE)], k (LIMIT)
+    sql = "WITH q AS MATERIALIZED (SELECT %s::vector AS v) " + nearest_sql(
+        "documents",
+        "text, page, section, source_path, 1 - (embedding <=> (SELECT v FROM q)) AS score"
+        + (", embedding" if with_embeddings else ""),
+        where, "(SELECT v FROM q)", k,
+    )
+    params = [to_vector(qvec)] + ([project_id] if project_id is not None else []) + [k]
+    return sql, tuple(params)
+
+def _local_facts(qvec: List[float], k: int, project_id: Optional[int]) -> List[Tuple[str, dict]]:
+    return [(value, {"page": page, "key": key, "score": s})
+            for (value, page, key), s, _ in local_index.search("facts", qvec, k, project_id)]
+
+def _local_docs(qvec: List[float], k: int, project_id: Optional[int], with_embeddings: bool = False) -> list:
+    out = []
+    for (text, page, section, source_path), s, vec in local_index.search("documents", qvec, k, project_id):
+        meta = _doc_tuple_to_meta((text, page, section, source_path, s))
+        out.append((text, meta, vec) if with_embeddings else (text, meta))
+    return out
+
+def search_facts(qvec: List[float], k: int = 8, project_id: Optional[int] = None,
+                 recall_target: Optional[float] = None) -> List[Tuple[str, dict]]:
+    if local_index.serves("facts"):
+        return _local_facts(qvec, k, project_id)
+    if not schema_registry.has_table("facts"):
+        return []
+    with _pg() as con, con.cursor() as cur, applied(con, search_settings(("facts",), k, recall_target)):
+        cur.execute(*_facts_sql(qvec, k, project_id))
         rows = cur.fetchall()
+    return _facts_rows(rows)
+
+async def asearch_facts(qvec: List[float], k: int = 8, project_id: Optional[int] = None,
+                        recall_target: Optional[float] = None) -> List[Tuple[str, dict]]:
+    if local_index.serves("facts"):
+        return _local_facts(qvec, k, project_id)
+    if not schema_registry.has_table("facts"):
+        return []
+    async with _apg() as con, con.cursor() as cur, aapplied(con, search_settings(("facts",), k, recall_target)):
+        await cur.execute(*_facts_sql(qvec, k, project_id))
+        rows = await cur.fetchall()
+    return _facts_rows(rows)
+
+def _docs_rows(rows, with_embeddings: bool = False) -> list:
+    if with_embeddings:
+        return [(r[0], _doc_tuple_to_meta(r), as_vector(r[5])) for r in rows]
     return [(r[0], _doc_tuple_to_meta(r)) for r in rows]
 
-def _retrieve_uncached(q: str, k: int = 3, overfetch: int = 48, project_id: Optional[int] = None, project_name: Optional[str] = None):
-    """Internal retrieve function without caching"""
+def search_docs(qvec: List[float], k: int = 12, project_id: Optional[int] = None, with_embeddings: bool = False,
+                recall_target: Optional[float] = None) -> list:
+    """
+    Nearest document chunks as (text, meta) pairs, or (text, meta, embedding)
+    triples when with_embeddings is set (vectors fetched in binary format).
+    Served from the in-process index when LOCAL_ANN is enabled and loaded.
+    """
+    if local_index.serves("documents"):
+        return _local_docs(qvec, k, project_id, with_embeddings)
+    if not schema_registry.has_table("documents"):
+        return []
+    with _pg() as con, con.cursor() as cur, applied(con, search_settings(("documents",), k, recall_target)):
+        cur.execute(*_docs_sql(qvec, k, project_id, with_embeddings), binary=with_embeddings)
+        rows = cur.fetchall()
+    return _docs_rows(rows, with_embeddings)
+
+async def asearch_docs(qvec: List[float], k: int = 12, project_id: Optional[int] = None, with_embeddings: bool = False,
+                       recall_target: Optional[float] = None) -> list:
+    if local_index.serves("documents"):
+        return _local_docs(qvec, k, project_id, with_embeddings)
+    if not schema_registry.has_table("documents"):
+        return []
+    async with _apg() as con, con.cursor() as cur, aapplied(con, search_settings(("documents",), k, recall_target)):
+        await cur.execute(*_docs_sql(qvec, k, project_id, with_embeddings), binary=with_embeddings)
+        rows = await cur.fetchall()
+    return _docs_rows(rows, with_embeddings)
+
+FACTS_SCORE_THRESHOLD = 0.5
+
+def _vectors_sql(qvec: List[float], k_facts: int, k_docs: int, project_id: Optional[int], with_embeddings: bool = False) -> Tuple[str, tuple]:
+    """
+    Facts + documents ANN lookups as one statement.
+
+    The query vector is sent once (CTE `q`), and the documents branch is gated
+    on the facts branch: when a fact clears FACTS_SCORE_THRESHOLD the planner's
+    one-time filter skips the documents scan entirely.
+    """
+    project_clause = "project_id = %s AND " if project_id is not None else ""
+    project_params = [project_id] if project_id is not None else []
+    doc_vec, fact_vec = (", embedding", ", NULL::vector") if with_embeddings else ("", "")
+    sql = """
+        WITH q AS MATERIALIZED (SELECT %s::vector AS v),
+        f AS (""" + nearest_sql(
+            "facts", "value, source_page, key, 1 - (embedding <=> (SELECT v FROM q)) AS score",
+            project_clause + "embedding IS NOT NULL", "(SELECT v FROM q)", k_facts,
+        ) + """),
+        d AS (""" + nearest_sql(
+            "documents", "text, page, section, source_path, 1 - (embedding <=> (SELECT v FROM q)) AS score" + doc_vec,
+            project_clause + "NOT EXISTS (SELECT 1 FROM f WHERE f.score >= %s)", "(SELECT v FROM q)", k_docs,
+        ) + """)
+        SELECT 'facts' AS kind, value AS text, NULL::int AS page, source_page, key AS section, NULL::text AS source_path, score""" + fact_vec + """ FROM f
+        UNION ALL
+        SELECT 'docs', text, page, NULL::text, section, source_path, score""" + doc_vec + """ FROM d
+        ORDER BY score DESC
+        """
+    params = [to_vector(qvec)] + project_params + [k_facts] + project_params + [FACTS_SCORE_THRESHOLD, k_docs]
+    return sql, tuple(params)
+
+def _vectors_rows(rows, with_embeddings: bool = False) -> Tuple[List[Tuple[str, dict]], list]:
+    facts, docs = [], []
+    for kind, text, page, source_page, section, source_path, score, *vec in rows:
+        if kind == "facts":
+            facts.append((text, {"page": source_page, "key": section, "score": float(score)}))
+        else:
+            meta = _doc_tuple_to_meta((text, page, section, source_path, score))
+            docs.append((text, meta, as_vector(vec[0])) if with_embeddings else (text, meta))
+    return facts, docs
+
+def search_vectors(qvec: List[float], k_facts: int = 8, k_docs: int = 12, project_id: Optional[int] = None, with_embeddings: bool = False,
+                   recall_target: Optional[float] = None):
+    """
+    Run the facts and documents vector searches in one round trip.
+    Returns (facts, docs); docs is empty when a fact clears the threshold.
+    With with_embeddings, docs entries carry the chunk embedding (see search_docs).
+    recall_target (0-1) sets hnsw.ef_search / ivfflat.probes for this statement only.
+    """
+    if local_index.serves("facts") or local_index.serves("documents") or \
+            not (schema_registry.has_table("facts") and schema_registry.has_table("documents")):
+        # In-process index, or one of the tables is missing: fall back to the guarded per-table searches
+        facts = search_facts(qvec, k=k_facts, project_id=project_id, recall_target=recall_target)
+        if facts and facts[0][1].get("score", 0) >= FACTS_SCORE_THRESHOLD:
+            return facts, []
+        return facts, search_docs(qvec, k=k_docs, project_id=project_id, with_embeddings=with_embeddings,
+                                  recall_target=recall_target)
+    settings = search_settings(("facts", "documents"), max(k_facts, k_docs), recall_target)
+    with _pg() as con, con.cursor() as cur, applied(con, settings):
+        cur.execute(*_vectors_sql(qvec, k_facts, k_docs, project_id, with_embeddings), binary=with_embeddings)
+        return _vectors_rows(cur.fetchall(), with_embeddings)
+
+async def asearch_vectors(qvec: List[float], k_facts: int = 8, k_docs: int = 12, project_id: Optional[int] = None, with_embeddings: bool = False,
+                          recall_target: Optional[float] = None):
+    """Async variant of search_vectors."""
+    if local_index.serves("facts") or local_index.serves("documents") or \
+            not (schema_registry.has_table("facts") and schema_registry.has_table("documents")):
+        facts = await asearch_facts(qvec, k=k_facts, project_id=project_id, recall_target=recall_target)
+        if facts and facts[0][1].get("score", 0) >= FACTS_SCORE_THRESHOLD:
+            return facts, []
+        return facts, await asearch_docs(qvec, k=k_docs, project_id=project_id, with_embeddings=with_embeddings,
+                                         recall_target=recall_target)
+    settings = search_settings(("facts", "documents"), max(k_facts, k_docs), recall_target)
+    async with _apg() as con, con.cursor() as cur, aapplied(con, settings):
+        await cur.execute(*_vectors_sql(qvec, k_facts, k_docs, project_id, with_embeddings), binary=with_embeddings)
+        return _vectors_rows(await cur.fetchall(), with_embeddings)
+
+# Reciprocal rank fusion constant: score = sum(1 / (RRF_K + rank)) over rankings
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Lexical ranking supplied by the in-process BM25 index. Placeholders: ids, threshold
+_BM25_LEX_SQL = """
+            SELECT id, rank FROM unnest(%s::bigint[]) WITH ORDINALITY AS l(id, rank)
+            WHERE {gate}"""
+
+def _hybrid_sql(qvec: List[float], terms: List[str], k_facts: int, k_docs: int, project_id: Optional[int],
+                with_embeddings: bool = False, lex_ids: Optional[List[int]] = None) -> Tuple[str, tuple]:
+    """
+    Facts + fused documents search as one statement.
+
+    Documents get two candidate lists: pgvector nearest neighbours and pg_trgm
+    lexical matches (ILIKE prefilter served by the trigram GIN index, ranked by
+    word_similarity). The lists are fused with RRF in SQL; like _vectors_sql,
+    the documents branches are skipped when a fact clears the threshold.
+    With lex_ids (ranked document ids from the in-process BM25 index), the
+    lexical list is those ids instead of the trigram scan.
+    """
+    project_clause = "project_id = %s AND " if project_id is not None else ""
+    project_params = [project_id] if project_id is not None else []
+    gate = "NOT EXISTS (SELECT 1 FROM f WHERE f.score >= %s)"
+    doc_vec, fact_vec = (", d.embedding", ", NULL::vector") if with_embeddings else ("", "")
+    sql = """
+        WITH q AS MATERIALIZED (SELECT %s::vector AS v, %s::text AS t),
+        f AS (""" + nearest_sql(
+            "facts", "value, source_page, key, 1 - (embedding <=> (SELECT v FROM q)) AS score",
+            project_clause + "embedding IS NOT NULL", "(SELECT v FROM q)", k_facts,
+        ) + """),
+        vec AS (
+            SELECT id, score, row_number() OVER (ORDER BY score DESC) AS rank
+            FROM (""" + nearest_sql(
+                "documents", "id, 1 - (embedding <=> (SELECT v FROM q)) AS score",
+                project_clause + gate, "(SELECT v FROM q)", k_docs,
+            ) + """) s
+        ),
+        lex AS (""" + (_BM25_LEX_SQL.format(gate=gate) if lex_ids is not None else """
+            SELECT id, row_number() OVER (ORDER BY sim DESC, id) AS rank
+            FROM (
+                SELECT id, word_similarity((SELECT t FROM q), text) AS sim
+                FROM documents
+                WHERE """ + project_clause + """text ILIKE ANY(%s) AND """ + gate + """
+                ORDER BY sim DESC
+                LIMIT %s
+            ) s""") + """
+        ),
+        fused AS (
+            SELECT coalesce(vec.id, lex.id) AS id, vec.score, vec.rank AS vec_rank, lex.rank AS lex_rank,
+                   (coalesce(1.0 / (%s + vec.rank), 0) + coalesce(1.0 / (%s + lex.rank), 0))::float8 AS rrf
+            FROM vec FULL OUTER JOIN lex ON lex.id = vec.id
+            ORDER BY rrf DESC
+            LIMIT %s
+        )
+        SELECT 'facts' AS kind, value AS text, NULL::int AS page, source_page, key AS section, NULL::text AS source_path,
+               score, NULL::float8 AS rrf, NULL::bigint AS vec_rank, NULL::bigint AS lex_rank""" + fact_vec + """ FROM f
+        UNION ALL
+        SELECT 'docs', d.text, d.page, NULL::text, d.section, d.source_path,
+               fused.score, fused.rrf, fused.vec_rank, fused.lex_rank""" + doc_vec + """
+        FROM fused JOIN documents d ON d.id = fused.id
+        ORDER BY kind DESC, rrf DESC NULLS LAST, score DESC
+        """
+    lex_text = " ".join(terms)
+    if lex_ids is not None:
+        lex_params = [list(lex_ids), FACTS_SCORE_THRESHOLD]
+    else:
+        lex_params = project_params + [[f"%{t}%" for t in terms], FACTS_SCORE_THRESHOLD, k_docs]
+    params = (
+        [to_vector(qvec), lex_text]
+        + project_params + [k_facts]
+        + project_params + [FACTS_SCORE_THRESHOLD, k_docs]
+        + lex_params
+        + [RRF_K, RRF_K, k_docs]
+    )
+    return sql, tuple(params)
+
+def _hybrid_rows(rows, with_embeddings: bool = False) -> Tuple[List[Tuple[str, dict]], list]:
+    facts, docs = [], []
+    for kind, text, page, source_page, section, source_path, score, rrf, vec_rank, lex_rank, *vec in rows:
+        if kind == "facts":
+            facts.append((text, {"page": source_page, "key": section, "score": float(score)}))
+            continue
+        meta = _doc_tuple_to_meta((text, page, section, source_path, score or 0.0))
+        meta.update({"rrf": float(rrf), "vec_rank": vec_rank, "lex_rank": lex_rank})
+        docs.append((text, meta, as_vector(vec[0])) if with_embeddings else (text, meta))
+    return facts, docs
+
+def _hybrid_available() -> bool:
+    return (schema_registry.has_table("facts") and schema_registry.has_table("documents")
+            and (lexical_index.serves("documents") or schema_registry.has_extension("pg_trgm")))
+
+def _bm25_ids(question: str, k_docs: int, project_id: Optional[int]) -> Optional[List[int]]:
+    """BM25 document ranking for fusion when the in-process index serves documents, else None (trigram SQL)."""
+    if not lexical_index.serves("documents"):
+        return None
+    return lexical_index.search_ids("documents", question, k_docs, project_id)
+
+def search_hybrid(qvec: List[float], question: str, k_facts: int = 8, k_docs: int = 12, project_id: Optional[int] = None,
+                  with_embeddings: bool = False, recall_target: Optional[float] = None):
+    """
+    Facts plus RRF-fused (vector + trigram) documents in one round trip.
+    Returns (facts, docs) like search_vectors; doc metas carry rrf/vec_rank/lex_rank.
+    The lexical ranking comes from the BM25 index when BM25_INDEX is enabled.
+    """
+    terms = keyword_terms(question) or [question]
+    lex_ids = _bm25_ids(question, k_docs, project_id)
+    settings = search_settings(("facts", "documents"), max(k_facts, k_docs), recall_target)
+    with _pg() as con, con.cursor() as cur, applied(con, settings):
+        cur.execute(*_hybrid_sql(qvec, terms, k_facts, k_docs, project_id, with_embeddings, lex_ids),
+                    binary=with_embeddings)
+        return _hybrid_rows(cur.fetchall(), with_embeddings)
+
+async def asearch_hybrid(qvec: List[float], question: str, k_facts: int = 8, k_docs: int = 12, project_id: Optional[int] = None,
+                         with_embeddings: bool = False, recall_target: Optional[float] = None):
+    """Async variant of search_hybrid."""
+    terms = keyword_terms(question) or [question]
+    lex_ids = _bm25_ids(question, k_docs, project_id)
+    settings = search_settings(("facts", "documents"), max(k_facts, k_docs), recall_target)
+    async with _apg() as con, con.cursor() as cur, aapplied(con, settings):
+        await cur.execute(*_hybrid_sql(qvec, terms, k_facts, k_docs, project_id, with_embeddings, lex_ids),
+                          binary=with_embeddings)
+        return _hybrid_rows(await cur.fetchall(), with_embeddings)
+
+_PAYMENT_KEYWORDS = ("payment plan","payment schedule","possession linked","construction linked","clp","plp")
+
+def _retrieval_plan(q: str, k: int, overfetch: int, project_name: Optional[str]):
+    """Resolve project filter, intent tag and (payment-widened) k/overfetch for a query."""
     project_filter = detect_project_filter(q, project_name)
     tag = intent_tag(q)
+    if any(kw in q.lower() for kw in _PAYMENT_KEYWORDS):
+        overfetch = max(overfetch, 96)
+        k = max(k, 5)
+    return project_filter, tag, k, overfetch
+
+def _vector_result(q: str, facts, docs, k: int, tag: Optional[str], diversity: str = "tokens",
+                   mode: str = "docs") -> Optional[dict]:
+    """Facts-first short circuit, else MMR over docs (labelled `mode`); None when both are empty."""
+    if facts and facts[0][1].get("score", 0) >= FACTS_SCORE_THRESHOLD:
+        return {"mode":"facts", "answers":[facts[0][0]], "metas":[facts[0][1]]}
+    if docs:
+        documents, metadatas, *vectors = zip(*docs)
+        qtokens = tokenize(q)
+        top_docs, top_metas = mmr(list(documents), list(metadatas), qtokens, lambda_=0.75, topk=max(1,k), intent=tag,
+                                  diversity=diversity, embeddings=vectors[0] if vectors else None)
+        return {"mode":mode, "answers":top_docs, "metas":top_metas}
+    return None
+
+def _bm25_result(q: str, k: int, overfetch: int, project_id: Optional[int], project_filter: Optional[str],
+                 tag: Optional[str]) -> Optional[dict]:
+    """
+    retrieval_mode="bm25": documents from the in-process BM25 index, then OCR
+    pages, ranked without Postgres. None when the index is off or nothing matches.
+    """
+    if lexical_index.serves("documents"):
+        with span("bm25"):
+            docs = [(text, _doc_tuple_to_meta((text, page, section, source_path, s)))
+                    for (text, page, section, source_path), s
+                    in lexical_index.search("documents", q, overfetch, project=project_id)]
+        note(candidates=len(docs))
+        r = _vector_result(q, [], docs, k, tag, mode="bm25")
+        if r:
+            return r
+    if lexical_index.serves("ocr_pages"):
+        with span("bm25"):
+            pages = [(text, {"source": source_pdf, "page": page, "score": s})
+                     for (source_pdf, page, text), s
+                     in lexical_index.search("ocr_pages", q, overfetch, project_like=project_filter)]
+        note(ocr_candidates=len(pages))
+        return _vector_result(q, [], pages, k, tag, mode="ocr_bm25")
+    return None
+
+def needs_query_vector(retrieval_mode: Optional[str] = None) -> bool:
+    """Whether retrieval uses the query embedding: bm25 mode only embeds for the semantic cache."""
+    return SEMANTIC_CACHE_ENABLED or (retrieval_mode or RETRIEVAL_MODE) != "bm25"
+
+def _query_vector(q: str) -> Optional[List[float]]:
+    """Query embedding for the vector path; None in OCR-first mode or when embedding fails."""
+    if os.getenv("USE_OCR_SQL") == "1":
+        return None
+    try:
+        with span("embed"):
+            return _embed([q])[0]
+    except Exception as e:
+        print(f"[DEBUG] Query embedding failed: {e}")
+        return None
+
+async def _aquery_vector(q: str) -> Optional[List[float]]:
+    if os.getenv("USE_OCR_SQL") == "1":
+        return None
+    try:
+        with span("embed"):
+            return (await _aembed([q]))[0]
+    except Exception as e:
+        print(f"[DEBUG] Query embedding failed: {e}")
+        return None
+
+async def aquery_vectors(questions: Sequence[str]) -> List[Optional[List[float]]]:
+    """Query embeddings for a batch of questions in one API request (None each in OCR-first mode or on failure)."""
+    if os.getenv("USE_OCR_SQL") == "1" or not questions:
+        return [None] * len(questions)
+    try:
+        with span("embed"):
+            return await _aembed(list(questions))
+    except Exception as e:
+        print(f"[DEBUG] Batch query embedding failed: {e}")
+        return [None] * len(questions)
+
+def _semantic_partition(q: str, k: int, overfetch: int, project_id: Optional[int], project_name: Optional[str],
+                        diversity: str, retrieval_mode: str, recall_target: Optional[float] = None) -> tuple:
+    """
+    Semantic-cache partition: everything besides the wording that changes what
+    retrieval returns, including the project and intent detected in the text,
+    so "Trevoc payment plan" can never be served "Estate 360 payment plan".
+    """
+    project_filter, tag, k, overfetch = _retrieval_plan(q, k, overfetch, project_name)
+    return (project_id, project_filter, tag, k, overfetch, diversity, retrieval_mode, recall_target)
+
+def _retrieve_uncached(q: str, k: int = 3, overfetch: int = 48, project_id: Optional[int] = None, project_name: Optional[str] = None,
+                       diversity: Optional[str] = None, qvec: Optional[List[float]] = None, retrieval_mode: Optional[str] = None,
+                       recall_target: Optional[float] = None):
+    """Internal retrieve function without caching"""
+    diversity = diversity or MMR_DIVERSITY
+    retrieval_mode = retrieval_mode or RETRIEVAL_MODE
+    with span("project"):
+        schema_registry.ensure_fresh()
+        project_directory.ensure_fresh()
+        project_filter, tag, k, overfetch = _retrieval_plan(q, k, overfetch, project_name)
 
     # Convert project name to ID if provided but no ID given
     if project_id is None and project_filter:
-        project_id = get_project_id_from_name(project_filter)
+        with span("project"):
+            project_id = get_project_id_from_name(project_filter)
         if project_id:
             print(f"[project] Filtering by '{project_filter}' (ID: {project_id})")
 
-    if any(kw in q.lower() for kw in ("payment plan","payment schedule","possession linked","construction linked","clp","plp")):
-        overfetch = max(overfetch, 96)
-        k = max(k, 5)
-    use_ocr_first = os.getenv("USE_OCR_SQL") == "1"
-    if not use_ocr_first:
-        try:
-            qvec = _embed([q])[0]
-            facts = search_facts(qvec, k=8, project_id=project_id)
-            if facts and facts[0][1].get("score", 0) >= 0.5:
-                return {"mode":"facts", "answers":[facts[0][0]], "metas":[facts[0][1]]}
-            docs = search_docs(qvec, k=overfetch, project_id=project_id)
-            if docs:
-                documents, metadatas = zip(*docs)
-                qtokens = tokenize(q)
-                top_docs, top_metas = mmr(list(documents), list(metadatas), qtokens, lambda_=0.75, topk=max(1,k), intent=tag)
-                return {"mode":"docs", "answers":top_docs, "metas":top_metas}
-        except Exception as e:
-            # fall through to OCR SQL if embeddings/vector path fails
-            import traceback
-            print(f"[DEBUG] Vector search failed: {e}")
-            traceback.print_exc()
-            pass
-    r = retrieve_sql_trgm(q, k=k, overfetch=overfetch, project_like=project_filter, tag=tag)
-    if r["mode"] != "empty" and r["answers"]:
+    # In-memory BM25 hits need neither an embedding nor a connection
+    if retrieval_mode == "bm25":
+        r = _bm25_result(q, k, overfetch, project_id, project_filter, tag)
+        if r:
+            return r
+
+    # Embed (also after a BM25 miss) before borrowing a connection so the
+    # pooled connection is not held idle while waiting on the embeddings API.
+    if qvec is None:
+        qvec = _query_vector(q)
+
+    # One pooled connection serves every query of this retrieval
+    with _pg():
+        if qvec is not None:
+            try:
+                if retrieval_mode == "hybrid" and _hybrid_available():
+                    with span("hybrid_sql"):
+                        facts, docs = search_hybrid(qvec, q, k_facts=8, k_docs=overfetch, project_id=project_id,
+                                                    with_embeddings=diversity == "embedding", recall_target=recall_target)
+                    note(facts=len(facts), candidates=len(docs))
+                    r = _vector_result(q, facts, docs, k, tag, diversity, mode="hybrid")
+                else:
+                    with span("vector_sql"):
+                        facts, docs = search_vectors(qvec, k_facts=8, k_docs=overfetch, project_id=project_id,
+                                                     with_embeddings=diversity == "embedding", recall_target=recall_target)
+                    note(facts=len(facts), candidates=len(docs))
+                    r = _vector_result(q, facts, docs, k, tag, diversity)
+                if r:
+                    return r
+            except Exception as e:
+                # fall through to OCR SQL if the vector path fails
+                import traceback
+                print(f"[DEBUG] Vector search failed: {e}")
+                traceback.print_exc()
+                pass
+        r = retrieve_sql_trgm(q, k=k, overfetch=overfetch, project_like=project_filter, tag=tag)
+        if r["mode"] != "empty" and r["answers"]:
+            return r
+        r = retrieve_sql_ilike(q, k=k, overfetch=overfetch, project_like=project_filter, tag=tag)
         return r
-    r = retrieve_sql_ilike(q, k=k, overfetch=overfetch, project_like=project_filter, tag=tag)
-    return r
 
-def retrieve(q: str, k: int = 3, overfetch: int = 48, project_id: Optional[int] = None, project_name: Optional[str] = None):
+async def _aretrieve_uncached(q: str, k: int = 3, overfetch: int = 48, project_id: Optional[int] = None, project_name: Optional[str] = None,
+                              diversity: Optional[str] = None, qvec: Optional[List[float]] = None, retrieval_mode: Optional[str] = None,
+                              recall_target: Optional[float] = None):
+    """Async variant of _retrieve_uncached (AsyncOpenAI + async pool)."""
+    diversity = diversity or MMR_DIVERSITY
+    retrieval_mode = retrieval_mode or RETRIEVAL_MODE
+    with span("project"):
+        await schema_registry.aensure_fresh()
+        await project_directory.aensure_fresh()
+        project_filter, tag, k, overfetch = _retrieval_plan(q, k, overfetch, project_name)
+
+    if project_id is None and project_filter:
+        with span("project"):
+            project_id = get_project_id_from_name(project_filter)
+        if project_id:
+            print(f"[project] Filtering by '{project_filter}' (ID: {project_id})")
+
+    if retrieval_mode == "bm25":
+        r = _bm25_result(q, k, overfetch, project_id, project_filter, tag)
+        if r:
+            return r
+
+    if qvec is None:
+        qvec = await _aquery_vector(q)
+
+    async with _apg():
+        if qvec is not None:
+            try:
+                if retrieval_mode == "hybrid" and _hybrid_available():
+                    with span("hybrid_sql"):
+                        facts, docs = await asearch_hybrid(qvec, q, k_facts=8, k_docs=overfetch, project_id=project_id,
+                                                           with_embeddings=diversity == "embedding", recall_target=recall_target)
+                    note(facts=len(facts), candidates=len(docs))
+                    r = _vector_result(q, facts, docs, k, tag, diversity, mode="hybrid")
+                else:
+                    with span("vector_sql"):
+                        facts, docs = await asearch_vectors(qvec, k_facts=8, k_docs=overfetch, project_id=project_id,
+                                                            with_embeddings=diversity == "embedding", recall_target=recall_target)
+                    note(facts=len(facts), candidates=len(docs))
+                    r = _vector_result(q, facts, docs, k, tag, diversity)
+                if r:
+                    return r
+            except Exception as e:
+                import traceback
+                print(f"[DEBUG] Vector search failed: {e}")
+                traceback.print_exc()
+        r = await aretrieve_sql_trgm(q, k=k, overfetch=overfetch, project_like=project_filter, tag=tag)
+        if r["mode"] != "empty" and r["answers"]:
+            return r
+        return await aretrieve_sql_ilike(q, k=k, overfetch=overfetch, project_like=project_filter, tag=tag)
+
+def retrieve(q: str, k: int = 3, overfetch: int = 48, project_id: Optional[int] = None, project_name: Optional[str] = None,
+             diversity: Optional[str] = None, retrieval_mode: Optional[str] = None, recall_target: Optional[float] = None,
+             qvec: Optional[List[float]] = None):
     """
     Retrieve relevant documents for query (with caching).
 
     Cache key includes all parameters to ensure correct cache hits.
-    Cache TTL is 5 minutes.
+    Cache TTL is 5 minutes. Exact misses fall back to the semantic cache,
+    which serves paraphrases (cosine >= SEMANTIC_CACHE_THRESHOLD) of recent
+    queries with the same retrieval parameters. Concurrent misses for the
+    same key are coalesced: one caller retrieves, the rest wait for it.
+    Pass qvec when the query embedding is already known (batch requests).
     """
     # Build cache key from all parameters
-    cache_key = f"{q}:{k}:{overfetch}:{project_id}:{project_name}"
+    diversity = diversity or MMR_DIVERSITY
+    retrieval_mode = retrieval_mode or RETRIEVAL_MODE
+    cache_key = _cache_key(q, k, overfetch, project_id, project_name, diversity, retrieval_mode, recall_target)
 
     # Check cache first
     if cache_key in _query_cache:
         print("[cache] Query result cache hit")
+        note(query_cache="hit")
         return _query_cache[cache_key]
+    note(query_cache="miss")
+
+    return retrieve_flight.do(cache_key, lambda: _retrieve_miss(
+        q, cache_key, k, overfetch, project_id, project_name, diversity, retrieval_mode, recall_target, qvec))
+
+def _retrieve_miss(q: str, cache_key: str, k: int, overfetch: int, project_id: Optional[int], project_name: Optional[str],
+                   diversity: str, retrieval_mode: str, recall_target: Optional[float], qvec: Optional[List[float]] = None):
+    # Exact miss - try a paraphrase of a recent query
+    if qvec is None and needs_query_vector(retrieval_mode):
+        qvec = _query_vector(q)
+    use_semantic = SEMANTIC_CACHE_ENABLED and qvec is not None
+    if use_semantic:
+        partition = _semantic_partition(q, k, overfetch, project_id, project_name, diversity, retrieval_mode, recall_target)
+        result = semantic_cache.get(partition, qvec)
+        note(semantic_cache="hit" if result is not None else "miss")
+        if result is not None:
+            print("[cache] Semantic cache hit")
+            _query_cache[cache_key] = result
+            return result
 
     # Cache miss - perform retrieval
-    result = _retrieve_uncached(q, k, overfetch, project_id, project_name)
+    result = _retrieve_uncached(q, k, overfetch, project_id, project_name, diversity, qvec=qvec,
+                                retrieval_mode=retrieval_mode, recall_target=recall_target)
 
     # Store in cache
     _query_cache[cache_key] = result
+    if use_semantic:
+        semantic_cache.put(partition, qvec, result)
+
+    return result
 
+async def aretrieve(q: str, k: int = 3, overfetch: int = 48, project_id: Optional[int] = None, project_name: Optional[str] = None,
+                    diversity: Optional[str] = None, retrieval_mode: Optional[str] = None, recall_target: Optional[float] = None,
+                    qvec: Optional[List[float]] = None):
+    """Async variant of retrieve(); shares the same exact and semantic caches."""
+    diversity = diversity or MMR_DIVERSITY
+    retrieval_mode = retrieval_mode or RETRIEVAL_MODE
+    cache_key = _cache_key(q, k, overfetch, project_id, project_name, diversity, retrieval_mode, recall_target)
+    if cache_key in _query_cache:
+        print("[cache] Query result cache hit")
+        note(query_cache="hit")
+        return _query_cache[cache_key]
+    note(query_cache="miss")
+    return await retrieve_flight.ado(cache_key, lambda: _aretrieve_miss(
+        q, cache_key, k, overfetch, project_id, project_name, diversity, retrieval_mode, recall_target, qvec))
+
+async def _aretrieve_miss(q: str, cache_key: str, k: int, overfetch: int, project_id: Optional[int],
+                          project_name: Optional[str], diversity: str, retrieval_mode: str, recall_target: Optional[float],
+                          qvec: Optional[List[float]] = None):
+    if qvec is None and needs_query_vector(retrieval_mode):
+        qvec = await _aquery_vector(q)
+    use_semantic = SEMANTIC_CACHE_ENABLED and qvec is not None
+    if use_semantic:
+        partition = _semantic_partition(q, k, overfetch, project_id, project_name, diversity, retrieval_mode, recall_target)
+        result = semantic_cache.get(partition, qvec)
+        note(semantic_cache="hit" if result is not None else "miss")
+        if result is not None:
+            print("[cache] Semantic cache hit")
+            _query_cache[cache_key] = result
+            return result
+    result = await _aretrieve_uncached(q, k, overfetch, project_id, project_name, diversity, qvec=qvec,
+                                       retrieval_mode=retrieval_mode, recall_target=recall_target)
+    _query_cache[cache_key] = result
+    if use_semantic:
+        semantic_cache.put(partition, qvec, result)
     return result
 
 def strip_tags(s: str) -> str:
@@ -597,19 +1138,31 @@ def normalize(ctx: str) -> str:
 
     return ctx.strip()
 
-def answer_from_retrieval(q: str, retrieval: dict, model: str = "gpt-4.1-mini") -> dict:
+def _prepare_answer(q: str, retrieval: dict, model: Optional[str] = None) -> Tuple[Optional[str], dict]:
+    """
+    Build the summarizer prompt for a retrieval.
+
+    Returns (prompt, base). When prompt is None, `base` already is the final
+    answer (facts hit, empty context or no API key); otherwise `base` carries
+    mode/sources (of the chunks that made it into the context), prompt_tokens
+    and packing stats for the caller to attach the chat reply to.
+    """
     mode = retrieval.get("mode", "empty")
     answers = retrieval.get("answers") or []
     metas = retrieval.get("metas") or []
     if mode == "facts" and answers:
         primary = metas[0] if metas else {}
         source = f"{primary.get('source','Brochure')} p.{primary.get('page','?')}"
-        return {"answer": answers[0], "mode": "facts", "sources": [{"source": source, **primary}]}
+        return None, {"answer": answers[0], "mode": "facts", "sources": [{"source": source, **primary}]}
     if not answers:
-        return {"answer": "Not in the documents.", "mode": mode, "sources": metas}
-    ctx = normalize("\n\n".join(answers))
+        return None, {"answer": "Not in the documents.", "mode": mode, "sources": metas}
+    # Fit the model's token budget: dedupe neighbour-page text, keep the top MMR chunks and whole tables
+    with span("pack"):
+        packed = pack_context(answers, model=model)
+    metas = [metas[i] for i in packed.used if i < len(metas)]
+    ctx = normalize(packed.text)
     if not ctx.strip():
-        return {"answer": "Not in the documents.", "mode": mode, "sources": metas}
+        return None, {"answer": "Not in the documents.", "mode": mode, "sources": metas}
     source_hint = ""
     if metas:
         # try to infer a single project name from sources
@@ -625,9 +1178,98 @@ def answer_from_retrieval(q: str, retrieval: dict, model: str = "gpt-4.1-mini")
         f"Question: {q}\nAnswer:"
     )
     if not OPENAI_API_KEY:
-        return {"answer": "Not in the documents.", "mode": mode, "sources": metas}
-    reply = _chat(prompt, model=model) or "Not in the documents."
-    return {"answer": reply, "mode": mode, "sources": metas}
+        return None, {"answer": "Not in the documents.", "mode": mode, "sources": metas}
+    prompt_tokens = count_tokens(prompt, model)
+    note(prompt_tokens=prompt_tokens, context_chunks=packed.chunks_used)
+    return prompt, {"mode": mode, "sources": metas, "prompt_tokens": prompt_tokens, "context": packed.stats()}
+
+def _answer_key(q: str, retrieval: dict, model: str) -> Tuple[str, List[str]]:
+    """
+    Answer-cache and coalescing key (normalized question, model, context
+    fingerprint), plus the sources the context came from.
+    """
+    ids, sources = context_ids(retrieval.get("metas") or [])
+    return answer_key(q, model, retrieval.get("answers") or [], ids), sources
+
+def _chat_and_cache(prompt: str, model: str, key: str, sources: List[str]) -> Optional[str]:
+    start = time.perf_counter()
+    with span("chat"):
+        reply = _chat(prompt, model=model)
+    if reply and ANSWER_CACHE_ENABLED:
+        answer_cache.put(key, reply, sources, (time.perf_counter() - start) * 1000)
+    return reply
+
+async def _achat_and_cache(prompt: str, model: str, key: str, sources: List[str]) -> Optional[str]:
+    start = time.perf_counter()
+    with span("chat"):
+        reply = await _achat(prompt, model=model)
+    if reply and ANSWER_CACHE_ENABLED:
+        await answer_cache.aput(key, reply, sources, (time.perf_counter() - start) * 1000)
+    return reply
+
+def answer_from_retrieval(q: str, retrieval: dict, model: str = "gpt-4.1-mini") -> dict:
+    """
+    Summarize a retrieval with the chat model. Answers are cached per
+    question + context (see utils.answer_cache); `answer_cache` in the
+    result says whether this one was a hit.
+    """
+    prompt, base = _prepare_answer(q, retrieval, model)
+    if prompt is None:
+        return base
+    key, sources = _answer_key(q, retrieval, model)
+    cached = answer_cache.get(key) if ANSWER_CACHE_ENABLED else None
+    note(answer_cache="hit" if cached is not None else "miss")
+    if cached is not None:
+        return {"answer": cached, **base, "answer_cache": "hit"}
+    reply = answer_flight.do(key, lambda: _chat_and_cache(prompt, model, key, sources))
+    return {"answer": reply or "Not in the documents.", **base, "answer_cache": "miss"}
+
+async def aanswer_from_retrieval(q: str, retrieval: dict, model: str = "gpt-4.1-mini") -> dict:
+    """Async variant of answer_from_retrieval (AsyncOpenAI)."""
+    prompt, base = _prepare_answer(q, retrieval, model)
+    if prompt is None:
+        return base
+    key, sources = _answer_key(q, retrieval, model)
+    cached = await answer_cache.aget(key) if ANSWER_CACHE_ENABLED else None
+    note(answer_cache="hit" if cached is not None else "miss")
+    if cached is not None:
+        return {"answer": cached, **base, "answer_cache": "hit"}
+    reply = await answer_flight.ado(key, lambda: _achat_and_cache(prompt, model, key, sources))
+    return {"answer": reply or "Not in the documents.", **base, "answer_cache": "miss"}
+
+async def astream_answer(q: str, retrieval: dict, model: str = "gpt-4.1-mini"):
+    """
+    Streaming variant of aanswer_from_retrieval, as (event, data) pairs:
+    ("sources", {mode, sources}) once, ("token", text) per chat delta, then
+    ("done", result) with the same dict aanswer_from_retrieval returns.
+    Cached and non-chat answers (facts, empty context) arrive as one token.
+    """
+    prompt, base = _prepare_answer(q, retrieval, model)
+    yield "sources", {"mode": base["mode"], "sources": base["sources"]}
+    if prompt is None:
+        yield "token", base["answer"]
+        yield "done", base
+        return
+    key, sources = _answer_key(q, retrieval, model)
+    cached = await answer_cache.aget(key) if ANSWER_CACHE_ENABLED else None
+    note(answer_cache="hit" if cached is not None else "miss")
+    if cached is not None:
+        yield "token", cached
+        yield "done", {"answer": cached, **base, "answer_cache": "hit"}
+        return
+    start = time.perf_counter()
+    parts = []
+    with span("chat"):
+        async for delta in _achat_stream(prompt, model=model):
+            parts.append(delta)
+            yield "token", delta
+    reply = "".join(parts)
+    if reply and ANSWER_CACHE_ENABLED:
+        await answer_cache.aput(key, reply, sources, (time.perf_counter() - start) * 1000)
+    if not reply:
+        reply = "Not in the documents."
+        yield "token", reply
+    yield "done", {"answer": reply, **base, "answer_cache": "miss"}
 
 def show(q: str, k: int = 3, project_id: Optional[int] = None, project_name: Optional[str] = None):
     r = retrieve(q, k, project_id=project_id, project_name=project_name)
@@ -644,12 +1286,24 @@ def rag(q: str, k: int = 3, project_id: Optional[int] = None, project_name: Opti
     Full RAG pipeline:
       1) retrieve() using vector path (facts/docs) or OCR SQL fallback per USE_OCR_SQL.
       2) summarize with answer_from_retrieval() using chat model.
-    Returns a dict: {"answer": str, "mode": str, "sources": list[dict]}.
+    Returns a dict: {"answer": str, "mode": str, "sources": list[dict], "timings": dict}
+    (timings: per-stage ms, cache flags and candidate counts, see utils.timing).
     """
     if model is None:
         model = os.getenv("CHAT_MODEL", "gpt-4.1-mini")
-    r = retrieve(q, k=k, project_id=project_id, project_name=project_name)
-    return answer_from_retrieval(q, r, model=model)
+    with collect() as timings:
+        r = retrieve(q, k=k, project_id=project_id, project_name=project_name)
+        answer = answer_from_retrieval(q, r, model=model)
+    return {**answer, "timings": timings.as_dict()}
+
+async def arag(q: str, k: int = 3, project_id: Optional[int] = None, project_name: Optional[str] = None, model: str = None) -> dict:
+    """Async variant of rag()."""
+    if model is None:
+        model = os.getenv("CHAT_MODEL", "gpt-4.1-mini")
+    with collect() as timings:
+        r = await aretrieve(q, k=k, project_id=project_id, project_name=project_name)
+        answer = await aanswer_from_retrieval(q, r, model=model)
+    return {**answer, "timings": timings.as_dict()}
 
 # -----------------------------
 # CLI
@@ -665,17 +1319,19 @@ if __name__ == "__main__":
 
     # DB health
     try:
+        schema_registry.refresh()
+        project_directory.refresh()
         with _pg() as con, con.cursor() as cur:
             docs_n = 0
             ocr_n = 0
             # documents table is optional; only count if present
-            if _table_exists(cur, "documents"):
+            if schema_registry.has_table("documents"):
                 cur.execute("SELECT count(*) FROM documents")
                 docs_n = cur.fetchone()[0]
             else:
                 print("[db] documents table missing; skipping vector search path.")
             # ocr_pages is the fallback path used by SQL ILIKE/pg_trgm
-            if _table_exists(cur, "ocr_pages"):
+            if schema_registry.has_table("ocr_pages"):
                 cur.execute("SELECT count(*) FROM ocr_pages")
                 ocr_n = cur.fetchone()[0]
             print(f"[db] counts -> documents:{docs_n} ocr_pages:{ocr_n}")
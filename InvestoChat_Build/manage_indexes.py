@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+pgvector index management.
+
+Usage:
+    python manage_indexes.py status
+    python manage_indexes.py hnsw --table documents [--m 16] [--ef-construction 64]
+    python manage_indexes.py ivfflat --table facts [--lists N]    # N defaults to rows-based sizing
+    python manage_indexes.py hnsw --table all
+    python manage_indexes.py compact --table all --mode halfvec [--drop-full]
+
+Indexes are rebuilt without blocking reads: the replacement is built
+CONCURRENTLY under a temporary name, then swapped in for the old one.
+Afterwards, calibrate the recall knobs with benchmarks/bench_vector_index.py.
+
+`compact` adds an HNSW index over a compact expression of the embedding
+(halfvec / bit / sub256 / sub512) next to the full one; set VECTOR_STORAGE
+to that mode to search it with full-precision rerank, and compare modes with
+benchmarks/bench_vector_storage.py before dropping the full index.
+"""
+
+import os
+import argparse
+from typing import List, Optional, Tuple
+
+import psycopg
+from dotenv import load_dotenv
+
+from retrieval.vector_index import (
+    HNSW_EF_CONSTRUCTION,
+    HNSW_M,
+    STORAGE_MODES,
+    VECTOR_TABLES,
+    storage_mode_of,
+    hnsw_index_sql,
+    ivfflat_index_sql,
+    ivfflat_lists_for,
+)
+from utils.schema import SchemaRegistry
+
+load_dotenv()
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+_INDEXES_SQL = """
+    SELECT i.indexname, i.indexdef, pg_relation_size(c.oid)
+    FROM pg_indexes i
+    JOIN pg_class c ON c.relname = i.indexname
+    JOIN pg_namespace n ON n.oid = c.relnamespace AND n.nspname = i.schemaname
+    WHERE i.schemaname = ANY(current_schemas(false)) AND i.tablename = %s
+      AND i.indexdef ~* 'USING (hnsw|ivfflat)'
+"""
+
+
+def _connect() -> psycopg.Connection:
+    if not DATABASE_URL:
+        raise SystemExit("DATABASE_URL not set; add it to InvestoChat_Build/.env")
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block
+    return psycopg.connect(DATABASE_URL, autocommit=True)
+
+
+def _tables(arg: str) -> List[str]:
+    return list(VECTOR_TABLES) if arg == "all" else [arg]
+
+
+def _schema(cur) -> SchemaRegistry:
+    schema = SchemaRegistry()
+    schema.load(cur)
+    return schema
+
+
+def _vector_indexes(cur, table: str) -> List[Tuple[str, str, int]]:
+    cur.execute(_INDEXES_SQL, (table,))
+    return cur.fetchall()
+
+
+def _row_count(cur, table: str) -> int:
+    cur.execute(f"SELECT count(*) FROM {table} WHERE embedding IS NOT NULL")
+    return cur.fetchone()[0]
+
+
+def status():
+    with _connect() as con, con.cursor() as cur:
+        schema = _schema(cur)
+        for table in VECTOR_TABLES:
+            if not schema.has_table(table):
+                continue
+            print(f"{table}: {_row_count(cur, table)} embedded rows")
+            indexes = _vector_indexes(cur, table)
+            if not indexes:
+                print("  (no vector index: exact scans only)")
+            for name, definition, size in indexes:
+                print(f"  {name} [{storage_mode_of(definition)}, {size / 1024 / 1024:.1f} MB]\n    {definition}")
+
+
+def _swap(cur, table: str, create_sql_for) -> None:
+    """Build the new index under a temp name, drop the old full-precision index(es), rename into place."""
+    old = [row for row in _vector_indexes(cur, table) if storage_mode_of(row[1]) == "full"]
+    name = old[0][0] if old else f"idx_{table}_embedding"
+    tmp = f"{name}_rebuild"
+    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {tmp}")
+    sql = create_sql_for(tmp)
+    print(f"[{table}] {sql}")
+    cur.execute(sql)
+    for old_name, _, _ in old:
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {old_name}")
+    cur.execute(f"ALTER INDEX {tmp} RENAME TO {name}")
+    cur.execute(f"ANALYZE {table}")
+    print(f"[{table}] {name} ready")
+
+
+def build_hnsw(table: str, m: int, ef_construction: int, maintenance_work_mem: Optional[str]):
+    with _connect() as con, con.cursor() as cur:
+        if not _schema(cur).has_table(table):
+            print(f"[{table}] missing; skipped")
+            return
+        if maintenance_work_mem:
+            cur.execute("SELECT set_config('maintenance_work_mem', %s, false)", (maintenance_work_mem,))
+        _swap(cur, table, lambda name: hnsw_index_sql(table, name, m, ef_construction))
+
+
+def build_ivfflat(table: str, lists: Optional[int], maintenance_work_mem: Optional[str]):
+    with _connect() as con, con.cursor() as cur:
+        if not _schema(cur).has_table(table):
+            print(f"[{table}] missing; skipped")
+            return
+        rows = _row_count(cur, table)
+        if rows == 0:
+            # ivfflat centroids are trained on existing rows; an empty build is useless
+            raise SystemExit(f"[{table}] has no embedded rows; load data first or use hnsw")
+        lists = lists or ivfflat_lists_for(rows)
+        if maintenance_work_mem:
+            cur.execute("SELECT set_config('maintenance_work_mem', %s, false)", (maintenance_work_mem,))
+        print(f"[{table}] {rows} rows -> lists={lists}")
+        _swap(cur, table, lambda name: ivfflat_index_sql(table, name, lists))
+
+
+def build_compact(table: str, mode: str, m: int, ef_construction: int, drop_full: bool,
+                  maintenance_work_mem: Optional[str]):
+    spec = STORAGE_MODES[mode]
+    with _connect() as con, con.cursor() as cur:
+        if not _schema(cur).has_table(table):
+            print(f"[{table}] missing; skipped")
+            return
+        if maintenance_work_mem:
+            cur.execute("SELECT set_config('maintenance_work_mem', %s, false)", (maintenance_work_mem,))
+        existing = _vector_indexes(cur, table)
+        name = f"idx_{table}_embedding_{mode}"
+        if any(storage_mode_of(definition) == mode for _, definition, _ in existing):
+            print(f"[{table}] {mode} index already present")
+        else:
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")  # leftover of an interrupted build
+            sql = hnsw_index_sql(table, name, m, ef_construction, expression=spec.expression, opclass=spec.opclass)
+            print(f"[{table}] {sql}")
+            cur.execute(sql)
+            print(f"[{table}] {name} ready")
+        if drop_full:
+            for old_name, definition, _ in existing:
+                if storage_mode_of(definition) == "full":
+                    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {old_name}")
+                    print(f"[{table}] dropped {old_name}")
+        cur.execute(f"ANALYZE {table}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pgvector index management")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    sub.add_parser("status", help="Show vector indexes, parameters and sizes")
+
+    hnsw = sub.add_parser("hnsw", help="(Re)build an HNSW index")
+    hnsw.add_argument("--table", choices=[*VECTOR_TABLES, "all"], required=True)
+    hnsw.add_argument("--m", type=int, default=HNSW_M, help="Graph degree")
+    hnsw.add_argument("--ef-construction", type=int, default=HNSW_EF_CONSTRUCTION, help="Build-time candidate list size")
+    hnsw.add_argument("--maintenance-work-mem", help="e.g. 1GB (faster builds when the graph fits in memory)")
+
+    ivf = sub.add_parser("ivfflat", help="(Re)build an ivfflat index with lists sized to the row count")
+    ivf.add_argument("--table", choices=[*VECTOR_TABLES, "all"], required=True)
+    ivf.add_argument("--lists", type=int, help="Override the rows-based list count")
+    ivf.add_argument("--maintenance-work-mem")
+
+    compact = sub.add_parser("compact", help="Build an HNSW index over a compact embedding expression")
+    compact.add_argument("--table", choices=[*VECTOR_TABLES, "all"], required=True)
+    compact.add_argument("--mode", choices=[m for m in STORAGE_MODES if m != "full"], required=True)
+    compact.add_argument("--m", type=int, default=HNSW_M)
+    compact.add_argument("--ef-construction", type=int, default=HNSW_EF_CONSTRUCTION)
+    compact.add_argument("--drop-full", action="store_true", help="Drop the full-precision index afterwards")
+    compact.add_argument("--maintenance-work-mem")
+
+    args = parser.parse_args()
+
+    if args.cmd == "status":
+        status()
+    elif args.cmd == "hnsw":
+        for table in _tables(args.table):
+            build_hnsw(table, args.m, args.ef_construction, args.maintenance_work_mem)
+    elif args.cmd == "ivfflat":
+        for table in _tables(args.table):
+            build_ivfflat(table, args.lists, args.maintenance_work_mem)
+    elif args.cmd == "compact":
+        for table in _tables(args.table):
+            build_compact(table, args.mode, args.m, args.ef_construction, args.drop_full, args.maintenance_work_mem)
+    else:
+        parser.error(f"unknown command {args.cmd}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Optional in-process vector index (LOCAL_ANN=1).
+
+The brochure corpus is a few thousand chunks per project, so exact search
+over a float32 matrix in RAM (one BLAS matmul per query) is both faster and
+more accurate than a round trip to an ivfflat index. Postgres stays the
+source of truth: tables are loaded at startup, partitioned by project_id,
+and a background thread polls a cheap per-table signature, appending new
+rows by id and reloading a table only when rows were changed or deleted.
+"""
+
+import os
+import time
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.db import _pg
+from utils.schema import schema_registry
+from utils.vector import as_vector
+
+LOCAL_ANN = os.getenv("LOCAL_ANN", "0") == "1"
+LOCAL_ANN_REFRESH = float(os.getenv("LOCAL_ANN_REFRESH", "30"))
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    name: str
+    payload: str    # columns returned with each hit, in order
+    signature: str  # aggregate that changes whenever the indexed rows do
+
+
+TABLES: Dict[str, TableSpec] = {
+    "documents": TableSpec("documents", "text, page, section, source_path", "count(*), max(id)"),
+    # facts are upserted in place (same id), so hash their content too
+    "facts": TableSpec("facts", "value, source_page, key", "count(*), max(id), sum(hashtext(key || value))"),
+    "document_tables": TableSpec(
+        "document_tables", "markdown_content, page, table_type, source_path", "count(*), max(id)"
+    ),
+}
+
+
+class _Partition:
+    """Rows of one table for one project: ids, unit-norm vectors, payload tuples."""
+
+    def __init__(self, ids: np.ndarray, matrix: np.ndarray, payloads: List[tuple]):
+        self.ids = ids
+        self.matrix = matrix
+        self.payloads = payloads
+
+    @classmethod
+    def build(cls, rows: Sequence[Tuple[int, tuple, np.ndarray]]) -> "_Partition":
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        matrix = np.stack([r[2] for r in rows]).astype(np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1.0, norms)
+        return cls(ids, matrix, [r[1] for r in rows])
+
+    def extend(self, other: "_Partition") -> "_Partition":
+        return _Partition(
+            np.concatenate([self.ids, other.ids]),
+            np.concatenate([self.matrix, other.matrix]),
+            self.payloads + other.payloads,
+        )
+
+    def top(self, q: np.ndarray, k: int) -> List[Tuple[float, int]]:
+        """(cosine similarity, row index) of the k nearest rows, best first."""
+        sims = self.matrix @ q
+        k = min(k, sims.shape[0])
+        if k <= 0:
+            return []
+        idx = np.argpartition(-sims, k - 1)[:k]
+        idx = idx[np.argsort(-sims[idx], kind="stable")]
+        return [(float(sims[i]), int(i)) for i in idx]
+
+
+class LocalVectorIndex:
+    def __init__(self, tables: Dict[str, TableSpec] = None, refresh_interval: float = LOCAL_ANN_REFRESH):
+        self.specs = dict(tables or TABLES)
+        self.refresh_interval = refresh_interval
+        self._parts: Dict[str, Dict[Optional[int], _Partition]] = {}
+        self._signatures: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.loaded_at: Optional[float] = None
+        self.last_refresh_ms: Optional[float] = None
+
+    # -- loading -------------------------------------------------------------
+    def _fetch(self, cur, spec: TableSpec, after_id: Optional[int] = None) -> Dict[Optional[int], _Partition]:
+        sql = f"SELECT id, project_id, {spec.payload}, embedding FROM {spec.name} WHERE embedding IS NOT NULL"
+        params: tuple = ()
+        if after_id is not None:
+            sql += " AND id > %s"
+            params = (after_id,)
+        cur.execute(sql + " ORDER BY id", params, binary=True)
+        grouped: Dict[Optional[int], list] = {}
+        for row in cur.fetchall():
+            grouped.setdefault(row[1], []).append((row[0], tuple(row[2:-1]), as_vector(row[-1])))
+        return {pid: _Partition.build(rows) for pid, rows in grouped.items()}
+
+    def _signature(self, cur, spec: TableSpec) -> tuple:
+        cur.execute(f"SELECT {spec.signature} FROM {spec.name}")
+        return tuple(cur.fetchone())
+
+    def _refresh_table(self, cur, spec: TableSpec) -> None:
+        signature = self._signature(cur, spec)
+        previous = self._signatures.get(spec.name)
+        if signature == previous and spec.name in self._parts:
+            return
+        parts = self._parts.get(spec.name)
+        appended = None
+        # Pure append (count grew by exactly the rows past the old max id): fetch only those
+        if parts is not None and previous and len(signature) == 2 and previous[1] is not None:
+            fresh = self._fetch(cur, spec, after_id=previous[1])
+            if previous[0] + sum(p.ids.shape[0] for p in fresh.values()) == signature[0]:
+                appended = dict(parts)
+                for pid, part in fresh.items():
+                    appended[pid] = appended[pid].extend(part) if pid in appended else part
+        new_parts = appended if appended is not None else self._fetch(cur, spec)
+        with self._lock:
+            self._parts[spec.name] = new_parts
+            self._signatures[spec.name] = signature
+
+    def refresh(self) -> None:
+        """Load tables not loaded yet and bring loaded ones up to date."""
+        start = time.perf_counter()
+        with _pg() as con, con.cursor() as cur:
+            for spec in self.specs.values():
+                if schema_registry.has_table(spec.name):
+                    self._refresh_table(cur, spec)
+        self.last_refresh_ms = (time.perf_counter() - start) * 1000
+        if self.loaded_at is None:
+            self.loaded_at = time.time()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[warn] local vector index refresh failed: {e}")
+
+    def start(self) -> None:
+        """Start the background refresh thread (idempotent)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="local-ann-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # -- search --------------------------------------------------------------
+    def serves(self, table: str) -> bool:
+        return LOCAL_ANN and table in self._parts
+
+    def search(self, table: str, qvec: Sequence[float], k: int,
+               project_id: Optional[int] = None) -> List[Tuple[tuple, float, np.ndarray]]:
+        """
+        k nearest rows of `table` by cosine similarity as (payload, score,
+        unit vector), optionally restricted to one project.
+        """
+        q = np.asarray(qvec, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        parts = self._parts.get(table, {})
+        if project_id is not None:
+            parts = {project_id: parts[project_id]} if project_id in parts else {}
+        hits = []
+        for part in parts.values():
+            hits.extend((s, i, part) for s, i in part.top(q, k))
+        hits.sort(key=lambda h: -h[0])
+        return [(part.payloads[i], s, part.matrix[i]) for s, i, part in hits[:k]]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": LOCAL_ANN,
+            "loaded_at": self.loaded_at,
+            "last_refresh_ms": round(self.last_refresh_ms, 1) if self.last_refresh_ms is not None else None,
+            "tables": {
+                name: {
+                    "rows": sum(p.ids.shape[0] for p in parts.values()),
+                    "projects": len(parts),
+                    "bytes": sum(p.matrix.nbytes for p in parts.values()),
+                }
+                for name, parts in self._parts.items()
+            },
+        }
+
+
+local_index = LocalVectorIndex()
@@ -0,0 +1,397 @@
+"""
+Optional in-process BM25 lexical index (BM25_INDEX=1).
+
+Built from `documents` and `ocr_pages` text with the same tokenizer as MMR
+(utils.text.domain_tokens). Postings are CSR arrays (per-term slices of
+document indices and term frequencies), so scoring a query is a handful of
+NumPy gathers with no Postgres round trip.
+
+New rows are indexed as an extra segment (looked up by id, like the local
+vector index); changed or deleted rows force a rebuild, and segments are
+merged once there are more than BM25_MAX_SEGMENTS. Each table's index is
+persisted to BM25_INDEX_DIR/bm25_<table>.npz, so a restart (or the service
+after an ingest run) only fetches rows added since the last save.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.db import _pg
+from utils.schema import schema_registry
+from utils.text import domain_tokens
+
+BM25_INDEX = os.getenv("BM25_INDEX", "0") == "1"
+BM25_INDEX_DIR = Path(os.getenv("BM25_INDEX_DIR", str(Path(__file__).resolve().parent.parent / "workspace")))
+BM25_REFRESH = float(os.getenv("BM25_REFRESH", "30"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+BM25_MAX_SEGMENTS = int(os.getenv("BM25_MAX_SEGMENTS", "8"))
+
+
+@dataclass(frozen=True)
+class LexicalSpec:
+    name: str
+    payload: str    # columns returned with each hit, in order
+    text: int       # position of the indexed text within payload
+    project: str    # column used for the project filter
+    signature: str  # aggregate that changes whenever the indexed rows do
+
+
+TABLES: Dict[str, LexicalSpec] = {
+    "documents": LexicalSpec("documents", "text, page, section, source_path", 0, "project_id", "count(*), max(id)"),
+    # ocr_pages are upserted in place (same id), so hash their text too
+    "ocr_pages": LexicalSpec(
+        "ocr_pages", "source_pdf, page, text", 2, "project", "count(*), max(id), sum(hashtext(text))"
+    ),
+}
+
+
+class _Segment:
+    """CSR postings for one batch of documents: term t -> docs[indptr[t]:indptr[t+1]]."""
+
+    def __init__(self, indptr: np.ndarray, docs: np.ndarray, tf: np.ndarray):
+        self.indptr = indptr
+        self.docs = docs
+        self.tf = tf
+
+    @property
+    def n_terms(self) -> int:
+        return self.indptr.shape[0] - 1
+
+    def postings(self, tid: int) -> Tuple[np.ndarray, np.ndarray]:
+        if tid >= self.n_terms:
+            return self.docs[:0], self.tf[:0]
+        s, e = self.indptr[tid], self.indptr[tid + 1]
+        return self.docs[s:e], self.tf[s:e]
+
+    def df(self, n_terms: int, alive: np.ndarray) -> np.ndarray:
+        """Document frequency per term, counting live documents only."""
+        terms = np.repeat(np.arange(self.n_terms), np.diff(self.indptr))
+        return np.bincount(terms[alive[self.docs]], minlength=n_terms)
+
+
+class BM25Index:
+    """
+    BM25 over one table. Document indices are positions in the id / length /
+    project arrays; payloads[i][text_field] is the indexed text (kept so
+    segments can be merged without going back to Postgres).
+    """
+
+    def __init__(self, text_field: int = 0, k1: float = BM25_K1, b: float = BM25_B):
+        self.text_field = text_field
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = {}
+        self.segments: List[_Segment] = []
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.lengths = np.zeros(0, dtype=np.float32)
+        self.projects = np.zeros(0, dtype=np.int32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.payloads: List[tuple] = []
+        self.project_codes: Dict[Any, int] = {}
+        self._positions: Dict[int, int] = {}
+        self._idf = np.zeros(0, dtype=np.float32)
+        self._norm = np.zeros(0, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return int(self.alive.sum())
+
+    # -- building ------------------------------------------------------------
+    def _segment(self, start: int, token_lists: Sequence[List[str]]) -> _Segment:
+        terms, docs, tfs = [], [], []
+        for i, tokens in enumerate(token_lists):
+            for term, tf in Counter(tokens).items():
+                terms.append(self.vocab.setdefault(term, len(self.vocab)))
+                docs.append(start + i)
+                tfs.append(tf)
+        terms_arr = np.asarray(terms, dtype=np.int32)
+        order = np.argsort(terms_arr, kind="stable")
+        indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms_arr, minlength=len(self.vocab)), out=indptr[1:])
+        return _Segment(indptr, np.asarray(docs, dtype=np.int32)[order], np.asarray(tfs, dtype=np.float32)[order])
+
+    def _stats(self) -> None:
+        """Recompute idf and per-document length normalisation after a change."""
+        df = np.zeros(len(self.vocab), dtype=np.int64)
+        for seg in self.segments:
+            df += seg.df(len(self.vocab), self.alive)
+        n = max(len(self), 1)
+        self._idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = float(self.lengths[self.alive].mean()) if len(self) else 1.0
+        self._norm = (self.k1 * (1 - self.b + self.b * self.lengths / max(avgdl, 1e-9))).astype(np.float32)
+
+    def add(self, rows: Iterable[Tuple[int, Any, tuple]]) -> int:
+        """Index (id, project, payload) rows as a new segment; re-added ids replace their old entry."""
+        rows = list(rows)
+        if not rows:
+            return 0
+        start = self.ids.shape[0]
+        tokens = [domain_tokens(payload[self.text_field] or "") for _, _, payload in rows]
+        for _id, _, _ in rows:
+            old = self._positions.get(_id)
+            if old is not None:
+                self.alive[old] = False
+        codes = [self.project_codes.setdefault(project, len(self.project_codes)) for _, project, _ in rows]
+        self.ids = np.concatenate([self.ids, np.asarray([r[0] for r in rows], dtype=np.int64)])
+        self.lengths = np.concatenate([self.lengths, np.asarray([len(t) for t in tokens], dtype=np.float32)])
+        self.projects = np.concatenate([self.projects, np.asarray(codes, dtype=np.int32)])
+        self.alive = np.concatenate([self.alive, np.ones(len(rows), dtype=bool)])
+        self.payloads.extend(payload for _, _, payload in rows)
+        self._positions.update((r[0], start + i) for i, r in enumerate(rows))
+        self.segments.append(self._segment(start, tokens))
+        if len(self.segments) > BM25_MAX_SEGMENTS:
+            self.compact()
+        else:
+            self._stats()
+        return len(rows)
+
+    def copy(self) -> "BM25Index":
+        """Copy to add() to while this index keeps serving searches (segments are immutable and shared)."""
+        clone = BM25Index(self.text_field, self.k1, self.b)
+        clone.__dict__.update(self.__dict__)
+        clone.vocab = dict(self.vocab)
+        clone.segments = list(self.segments)
+        clone.alive = self.alive.copy()
+        clone.payloads = list(self.payloads)
+        clone.project_codes = dict(self.project_codes)
+        clone._positions = dict(self._positions)
+        return clone
+
+    def rows(self) -> List[Tuple[int, Any, tuple]]:
+        """Live (id, project, payload) rows, in index order."""
+        projects = {code: value for value, code in self.project_codes.items()}
+        return [
+            (int(self.ids[i]), projects[int(self.projects[i])], self.payloads[i])
+            for i in np.flatnonzero(self.alive)
+        ]
+
+    def compact(self) -> None:
+        """Merge all segments into one and drop replaced rows."""
+        merged = BM25Index(self.text_field, self.k1, self.b)
+        merged.add(self.rows())
+        self.__dict__.update(merged.__dict__)
+
+    # -- search --------------------------------------------------------------
+    def _top(self, query: str, k: int, project: Any = None,
+             project_like: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(positions, scores) of the top-k matches, best first."""
+        scores = np.zeros(self.ids.shape[0], dtype=np.float32)
+        for term in set(domain_tokens(query)):
+            tid = self.vocab.get(term)
+            if tid is None:
+                continue
+            for seg in self.segments:
+                docs, tf = seg.postings(tid)
+                if docs.shape[0]:
+                    scores[docs] += self._idf[tid] * tf * (self.k1 + 1) / (tf + self._norm[docs])
+        mask = self.alive & (scores > 0)
+        if project is not None:
+            mask &= self.projects == self.project_codes.get(project, -1)
+        if project_like:
+            # Same semantics as the OCR SQL filter (project ILIKE %name%)
+            needle = project_like.lower()
+            codes = [c for value, c in self.project_codes.items() if value and needle in str(value).lower()]
+            mask &= np.isin(self.projects, codes)
+        candidates = np.flatnonzero(mask)
+        if candidates.shape[0] > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return candidates, scores[candidates]
+
+    def search(self, query: str, k: int, project: Any = None,
+               project_like: Optional[str] = None) -> List[Tuple[tuple, float]]:
+        """Top-k (payload, bm25 score) for query, optionally restricted to one project."""
+        positions, scores = self._top(query, k, project, project_like)
+        return [(self.payloads[i], float(s)) for i, s in zip(positions, scores)]
+
+    def search_ids(self, query: str, k: int, project: Any = None) -> List[int]:
+        """Row ids of the top-k matches, best first (for fusion with other rankings)."""
+        positions, _ = self._top(query, k, project)
+        return self.ids[positions].tolist()
+
+    # -- persistence ---------------------------------------------------------
+    def save(self, path: Path, signature: Optional[tuple] = None) -> None:
+        """Write a compacted snapshot (atomic replace)."""
+        if len(self.segments) != 1 or not self.alive.all():
+            self.compact()
+        seg = self.segments[0] if self.segments else self._segment(0, [])
+        projects = {code: value for value, code in self.project_codes.items()}
+        meta = {
+            "text_field": self.text_field, "k1": self.k1, "b": self.b, "signature": list(signature or ()),
+            "projects": [projects[c] for c in range(len(projects))], "payloads": self.payloads,
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.stem + ".tmp.npz")
+        np.savez(
+            tmp, ids=self.ids, lengths=self.lengths, projects=self.projects,
+            vocab=np.asarray(sorted(self.vocab, key=self.vocab.get), dtype=str),
+            indptr=seg.indptr, docs=seg.docs, tf=seg.tf, meta=np.asarray(json.dumps(meta)),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Tuple["BM25Index", tuple]:
+        """(index, signature it was saved with)."""
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            index = cls(meta["text_field"], meta["k1"], meta["b"])
+            index.vocab = {term: i for i, term in enumerate(data["vocab"].tolist())}
+            index.ids, index.lengths, index.projects = data["ids"], data["lengths"], data["projects"]
+            index.segments = [_Segment(data["indptr"], data["docs"], data["tf"])]
+        index.alive = np.ones(index.ids.shape[0], dtype=bool)
+        index.payloads = [tuple(p) for p in meta["payloads"]]
+        index.project_codes = {value: code for code, value in enumerate(meta["projects"])}
+        index._positions = {int(_id): i for i, _id in enumerate(index.ids)}
+        index._stats()
+        return index, tuple(meta["signature"])
+
+
+class LexicalIndex:
+    """BM25 indexes for TABLES, loaded from disk and kept in sync with Postgres."""
+
+    def __init__(self, tables: Dict[str, LexicalSpec] = None, directory: Path = BM25_INDEX_DIR,
+                 refresh_interval: float = BM25_REFRESH):
+        self.specs = dict(tables or TABLES)
+        self.directory = directory
+        self.refresh_interval = refresh_interval
+        self._indexes: Dict[str, BM25Index] = {}
+        self._signatures: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.loaded_at: Optional[float] = None
+        self.last_refresh_ms: Optional[float] = None
+
+    def path(self, table: str) -> Path:
+        return self.directory / f"bm25_{table}.npz"
+
+    # -- loading -------------------------------------------------------------
+    def load(self) -> None:
+        """Load persisted snapshots (missing or unreadable files are rebuilt by refresh())."""
+        for name in self.specs:
+            path = self.path(name)
+            if not path.exists() or name in self._indexes:
+                continue
+            try:
+                index, signature = BM25Index.load(path)
+            except Exception as e:
+                print(f"[warn] could not load {path}: {e}")
+                continue
+            with self._lock:
+                self._indexes[name] = index
+                self._signatures[name] = signature
+
+    def _fetch(self, cur, spec: LexicalSpec, after_id: Optional[int] = None) -> List[Tuple[int, Any, tuple]]:
+        sql = f"SELECT id, {spec.project}, {spec.payload} FROM {spec.name}"
+        params: tuple = ()
+        if after_id is not None:
+            sql += " WHERE id > %s"
+            params = (after_id,)
+        cur.execute(sql + " ORDER BY id", params)
+        return [(r[0], r[1], tuple(r[2:])) for r in cur.fetchall()]
+
+    def _signature(self, cur, spec: LexicalSpec) -> tuple:
+        cur.execute(f"SELECT {spec.signature} FROM {spec.name}")
+        return tuple(int(v) if v is not None else None for v in cur.fetchone())
+
+    def _refresh_table(self, cur, spec: LexicalSpec) -> bool:
+        signature = self._signature(cur, spec)
+        previous = self._signatures.get(spec.name)
+        index = self._indexes.get(spec.name)
+        if index is not None and signature == previous:
+            return False
+        # Pure append (count grew by exactly the rows past the old max id): index only those
+        if index is not None and previous and len(signature) == 2 and previous[1] is not None:
+            fresh = self._fetch(cur, spec, after_id=previous[1])
+            if previous[0] + len(fresh) == signature[0]:
+                # Searches keep reading the old index until the swap below
+                appended = index.copy()
+                appended.add(fresh)
+                with self._lock:
+                    self._indexes[spec.name] = appended
+                    self._signatures[spec.name] = signature
+                return True
+        rebuilt = BM25Index(spec.text)
+        rebuilt.add(self._fetch(cur, spec))
+        with self._lock:
+            self._indexes[spec.name] = rebuilt
+            self._signatures[spec.name] = signature
+        return True
+
+    def refresh(self, save: bool = True) -> None:
+        """Bring every table up to date with Postgres; persist the ones that changed."""
+        start = time.perf_counter()
+        changed = []
+        with _pg() as con, con.cursor() as cur:
+            for spec in self.specs.values():
+                if schema_registry.has_table(spec.name) and schema_registry.has_column(spec.name, "id"):
+                    if self._refresh_table(cur, spec):
+                        changed.append(spec.name)
+        if save:
+            for name in changed:
+                self._indexes[name].save(self.path(name), self._signatures[name])
+        self.last_refresh_ms = (time.perf_counter() - start) * 1000
+        if self.loaded_at is None:
+            self.loaded_at = time.time()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[warn] BM25 index refresh failed: {e}")
+
+    def start(self) -> None:
+        """Start the background refresh thread (idempotent)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="bm25-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # -- search --------------------------------------------------------------
+    def serves(self, table: str) -> bool:
+        return BM25_INDEX and len(self._indexes.get(table) or ()) > 0
+
+    def search(self, table: str, query: str, k: int, project: Any = None,
+               project_like: Optional[str] = None) -> List[Tuple[tuple, float]]:
+        index = self._indexes.get(table)
+        return index.search(query, k, project, project_like) if index is not None else []
+
+    def search_ids(self, table: str, query: str, k: int, project: Any = None) -> List[int]:
+        index = self._indexes.get(table)
+        return index.search_ids(query, k, project) if index is not None else []
+
+    def stats(self) -> dict:
+        return {
+            "enabled": BM25_INDEX,
+            "loaded_at": self.loaded_at,
+            "last_refresh_ms": round(self.last_refresh_ms, 1) if self.last_refresh_ms is not None else None,
+            "tables": {
+                name: {"rows": len(index), "terms": len(index.vocab), "segments": len(index.segments)}
+                for name, index in self._indexes.items()
+            },
+        }
+
+
+lexical_index = LexicalIndex()
+
+
+def update_persisted(tables: Optional[Sequence[str]] = None) -> None:
+    """Ingest hook: bring the on-disk BM25 snapshots up to date (no-op unless BM25_INDEX=1)."""
+    if not BM25_INDEX:
+        return
+    index = LexicalIndex({name: TABLES[name] for name in (tables or TABLES)})
+    index.load()
+    schema_registry.ensure_fresh()
+    index.refresh(save=True)
@@ -0,0 +1,197 @@
+"""
+Token-budgeted context packing for the summarizer prompt.
+
+Retrieved chunks arrive in MMR order. Each chunk is split into blocks (one
+per paragraph, except that a markdown or HTML table is a single block) and
+packed best-first until the model's token budget is reached:
+
+  * a paragraph already emitted by an earlier chunk is skipped, which
+    removes the neighbour-page text repeated across OCR windows; repeats
+    inside one chunk (floor-plan labels, "10%" rows) are kept;
+  * low-value lines (page numbers, bare punctuation, brochure boilerplate)
+    are dropped;
+  * tables are kept whole or left out, never cut mid-row.
+
+Whole chunks are taken while they fit; the first chunk that does not fit
+contributes the lines that still do (tables whole), and the rest are dropped.
+
+Budgets (env): CONTEXT_TOKEN_BUDGET (default for any model, 6000) and
+CONTEXT_TOKEN_BUDGETS, per-model overrides as "model=tokens,...". Tokens are
+counted with tiktoken when installed, else estimated at 4 characters each.
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import tiktoken
+except ImportError:  # optional: character estimate below
+    tiktoken = None
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+
+
+def _parse_budgets(spec: str) -> Dict[str, int]:
+    budgets = {}
+    for item in spec.split(","):
+        model, _, tokens = item.partition("=")
+        if model.strip() and tokens.strip().isdigit():
+            budgets[model.strip()] = int(tokens)
+    return budgets
+
+
+CONTEXT_TOKEN_BUDGETS = _parse_budgets(os.getenv("CONTEXT_TOKEN_BUDGETS", "gpt-3.5-turbo=3000"))
+
+_TABLE_ROW = re.compile(r"^\s*\|.*\|\s*$")
+_HTML_TABLE = re.compile(r"<table\b.*?</table>", re.IGNORECASE | re.DOTALL)
+_LOW_VALUE = re.compile(
+    r"^\s*(?:page\s*\d+(?:\s*of\s*\d+)?|[-=_*•·.|]+|©.*|all rights reserved.*|www\.\S+)\s*$",
+    re.IGNORECASE,
+)
+
+
+def budget_for(model: Optional[str]) -> int:
+    return CONTEXT_TOKEN_BUDGETS.get(model or "", CONTEXT_TOKEN_BUDGET)
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    if not text:
+        return 0
+    if tiktoken is None:
+        return (len(text) + 3) // 4
+    return len(_encoding(model or "gpt-4o").encode(text, disallowed_special=()))
+
+
+def _blocks(chunk: str) -> List[tuple]:
+    """(text, is_table) blocks of a chunk, in order: tables whole, other text by paragraph."""
+    out: List[tuple] = []
+    pos = 0
+    for m in _HTML_TABLE.finditer(chunk):
+        out.extend(_text_blocks(chunk[pos:m.start()]))
+        out.append((m.group(0), True))
+        pos = m.end()
+    out.extend(_text_blocks(chunk[pos:]))
+    return out
+
+
+def _text_blocks(text: str) -> List[tuple]:
+    out: List[tuple] = []
+    rows: List[str] = []
+    para: List[str] = []
+    for line in text.splitlines():
+        if _TABLE_ROW.match(line):
+            if para:
+                out.append(("\n".join(para), False))
+                para = []
+            rows.append(line)
+            continue
+        if rows:
+            out.append(("\n".join(rows), True))
+            rows = []
+        if line.strip():
+            para.append(line)
+        elif para:
+            out.append(("\n".join(para), False))
+            para = []
+    if rows:
+        out.append(("\n".join(rows), True))
+    if para:
+        out.append(("\n".join(para), False))
+    return out
+
+
+def _key(block: str) -> str:
+    return re.sub(r"\s+", " ", block).strip().casefold()
+
+
+@dataclass
+class PackedContext:
+    text: str
+    tokens: int
+    budget: int
+    chunks_in: int
+    chunks_used: int = 0
+    duplicate_blocks: int = 0
+    trimmed_lines: int = 0
+    dropped_blocks: int = 0
+    used: List[int] = field(default_factory=list)  # input indices that contributed text
+
+    def stats(self) -> dict:
+        return {
+            "context_tokens": self.tokens,
+            "budget": self.budget,
+            "chunks": f"{self.chunks_used}/{self.chunks_in}",
+            "duplicate_blocks": self.duplicate_blocks,
+            "trimmed_lines": self.trimmed_lines,
+            "dropped_blocks": self.dropped_blocks,
+        }
+
+
+def pack_context(chunks: Sequence[str], budget: Optional[int] = None, model: Optional[str] = None) -> PackedContext:
+    """Pack MMR-ordered chunks into at most `budget` tokens (default: the model's budget)."""
+    budget = budget_for(model) if budget is None else budget
+    packed = PackedContext(text="", tokens=0, budget=budget, chunks_in=len(chunks))
+    seen = set()  # paragraphs and tables emitted by earlier chunks
+    parts: List[str] = []
+    full = False
+    for i, chunk in enumerate(chunks):
+        kept = []
+        for text, is_table in _blocks(chunk or ""):
+            if not is_table:
+                lines = text.splitlines()
+                text = "\n".join(line for line in lines if not _LOW_VALUE.match(line))
+                packed.trimmed_lines += len(lines) - len(text.splitlines())
+                if not text:
+                    continue
+            key = _key(text)
+            if key in seen:
+                packed.duplicate_blocks += 1
+                continue
+            kept.append((key, text, is_table, count_tokens(text, model) + 1))  # +1: joining newline
+        if full:
+            packed.dropped_blocks += len(kept)
+            continue
+        cost = sum(block[3] for block in kept)
+        if packed.tokens + cost > budget:
+            # Partial chunk: what still fits, in order; paragraphs by line, tables whole or not at all
+            full = True
+            fitting = []
+            for key, text, is_table, tokens in kept:
+                if packed.tokens + tokens <= budget:
+                    fitting.append((key, text, is_table, tokens))
+                    packed.tokens += tokens
+                    continue
+                packed.dropped_blocks += 1
+                if is_table:
+                    continue
+                lines = []
+                for line in text.splitlines():
+                    line_tokens = count_tokens(line, model) + 1
+                    if packed.tokens + line_tokens > budget:
+                        break
+                    lines.append(line)
+                    packed.tokens += line_tokens
+                if lines:
+                    fitting.append((_key("\n".join(lines)), "\n".join(lines), False, 0))
+            kept = fitting
+        else:
+            packed.tokens += cost
+        if not kept:
+            continue
+        seen.update(block[0] for block in kept)
+        parts.append("\n\n".join(block[1] for block in kept))
+        packed.used.append(i)
+    packed.chunks_used = len(packed.used)
+    packed.text = "\n\n".join(parts)
+    return packed
@@ -0,0 +1,73 @@
+"""
+Vectorized Maximal Marginal Relevance (MMR).
+
+Relevance is supplied once per candidate; diversity comes from a dense
+candidate-by-candidate similarity matrix built in one pass, so the greedy
+selection only keeps a running max-similarity vector instead of re-scoring
+every candidate on every round.
+"""
+
+from collections import Counter
+from typing import Iterable, List, Sequence, Set
+
+import numpy as np
+
+
+def token_overlap_matrix(token_sets: Sequence[Set[str]]) -> np.ndarray:
+    """
+    Pairwise overlap |Si ∩ Sj| / max(1, min(|Si|, |Sj|)) for all candidates.
+
+    Intersections come from a single matrix product over token bitmaps.
+    Tokens that occur in only one candidate can never contribute to an
+    intersection, so they are left out of the bitmap to keep it narrow.
+    """
+    n = len(token_sets)
+    sizes = np.fromiter((len(s) for s in token_sets), dtype=np.float64, count=n)
+
+    df = Counter()
+    for toks in token_sets:
+        df.update(toks)
+    vocab = {t: i for i, t in enumerate(t for t, c in df.items() if c > 1)}
+
+    rows: List[int] = []
+    cols: List[int] = []
+    for i, toks in enumerate(token_sets):
+        shared = [vocab[t] for t in toks if t in vocab]
+        rows.extend([i] * len(shared))
+        cols.extend(shared)
+    bitmap = np.zeros((n, max(1, len(vocab))), dtype=np.float32)
+    bitmap[rows, cols] = 1.0
+
+    inter = (bitmap @ bitmap.T).astype(np.float64)
+    denom = np.maximum(1.0, np.minimum(sizes[:, None], sizes[None, :]))
+    return inter / denom
+
+
+def cosine_similarity_matrix(embeddings: Sequence) -> np.ndarray:
+    """Pairwise cosine similarity between candidate vectors as one matrix product."""
+    m = np.vstack([np.asarray(e, dtype=np.float32) for e in embeddings])
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    m = m / np.maximum(norms, 1e-12)
+    return (m @ m.T).astype(np.float64)
+
+
+def mmr_select(relevance: Iterable[float], similarity: np.ndarray, lambda_: float = 0.75, topk: int = 3) -> List[int]:
+    """
+    Greedy MMR over precomputed relevance and similarity.
+
+    Returns selected candidate indices in selection order. Ties go to the
+    lowest index, matching a left-to-right scan of the candidates.
+    """
+    rel = lambda_ * np.asarray(list(relevance), dtype=np.float64)
+    n = rel.shape[0]
+    max_sim = np.zeros(n, dtype=np.float64)
+    available = np.ones(n, dtype=bool)
+    selected: List[int] = []
+    for _ in range(min(topk, n)):
+        s = rel - (1 - lambda_) * max_sim
+        s[~available] = -np.inf
+        best = int(np.argmax(s))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_sim, similarity[best], out=max_sim)
+    return selected
@@ -0,0 +1,129 @@
+"""
+Page-context windows for the OCR fallback (ocr_pages).
+
+Every page stores the page numbers of its neighbours in the same PDF
+(prev_page / next_page), materialized when pages are loaded. Retrieval takes
+the top-N matching pages without any window functions over the match set,
+then fetches the text of just those pages and their neighbours, once per
+page. A page shared by two windows goes to the better-ranked hit only, so
+the same neighbour text is neither shipped nor scored twice, and no window
+grows past prev + hit + next.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+WINDOW_COLUMNS = ("prev_page", "next_page")
+
+ADD_WINDOW_COLUMNS_SQL = """
+    ALTER TABLE ocr_pages
+        ADD COLUMN IF NOT EXISTS prev_page INTEGER,
+        ADD COLUMN IF NOT EXISTS next_page INTEGER
+"""
+
+_REFRESH_SQL = """
+    UPDATE ocr_pages o
+    SET prev_page = w.prev_page, next_page = w.next_page
+    FROM (
+        SELECT source_pdf, page,
+               lag(page)  OVER (PARTITION BY source_pdf ORDER BY page) AS prev_page,
+               lead(page) OVER (PARTITION BY source_pdf ORDER BY page) AS next_page
+        FROM ocr_pages
+        {where}
+    ) w
+    WHERE o.source_pdf = w.source_pdf AND o.page = w.page
+      AND (o.prev_page IS DISTINCT FROM w.prev_page OR o.next_page IS DISTINCT FROM w.next_page)
+"""
+
+
+def has_window_columns(cur) -> bool:
+    """Whether ocr_pages has prev_page/next_page (a catalog read, no table lock)."""
+    cur.execute(
+        "SELECT count(*) FROM information_schema.columns WHERE table_name = 'ocr_pages' AND column_name = ANY(%s)",
+        (list(WINDOW_COLUMNS),),
+    )
+    return cur.fetchone()[0] == len(WINDOW_COLUMNS)
+
+
+def refresh_windows(cur, source_pdfs: Optional[Sequence[str]] = None) -> int:
+    """
+    (Re)compute prev_page/next_page, for all PDFs or only `source_pdfs`
+    (call after loading pages). Returns the number of rows changed.
+    Takes no table lock beyond the row updates; the columns come from
+    db/schema.sql (or ADD_WINDOW_COLUMNS_SQL, once, on older databases).
+    """
+    if source_pdfs is None:
+        cur.execute(_REFRESH_SQL.format(where=""))
+    else:
+        cur.execute(_REFRESH_SQL.format(where="WHERE source_pdf = ANY(%s)"), (list(source_pdfs),))
+    return cur.rowcount
+
+
+def window_sql(score: str, order: str, where_clause: str) -> str:
+    """
+    Hits + context pages as one statement.
+
+    `score` is the hit score expression, `order` ranks hits using the
+    subquery columns s (score), pri (tag match first) and len (text length).
+    Placeholders, in order: those in `score`, tag, tag, those in
+    `where_clause`, LIMIT. Rows: (source_pdf, page, text, prev_page,
+    next_page, s, ord); ord is NULL for pages fetched only as context.
+    """
+    return f"""
+        WITH hits AS (
+            SELECT source_pdf, page, prev_page, next_page, s, row_number() OVER (ORDER BY {order}) AS ord
+            FROM (
+                SELECT source_pdf, page, prev_page, next_page, {score} AS s,
+                       (CASE WHEN %s::TEXT IS NOT NULL AND tags = %s::TEXT THEN 0 ELSE 1 END) AS pri,
+                       length(text) AS len
+                FROM ocr_pages
+                {where_clause}
+            ) m
+            ORDER BY {order}
+            LIMIT %s
+        ),
+        pages AS (
+            SELECT source_pdf, page FROM hits
+            UNION SELECT source_pdf, prev_page FROM hits WHERE prev_page IS NOT NULL
+            UNION SELECT source_pdf, next_page FROM hits WHERE next_page IS NOT NULL
+        )
+        SELECT o.source_pdf, o.page, o.text, h.prev_page, h.next_page, h.s, h.ord
+        FROM pages p
+        JOIN ocr_pages o ON o.source_pdf = p.source_pdf AND o.page = p.page
+        LEFT JOIN hits h ON h.source_pdf = p.source_pdf AND h.page = p.page
+        """
+
+
+def assemble(rows: Iterable[tuple]) -> Tuple[List[str], List[dict]]:
+    """
+    One window per hit, best-ranked first: the hit page plus its neighbours
+    not already taken by a better-ranked window, texts joined in page order.
+    A hit whose page already sits in a better window is listed in that
+    window's hits instead of getting its own. Returns (docs, metas); meta
+    carries the hit's page and score plus the window's pages and hits.
+    """
+    rows = list(rows)
+    texts: Dict[Tuple[str, int], str] = {(r[0], r[1]): r[2] for r in rows}
+    hits = sorted((r for r in rows if r[6] is not None), key=lambda r: r[6])
+    owner: Dict[Tuple[str, int], dict] = {}  # page -> window it was given to
+    windows: List[dict] = []
+    for source, page, _, prev_page, next_page, s, _ in hits:
+        taken = owner.get((source, page))
+        if taken is not None:
+            taken["hits"].append(page)
+            continue
+        window = {"source": source, "page": page, "score": s, "pages": [], "hits": [page]}
+        for p in (prev_page, page, next_page):
+            if p is not None and (source, p) not in owner:
+                owner[(source, p)] = window
+                window["pages"].append(p)
+        windows.append(window)
+    docs, metas = [], []
+    for w in windows:
+        pages = sorted(w["pages"])
+        # Blank line between pages: the context packer dedupes by paragraph
+        docs.append("\n\n".join(texts[(w["source"], p)] for p in pages if texts.get((w["source"], p))))
+        metas.append({
+            "source": w["source"], "page": w["page"], "score": float(w["score"] or 0.0),
+            "pages": pages, "hits": sorted(w["hits"]),
+        })
+    return docs, metas
@@ -0,0 +1,209 @@
+"""
+In-memory project directory.
+
+Loads `projects` (names, slugs, meta aliases, WhatsApp numbers) once, matches
+question text against every known name/alias in a single Aho-Corasick pass,
+and resolves names/slugs/numbers to ids without touching the database. The
+directory re-polls `projects` at most every PROJECT_DIRECTORY_TTL seconds and
+rebuilds only when the row count or max(updated_at) changed.
+"""
+
+import os
+import re
+import time
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from utils.db import _pg, _apg
+
+PROJECT_DIRECTORY_TTL = float(os.getenv("PROJECT_DIRECTORY_TTL", "60"))
+
+_VERSION_SQL = "SELECT count(*), max(updated_at) FROM projects"
+_PROJECTS_SQL = "SELECT id, name, slug, whatsapp, meta, updated_at FROM projects ORDER BY id"
+
+
+@dataclass
+class Project:
+    id: Optional[int]
+    name: str
+    slug: Optional[str] = None
+    whatsapp: Optional[str] = None
+    aliases: List[str] = field(default_factory=list)
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: all occurrences of all patterns in one scan."""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, object]]] = [[]]
+
+    def add(self, pattern: str, value: object) -> None:
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[node][ch] = nxt
+            node = nxt
+        self._out[node].append((len(pattern), value))
+
+    def build(self) -> "AhoCorasick":
+        queue = deque(self._goto[0].values())
+        while queue:
+            u = queue.popleft()
+            for ch, v in self._goto[u].items():
+                queue.append(v)
+                f = self._fail[u]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                nxt = self._goto[f].get(ch, 0)
+                self._fail[v] = nxt if nxt != v else 0
+                self._out[v] = self._out[v] + self._out[self._fail[v]]
+        return self
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int, object]]:
+        """Yield (start, end, value) for every pattern occurrence."""
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for length, value in self._out[node]:
+                yield i - length + 1, i + 1, value
+
+
+def _norm(s: str) -> str:
+    return re.sub(r"\s+", " ", (s or "").lower()).strip()
+
+
+def _digits(phone: Optional[str]) -> str:
+    return re.sub(r"\D", "", phone or "")
+
+
+class ProjectDirectory:
+    def __init__(self, hints: Optional[Dict[str, str]] = None, ttl: float = PROJECT_DIRECTORY_TTL):
+        self.ttl = ttl
+        self.hints = dict(hints or {})
+        self.loaded_at: Optional[float] = None
+        self._checked_at: Optional[float] = None
+        self._version = None
+        self._lock = threading.Lock()
+        self._build([])
+
+    # -- loading -------------------------------------------------------------
+    def _build(self, projects: List[Project]) -> None:
+        by_key: Dict[str, Project] = {}
+        by_phone: Dict[str, Project] = {}
+        automaton = AhoCorasick()
+        for p in projects:
+            keys = [p.name, p.slug, (p.slug or "").replace("-", " "), *p.aliases]
+            for key in filter(None, map(_norm, keys)):
+                by_key.setdefault(key, p)
+                automaton.add(key, p.name)
+            if _digits(p.whatsapp):
+                by_phone[_digits(p.whatsapp)] = p
+        # Curated hints win over DB aliases so OCR `project` filters stay stable
+        for alias, name in self.hints.items():
+            automaton.add(_norm(alias), name)
+        with self._lock:
+            self.projects = projects
+            self._by_key, self._by_phone = by_key, by_phone
+            self._automaton = automaton.build()
+
+    @staticmethod
+    def _rows_to_projects(rows) -> List[Project]:
+        out = []
+        for pid, name, slug, whatsapp, meta, _ in rows:
+            aliases = (meta or {}).get("aliases") or []
+            if isinstance(aliases, str):
+                aliases = [aliases]
+            out.append(Project(id=pid, name=name, slug=slug, whatsapp=whatsapp, aliases=[str(a) for a in aliases]))
+        return out
+
+    def load(self, rows, version=None) -> None:
+        self._build(self._rows_to_projects(rows))
+        self._version = version
+        self.loaded_at = self._checked_at = time.time()
+
+    def refresh(self) -> None:
+        with _pg() as con, con.cursor() as cur:
+            cur.execute(_VERSION_SQL)
+            version = tuple(cur.fetchone())
+            if version == self._version and self.loaded_at is not None:
+                self._checked_at = time.time()
+                return
+            cur.execute(_PROJECTS_SQL)
+            rows = cur.fetchall()
+        self.load(rows, version)
+
+    async def arefresh(self) -> None:
+        async with _apg() as con, con.cursor() as cur:
+            await cur.execute(_VERSION_SQL)
+            version = tuple(await cur.fetchone())
+            if version == self._version and self.loaded_at is not None:
+                self._checked_at = time.time()
+                return
+            await cur.execute(_PROJECTS_SQL)
+            rows = await cur.fetchall()
+        self.load(rows, version)
+
+    def is_stale(self) -> bool:
+        return self._checked_at is None or time.time() - self._checked_at > self.ttl
+
+    def ensure_fresh(self) -> None:
+        if not self.is_stale():
+            return
+        try:
+            self.refresh()
+        except Exception as e:
+            self._checked_at = time.time()  # don't retry on every request while the DB is down
+            print(f"[warn] project directory refresh failed: {e}")
+
+    async def aensure_fresh(self) -> None:
+        if not self.is_stale():
+            return
+        try:
+            await self.arefresh()
+        except Exception as e:
+            self._checked_at = time.time()
+            print(f"[warn] project directory refresh failed: {e}")
+
+    # -- lookups -------------------------------------------------------------
+    def match(self, text: str) -> Optional[str]:
+        """
+        Project name mentioned in `text`: the longest whole-word match, ties
+        going to the leftmost occurrence.
+        """
+        tl = _norm(text)
+        best = None
+        for start, end, name in self._automaton.iter(tl):
+            if start > 0 and tl[start - 1].isalnum():
+                continue
+            if end < len(tl) and tl[end].isalnum():
+                continue
+            if best is None or (end - start, -start) > (best[1] - best[0], -best[0]):
+                best = (start, end, name)
+        return best[2] if best else None
+
+    def resolve_id(self, name: str) -> Optional[int]:
+        """Project id by name (exact or case-insensitive) or slug."""
+        if not name:
+            return None
+        p = self._by_key.get(_norm(name)) or self._by_key.get(_norm(name.replace(" ", "-")))
+        return p.id if p else None
+
+    def by_whatsapp(self, phone: Optional[str]) -> Optional[Project]:
+        return self._by_phone.get(_digits(phone))
+
+    def snapshot(self) -> dict:
+        return {
+            "loaded_at": self.loaded_at,
+            "projects": [{"id": p.id, "name": p.name, "slug": p.slug} for p in self.projects],
+        }
@@ -0,0 +1,157 @@
+"""
+Second-tier retrieval cache keyed on query embeddings.
+
+Paraphrased repeats ("payment plan of trevoc" / "Trevoc payment plan?") miss
+the exact-string cache but land within a small cosine distance of each other.
+Entries are grouped by a partition key (project, k, overfetch, ...) so only
+queries with identical retrieval parameters can ever share a result.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE", "1") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "300"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+SEMANTIC_CACHE_MAX_BYTES = int(os.getenv("SEMANTIC_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+@dataclass
+class _Entry:
+    partition: Hashable
+    vector: np.ndarray
+    result: dict
+    expires_at: float
+    nbytes: int
+
+
+def _unit(vector: Sequence[float]) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32).ravel()
+    n = float(np.linalg.norm(v))
+    return v / n if n else v
+
+
+def _result_nbytes(result: dict) -> int:
+    """Approximate in-memory footprint of a retrieval result (its JSON size)."""
+    try:
+        return len(json.dumps(result, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return len(repr(result))
+
+
+class SemanticCache:
+    """
+    LRU + TTL cache of retrieval results looked up by cosine similarity.
+
+    `get(partition, vector)` returns the result of the most similar cached
+    query in the same partition when similarity >= threshold. Eviction is
+    global LRU, bounded by both entry count and approximate bytes.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl: float = SEMANTIC_CACHE_TTL,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        max_bytes: int = SEMANTIC_CACHE_MAX_BYTES,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._next_id = 0
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()  # LRU order, oldest first
+        self._partitions: Dict[Hashable, List[int]] = {}
+        self._matrices: Dict[Hashable, np.ndarray] = {}  # stacked unit vectors per partition
+        self._lock = threading.Lock()
+
+    def _key(self, partition: Hashable, vector: np.ndarray) -> Tuple[Hashable, int]:
+        # Vectors of different dimension (model change) never compare
+        return (partition, vector.shape[0])
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        self.nbytes -= entry.nbytes
+        ids = self._partitions[entry.partition]
+        ids.remove(entry_id)
+        if not ids:
+            del self._partitions[entry.partition]
+        self._matrices.pop(entry.partition, None)
+
+    def _purge_expired(self, key: Hashable, now: float) -> None:
+        for entry_id in [i for i in self._partitions.get(key, ()) if self._entries[i].expires_at <= now]:
+            self._remove(entry_id)
+
+    def _matrix(self, key: Hashable) -> np.ndarray:
+        mat = self._matrices.get(key)
+        if mat is None:
+            mat = np.stack([self._entries[i].vector for i in self._partitions[key]])
+            self._matrices[key] = mat
+        return mat
+
+    def get(self, partition: Hashable, vector: Sequence[float]) -> Optional[dict]:
+        v = _unit(vector)
+        key = self._key(partition, v)
+        with self._lock:
+            self._purge_expired(key, time.time())
+            if key not in self._partitions:
+                self.misses += 1
+                return None
+            sims = self._matrix(key) @ v
+            best = int(np.argmax(sims))
+            if float(sims[best]) < self.threshold:
+                self.misses += 1
+                return None
+            entry_id = self._partitions[key][best]
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            return self._entries[entry_id].result
+
+    def put(self, partition: Hashable, vector: Sequence[float], result: dict) -> None:
+        v = _unit(vector)
+        key = self._key(partition, v)
+        entry = _Entry(key, v, result, time.time() + self.ttl, v.nbytes + _result_nbytes(result))
+        if entry.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            entry_id, self._next_id = self._next_id, self._next_id + 1
+            self._entries[entry_id] = entry
+            self._partitions.setdefault(key, []).append(entry_id)
+            self._matrices.pop(key, None)
+            self.nbytes += entry.nbytes
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._partitions.clear()
+            self._matrices.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "partitions": len(self._partitions),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "threshold": self.threshold,
+        }
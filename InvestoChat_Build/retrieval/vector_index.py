@@ -0,0 +1,253 @@
+"""
+pgvector index management and per-query recall knobs.
+
+HNSW returns at most `hnsw.ef_search` rows and ivfflat only scans
+`ivfflat.probes` lists, so both must be set per statement from the requested
+recall (and the requested k). Settings are applied with set_config(..., true)
+inside a short transaction, pipelined with the search so they cost no extra
+round trip and never leak into the next borrower of a pooled connection.
+
+Recall -> parameter mapping comes from workspace/index_calibration.json
+(written by benchmarks/bench_vector_index.py) when present, else defaults.
+
+Compact storage (VECTOR_STORAGE): the ANN index is built over a smaller
+expression of the stored embedding (halfvec, binary_quantize bits, or a
+Matryoshka prefix via subvector) and searched for k * VECTOR_RERANK_FACTOR
+candidates, which are then reranked exactly by the full float32 column.
+Requires pgvector >= 0.7 and an index built by `manage_indexes.py compact`.
+"""
+
+import os
+import json
+import math
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from utils.schema import schema_registry
+
+VECTOR_TABLES = ("documents", "facts", "document_tables")
+VECTOR_METHODS = ("hnsw", "ivfflat")
+
+CALIBRATION_PATH = Path(
+    os.getenv("INDEX_CALIBRATION_PATH", str(Path(__file__).resolve().parent.parent / "workspace" / "index_calibration.json"))
+)
+_recall_env = os.getenv("VECTOR_RECALL_TARGET")
+VECTOR_RECALL_TARGET: Optional[float] = float(_recall_env) if _recall_env else None
+
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+HNSW_DEFAULT_EF_SEARCH = 40  # pgvector default
+
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "1536"))
+VECTOR_STORAGE = os.getenv("VECTOR_STORAGE", "full")
+VECTOR_RERANK_FACTOR = max(1, int(os.getenv("VECTOR_RERANK_FACTOR", "4")))
+
+# Uncalibrated fallbacks: recall target -> hnsw.ef_search / fraction of ivfflat lists probed
+_DEFAULT_EF_SEARCH = ((0.90, 40), (0.95, 80), (0.98, 200), (0.99, 400))
+_DEFAULT_PROBE_FRACTION = ((0.90, 0.05), (0.95, 0.10), (0.98, 0.25), (0.99, 0.50))
+
+_calibration: Optional[dict] = None
+
+
+def load_calibration(reload: bool = False) -> dict:
+    """{table: {"method", "param", "points": [[value, recall, p50_ms], ...]}} from the last sweep."""
+    global _calibration
+    if _calibration is None or reload:
+        try:
+            _calibration = json.loads(CALIBRATION_PATH.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            _calibration = {}
+    return _calibration
+
+
+@dataclass(frozen=True)
+class StorageMode:
+    name: str
+    expression: str  # indexed expression over the full `embedding` column
+    opclass: str
+    operator: str
+    query: str       # the same transform applied to the query vector ({q})
+    marker: str      # identifies the mode in an index definition (pg_indexes.indexdef)
+    bytes_per_vector: int
+
+    def query_expr(self, qref: str) -> str:
+        return self.query.format(q=qref)
+
+
+def _storage_modes(dim: int) -> Dict[str, StorageMode]:
+    modes = {
+        "full": StorageMode("full", "embedding", "vector_cosine_ops", "<=>", "{q}", "", 4 * dim + 8),
+        "halfvec": StorageMode(
+            "halfvec", f"(embedding::halfvec({dim}))", "halfvec_cosine_ops", "<=>",
+            f"({{q}}::halfvec({dim}))", "halfvec_cosine_ops", 2 * dim + 8,
+        ),
+        "bit": StorageMode(
+            "bit", f"(binary_quantize(embedding)::bit({dim}))", "bit_hamming_ops", "<~>",
+            f"(binary_quantize({{q}})::bit({dim}))", "bit_hamming_ops", dim // 8 + 8,
+        ),
+    }
+    # Matryoshka prefixes: text-embedding-3 vectors truncated to n dims (what the
+    # API's `dimensions` parameter returns, up to normalisation, which cosine ignores)
+    for n in (256, 512):
+        if n < dim:
+            modes[f"sub{n}"] = StorageMode(
+                f"sub{n}", f"(subvector(embedding, 1, {n})::vector({n}))", "vector_cosine_ops", "<=>",
+                f"(subvector({{q}}, 1, {n})::vector({n}))", f"subvector(embedding, 1, {n})", 4 * n + 8,
+            )
+    return modes
+
+
+STORAGE_MODES = _storage_modes(EMBEDDING_DIM)
+
+
+def storage_mode_of(definition: str) -> str:
+    """Storage mode an ANN index definition serves ("full" unless it indexes a compact expression)."""
+    for mode in STORAGE_MODES.values():
+        if mode.marker and mode.marker in definition:
+            return mode.name
+    return "full"
+
+
+def vector_indexes(table: str) -> Dict[str, dict]:
+    """hnsw/ivfflat indexes on table, keyed by the storage mode they serve."""
+    out: Dict[str, dict] = {}
+    for name, info in schema_registry.indexes.items():
+        if info["table"] == table and info["method"] in VECTOR_METHODS:
+            out.setdefault(storage_mode_of(info["definition"] or ""), {"name": name, **info})
+    return out
+
+
+def storage_mode(table: str) -> StorageMode:
+    """VECTOR_STORAGE when the table has an index for it, else full-precision search."""
+    if VECTOR_STORAGE != "full" and VECTOR_STORAGE in vector_indexes(table):
+        return STORAGE_MODES[VECTOR_STORAGE]
+    return STORAGE_MODES["full"]
+
+
+def vector_index(table: str, column: str = "embedding") -> Optional[dict]:
+    """The ANN index searches on table use (hnsw/ivfflat), if any."""
+    if column == "embedding":
+        return vector_indexes(table).get(storage_mode(table).name)
+    info = schema_registry.index_on(table, column)
+    return info if info and info["method"] in VECTOR_METHODS else None
+
+
+def candidates(table: str, k: int) -> int:
+    """Rows the ANN stage must return for a final top-k on table."""
+    return k if storage_mode(table).name == "full" else k * VECTOR_RERANK_FACTOR
+
+
+def nearest_sql(table: str, select: str, where: str, qref: str, k: int) -> str:
+    """
+    `SELECT {select} FROM {table} [WHERE {where}]` ordered by cosine distance
+    to qref and ending in `LIMIT %s` (the caller binds k), whatever the
+    storage mode. `select` may refer to `embedding` for exact scores.
+    """
+    where_sql = f"WHERE {where}" if where else ""
+    mode = storage_mode(table)
+    if mode.name == "full":
+        return f"SELECT {select} FROM {table} {where_sql} ORDER BY embedding <=> {qref} LIMIT %s"
+    return (
+        f"SELECT {select} FROM ("
+        f"SELECT * FROM {table} {where_sql} "
+        f"ORDER BY {mode.expression} {mode.operator} {mode.query_expr(qref)} LIMIT {candidates(table, int(k))}"
+        f") c ORDER BY embedding <=> {qref} LIMIT %s"
+    )
+
+
+def _from_table(table: Tuple[Tuple[float, float], ...], recall: float) -> float:
+    for target, value in table:
+        if recall <= target:
+            return value
+    return table[-1][1]
+
+
+def _calibrated(table: str, method: str, recall: float) -> Optional[int]:
+    entry = load_calibration().get(table)
+    if not entry or entry.get("method") != method:
+        return None
+    points = sorted(entry.get("points") or [])
+    for value, measured, *_ in points:
+        if measured >= recall:
+            return int(value)
+    return int(points[-1][0]) if points else None
+
+
+def ivfflat_lists_for(rows: int) -> int:
+    """pgvector guidance: rows/1000 up to 1M rows, sqrt(rows) beyond."""
+    if rows <= 1_000_000:
+        return max(1, rows // 1000)
+    return int(math.sqrt(rows))
+
+
+def search_settings(tables: Tuple[str, ...], k: int, recall_target: Optional[float] = None) -> List[Tuple[str, str]]:
+    """
+    GUCs for a search touching `tables` with LIMIT k.
+
+    Without a recall target only correctness is enforced (ef_search >= k);
+    with one, the smallest calibrated parameter meeting it is chosen.
+    """
+    recall_target = recall_target if recall_target is not None else VECTOR_RECALL_TARGET
+    settings: Dict[str, int] = {}
+    for table in tables:
+        info = vector_index(table)
+        if info is None:
+            continue
+        if info["method"] == "hnsw":
+            ef = HNSW_DEFAULT_EF_SEARCH
+            if recall_target is not None:
+                ef = _calibrated(table, "hnsw", recall_target) or int(_from_table(_DEFAULT_EF_SEARCH, recall_target))
+            settings["hnsw.ef_search"] = max(settings.get("hnsw.ef_search", 0), ef, candidates(table, k))
+        elif recall_target is not None:
+            lists = int(info["options"].get("lists", 100))
+            probes = _calibrated(table, "ivfflat", recall_target)
+            if probes is None:
+                probes = math.ceil(lists * _from_table(_DEFAULT_PROBE_FRACTION, recall_target))
+            settings["ivfflat.probes"] = max(settings.get("ivfflat.probes", 0), min(lists, max(1, probes)))
+    # ef_search == default and nothing else requested: nothing to set
+    if settings.get("hnsw.ef_search") == HNSW_DEFAULT_EF_SEARCH:
+        del settings["hnsw.ef_search"]
+    return [(name, str(value)) for name, value in settings.items()]
+
+
+@contextmanager
+def applied(con, settings: List[Tuple[str, str]]):
+    """Run the enclosed statements with `settings` local to one pipelined transaction."""
+    if not settings:
+        yield
+        return
+    with con.pipeline(), con.transaction(), con.cursor() as cur:
+        for name, value in settings:
+            cur.execute("SELECT set_config(%s, %s, true)", (name, value))
+        yield
+
+
+@asynccontextmanager
+async def aapplied(con, settings: List[Tuple[str, str]]):
+    """Async variant of applied()."""
+    if not settings:
+        yield
+        return
+    async with con.pipeline(), con.transaction(), con.cursor() as cur:
+        for name, value in settings:
+            await cur.execute("SELECT set_config(%s, %s, true)", (name, value))
+        yield
+
+
+# -- DDL -----------------------------------------------------------------------
+def hnsw_index_sql(table: str, name: str, m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION,
+                   concurrently: bool = True, expression: str = "embedding", opclass: str = "vector_cosine_ops") -> str:
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}{name} ON {table} "
+        f"USING hnsw ({expression} {opclass}) WITH (m = {int(m)}, ef_construction = {int(ef_construction)})"
+    )
+
+
+def ivfflat_index_sql(table: str, name: str, lists: int, concurrently: bool = True,
+                      expression: str = "embedding", opclass: str = "vector_cosine_ops") -> str:
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}{name} ON {table} "
+        f"USING ivfflat ({expression} {opclass}) WITH (lists = {int(lists)})"
+    )
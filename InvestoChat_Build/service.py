@@ -1,32 +1,80 @@
 import os
 import json
+import asyncio
 import time
 import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, List, Literal, Optional
 
 import requests
 from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field
 
-from main import retrieve, answer_from_retrieval
-from guards import guard_question, api_rate_limiter, whatsapp_rate_limiter
+from main import (aretrieve, aanswer_from_retrieval, answer_flight, aquery_vectors, astream_answer, needs_query_vector,
+                  project_directory, retrieve_flight, semantic_cache)
+from retrieval.ann import LOCAL_ANN, local_index
+from retrieval.bm25 import BM25_INDEX, lexical_index
+from guards import guard_question, api_rate_limiter, batch_rate_limiter, whatsapp_rate_limiter
 from telemetry import log_interaction
+from utils.db import PG_POOL_MAX_SIZE, get_async_pool, close_async_pool, pool_stats
+from utils.schema import schema_registry
+from utils.embed_store import embedding_store
+from utils.answer_cache import answer_cache
+from utils.openai_client import client_stats, close_async_client
+from utils.timing import collect, span
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 LOG = logging.getLogger("investochat.service")
 
 DEFAULT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4.1-mini")
 WORKSPACE = Path(__file__).parent / "workspace"
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "50"))
+BATCH_RETRIEVE_CONCURRENCY = int(os.getenv("BATCH_RETRIEVE_CONCURRENCY", str(PG_POOL_MAX_SIZE)))
+BATCH_CHAT_CONCURRENCY = int(os.getenv("BATCH_CHAT_CONCURRENCY", "4"))
 ROUTES_PATH = WORKSPACE / "whatsapp_routes.json"
 WHATSAPP_VERIFY_TOKEN = os.getenv("WHATSAPP_VERIFY_TOKEN")
 WHATSAPP_ACCESS_TOKEN = os.getenv("WHATSAPP_ACCESS_TOKEN")
 WHATSAPP_PHONE_NUMBER_ID = os.getenv("WHATSAPP_PHONE_NUMBER_ID")
 DEFAULT_PROJECT_ID = os.getenv("DEFAULT_PROJECT_ID")
 
-app = FastAPI(title="InvestoChat Retrieval API", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Warm the Postgres pool so the first requests don't pay connection setup
+    try:
+        await get_async_pool()
+        await schema_registry.arefresh()
+        await project_directory.arefresh()
+    except Exception as exc:
+        LOG.warning("database pool not opened at startup: %s", exc)
+    if LOCAL_ANN:
+        # Build the in-process vector index before serving; the refresh
+        # thread keeps it in step with Postgres afterwards.
+        try:
+            await asyncio.to_thread(local_index.refresh)
+        except Exception as exc:
+            LOG.warning("local vector index not loaded at startup: %s", exc)
+        local_index.start()
+    if BM25_INDEX:
+        # Load the persisted BM25 snapshots, then pick up rows ingested since
+        try:
+            lexical_index.load()
+            await asyncio.to_thread(lexical_index.refresh)
+        except Exception as exc:
+            LOG.warning("BM25 index not refreshed at startup: %s", exc)
+        lexical_index.start()
+    yield
+    local_index.stop()
+    lexical_index.stop()
+    await close_async_client()
+    await close_async_pool()
+
+
+app = FastAPI(title="InvestoChat Retrieval API", version="0.1.0", lifespan=lifespan)
 
 # Add CORS middleware for frontend access
 app.add_middleware(
@@ -47,6 +95,10 @@ class AskRequest(BaseModel):
     k: int = Field(3, ge=1, le=10)
     overfetch: int = Field(24, ge=3, le=50)
     model: Optional[str] = Field(None, description="Override chat completion model")
+    diversity: Optional[Literal["tokens", "embedding"]] = Field(None, description="MMR diversity signal (default: MMR_DIVERSITY)")
+    retrieval_mode: Optional[Literal["vector", "hybrid", "bm25"]] = Field(None, description="Candidate generation (default: RETRIEVAL_MODE)")
+    recall_target: Optional[float] = Field(None, ge=0.5, le=1.0, description="ANN recall target; sets hnsw.ef_search / ivfflat.probes")
+    include_timings: bool = Field(False, description="Return the per-stage latency breakdown")
 
 
 class AskResponse(BaseModel):
@@ -54,6 +106,8 @@ class AskResponse(BaseModel):
     mode: str
     sources: list
     latency_ms: int
+    prompt_tokens: Optional[int] = None
+    timings: Optional[dict] = None
 
 
 class RetrieveRequest(BaseModel):
@@ -61,6 +115,33 @@ class RetrieveRequest(BaseModel):
     project_id: Optional[int] = None
     k: int = 3
     overfetch: int = 24
+    diversity: Optional[Literal["tokens", "embedding"]] = None
+    retrieval_mode: Optional[Literal["vector", "hybrid", "bm25"]] = None
+    recall_target: Optional[float] = Field(None, ge=0.5, le=1.0)
+    include_timings: bool = False
+
+
+class BatchAskRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_QUESTIONS)
+    project_id: Optional[int] = Field(None, description="Restrict search to this project id")
+    k: int = Field(3, ge=1, le=10)
+    overfetch: int = Field(24, ge=3, le=50)
+    model: Optional[str] = Field(None, description="Override chat completion model")
+    diversity: Optional[Literal["tokens", "embedding"]] = None
+    retrieval_mode: Optional[Literal["vector", "hybrid", "bm25"]] = None
+    recall_target: Optional[float] = Field(None, ge=0.5, le=1.0)
+    include_timings: bool = False
+
+
+class BatchRetrieveRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_QUESTIONS)
+    project_id: Optional[int] = None
+    k: int = 3
+    overfetch: int = 24
+    diversity: Optional[Literal["tokens", "embedding"]] = None
+    retrieval_mode: Optional[Literal["vector", "hybrid", "bm25"]] = None
+    recall_target: Optional[float] = Field(None, ge=0.5, le=1.0)
+    include_timings: bool = False
 
 
 @app.get("/health")
@@ -68,18 +149,48 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/stats")
+def stats():
+    return {
+        "db_pool": pool_stats(),
+        "schema": schema_registry.snapshot(),
+        "projects": project_directory.snapshot(),
+        "semantic_cache": semantic_cache.stats(),
+        "embeddings": embedding_store.stats(),
+        "openai": client_stats(),
+        "local_ann": local_index.stats(),
+        "bm25": lexical_index.stats(),
+        "coalescing": {"retrieve": retrieve_flight.stats(), "answer": answer_flight.stats()},
+        "answer_cache": answer_cache.stats(),
+    }
+
+
+@app.post("/admin/schema/reload")
+async def reload_schema():
+    try:
+        await schema_registry.arefresh()
+    except Exception as exc:
+        LOG.error("schema reload failed: %s", exc)
+        raise HTTPException(503, "Schema reload failed")
+    return schema_registry.snapshot()
+
+
 @app.post("/retrieve")
-def api_retrieve(payload: RetrieveRequest):
+async def api_retrieve(payload: RetrieveRequest):
     allowed, reason = guard_question(payload.question)
     if not allowed:
         raise HTTPException(400, reason)
     start = time.perf_counter()
-    result = retrieve(
-        payload.question,
-        k=payload.k,
-        overfetch=payload.overfetch,
-        project_id=payload.project_id,
-    )
+    with collect() as timings:
+        result = await aretrieve(
+            payload.question,
+            k=payload.k,
+            overfetch=payload.overfetch,
+            project_id=payload.project_id,
+            diversity=payload.diversity,
+            retrieval_mode=payload.retrieval_mode,
+            recall_target=payload.recall_target,
+        )
     latency = int((time.perf_counter() - start) * 1000)
     LOG.info("retrieve project=%s mode=%s latency_ms=%s", payload.project_id, result["mode"], latency)
     log_interaction(
@@ -90,12 +201,15 @@ def api_retrieve(payload: RetrieveRequest):
         answer="[context-only]",
         mode=result["mode"],
         latency_ms=latency,
+        timings=timings.as_dict(),
     )
+    if payload.include_timings:
+        return {"latency_ms": latency, **result, "timings": timings.as_dict()}
     return {"latency_ms": latency, **result}
 
 
-@app.post("/ask", response_model=AskResponse)
-def ask(payload: AskRequest):
+def _admit_ask(payload: AskRequest) -> str:
+    """Guard + rate limit shared by /ask and /ask/stream; returns the rate-limit key."""
     allowed, reason = guard_question(payload.question)
     if not allowed:
         raise HTTPException(400, reason)
@@ -103,24 +217,39 @@ def ask(payload: AskRequest):
     retry_after = api_rate_limiter.check(limit_key)
     if retry_after:
         raise HTTPException(429, f"Rate limit exceeded. Retry after {retry_after}s")
-    start = time.perf_counter()
-    retrieval = retrieve(
+    return limit_key
+
+
+async def _ask_retrieve(payload: AskRequest) -> dict:
+    return await aretrieve(
         payload.question,
         k=payload.k,
         overfetch=payload.overfetch,
         project_id=payload.project_id,
+        diversity=payload.diversity,
+        retrieval_mode=payload.retrieval_mode,
+        recall_target=payload.recall_target,
     )
-    answer = answer_from_retrieval(
-        payload.question,
-        retrieval,
-        model=payload.model or DEFAULT_MODEL,
-    )
+
+
+@app.post("/ask", response_model=AskResponse)
+async def ask(payload: AskRequest):
+    limit_key = _admit_ask(payload)
+    start = time.perf_counter()
+    with collect() as timings:
+        retrieval = await _ask_retrieve(payload)
+        answer = await aanswer_from_retrieval(
+            payload.question,
+            retrieval,
+            model=payload.model or DEFAULT_MODEL,
+        )
     latency = int((time.perf_counter() - start) * 1000)
     LOG.info(
-        "ask project=%s mode=%s latency_ms=%s",
+        "ask project=%s mode=%s latency_ms=%s prompt_tokens=%s",
         payload.project_id,
         answer["mode"],
         latency,
+        answer.get("prompt_tokens"),
     )
     log_interaction(
         channel="api",
@@ -130,15 +259,186 @@ def ask(payload: AskRequest):
         answer=answer["answer"],
         mode=answer["mode"],
         latency_ms=latency,
+        answer_cache=answer.get("answer_cache"),
+        prompt_tokens=answer.get("prompt_tokens"),
+        timings=timings.as_dict(),
     )
     return {
         "answer": answer["answer"],
         "mode": answer["mode"],
         "sources": answer["sources"],
         "latency_ms": latency,
+        "prompt_tokens": answer.get("prompt_tokens"),
+        "timings": timings.as_dict() if payload.include_timings else None,
     }
 
 
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.post("/ask/stream")
+async def ask_stream(payload: AskRequest):
+    """
+    /ask over Server-Sent Events: `sources` (mode + sources, as soon as
+    retrieval finishes), `token` ({"text"}) per answer delta, then `done`
+    with answer, mode, sources, latency_ms {first_token, total} and, with
+    include_timings, the per-stage breakdown. Failures
+    after the stream has started arrive as an `error` event.
+    """
+    limit_key = _admit_ask(payload)
+    start = time.perf_counter()
+
+    async def events():
+        first_token_ms = None
+        with collect() as timings:
+            try:
+                retrieval = await _ask_retrieve(payload)
+                async for event, data in astream_answer(payload.question, retrieval, model=payload.model or DEFAULT_MODEL):
+                    if event == "token":
+                        if first_token_ms is None:
+                            first_token_ms = int((time.perf_counter() - start) * 1000)
+                        yield _sse("token", {"text": data})
+                    elif event == "sources":
+                        yield _sse("sources", data)
+                    else:
+                        answer = data
+            except Exception as exc:
+                LOG.exception("ask/stream failed: %s", exc)
+                yield _sse("error", {"detail": "Answer generation failed"})
+                return
+        latency = int((time.perf_counter() - start) * 1000)
+        LOG.info("ask/stream project=%s mode=%s first_token_ms=%s latency_ms=%s",
+                 payload.project_id, answer["mode"], first_token_ms, latency)
+        log_interaction(
+            channel="api-stream",
+            user_id=limit_key,
+            project_id=payload.project_id,
+            question=payload.question,
+            answer=answer["answer"],
+            mode=answer["mode"],
+            latency_ms=latency,
+            answer_cache=answer.get("answer_cache"),
+            prompt_tokens=answer.get("prompt_tokens"),
+            timings=timings.as_dict(),
+        )
+        done = {
+            "answer": answer["answer"],
+            "mode": answer["mode"],
+            "sources": answer["sources"],
+            "latency_ms": {"first_token": first_token_ms, "total": latency},
+            "prompt_tokens": answer.get("prompt_tokens"),
+        }
+        if payload.include_timings:
+            done["timings"] = timings.as_dict()
+        yield _sse("done", done)
+
+    # no-transform / X-Accel-Buffering keep proxies from holding back tokens
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"})
+
+
+def _admit_batch(project_id: Optional[int]) -> str:
+    limit_key = f"api-batch:{project_id or 'global'}"
+    retry_after = batch_rate_limiter.check(limit_key)
+    if retry_after:
+        raise HTTPException(429, f"Batch rate limit exceeded. Retry after {retry_after}s")
+    return limit_key
+
+
+async def _batch_lines(payload, limit_key: str, answer: bool) -> AsyncIterator[str]:
+    """
+    One NDJSON line per question, in completion order (`index` is the
+    question's position). All query embeddings go out in one request;
+    retrievals then run concurrently up to BATCH_RETRIEVE_CONCURRENCY (the
+    pool size) and chat completions up to BATCH_CHAT_CONCURRENCY. Each line
+    carries its own latency_ms (and, with include_timings, its stage
+    breakdown; the shared embedding request is not part of it); a failing
+    question yields an `error` line instead of failing the batch.
+    """
+    guarded = [guard_question(q) for q in payload.questions]
+    allowed = [i for i, (ok, _) in enumerate(guarded) if ok]
+    qvecs = {}
+    if needs_query_vector(payload.retrieval_mode):
+        qvecs = dict(zip(allowed, await aquery_vectors([payload.questions[i] for i in allowed])))
+    retrieve_slots = asyncio.Semaphore(BATCH_RETRIEVE_CONCURRENCY)
+    chat_slots = asyncio.Semaphore(BATCH_CHAT_CONCURRENCY)
+
+    async def one(i: int, question: str) -> dict:
+        start = time.perf_counter()
+        line = {"index": i, "question": question}
+        ok, reason = guarded[i]
+        if not ok:
+            return {**line, "error": reason, "latency_ms": 0}
+        try:
+            with collect() as timings:
+                async with retrieve_slots:
+                    retrieval = await aretrieve(
+                        question,
+                        k=payload.k,
+                        overfetch=payload.overfetch,
+                        project_id=payload.project_id,
+                        diversity=payload.diversity,
+                        retrieval_mode=payload.retrieval_mode,
+                        recall_target=payload.recall_target,
+                        qvec=qvecs.get(i),
+                    )
+                if not answer:
+                    line.update(retrieval)
+                    mode, text = retrieval["mode"], "[context-only]"
+                else:
+                    async with chat_slots:
+                        result = await aanswer_from_retrieval(question, retrieval, model=payload.model or DEFAULT_MODEL)
+                    line.update({
+                        "answer": result["answer"],
+                        "mode": result["mode"],
+                        "sources": result["sources"],
+                        "prompt_tokens": result.get("prompt_tokens"),
+                    })
+                    mode, text = result["mode"], result["answer"]
+        except Exception as exc:
+            LOG.exception("batch question %s failed: %s", i, exc)
+            return {**line, "error": "Question failed", "latency_ms": int((time.perf_counter() - start) * 1000)}
+        line["latency_ms"] = int((time.perf_counter() - start) * 1000)
+        if payload.include_timings:
+            line["timings"] = timings.as_dict()
+        log_interaction(
+            channel="api-batch" if answer else "api-retrieve-batch",
+            user_id=limit_key,
+            project_id=payload.project_id,
+            question=question,
+            answer=text,
+            mode=mode,
+            latency_ms=line["latency_ms"],
+            prompt_tokens=line.get("prompt_tokens"),
+            timings=timings.as_dict(),
+        )
+        return line
+
+    tasks = [asyncio.ensure_future(one(i, q)) for i, q in enumerate(payload.questions)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield json.dumps(await next_done, default=str) + "\n"
+    finally:
+        # Client went away: stop the questions still queued or running
+        for task in tasks:
+            task.cancel()
+
+
+@app.post("/ask/batch")
+async def ask_batch(payload: BatchAskRequest):
+    """Answer up to BATCH_MAX_QUESTIONS questions; streams NDJSON (see _batch_lines)."""
+    limit_key = _admit_batch(payload.project_id)
+    return StreamingResponse(_batch_lines(payload, limit_key, answer=True), media_type="application/x-ndjson")
+
+
+@app.post("/retrieve/batch")
+async def retrieve_batch(payload: BatchRetrieveRequest):
+    """Retrieval-only variant of /ask/batch; each line carries the /retrieve result."""
+    limit_key = _admit_batch(payload.project_id)
+    return StreamingResponse(_batch_lines(payload, limit_key, answer=False), media_type="application/x-ndjson")
+
+
 def _load_routes() -> dict:
     if not ROUTES_PATH.exists():
         return {}
@@ -159,12 +459,14 @@ def _default_project() -> Optional[int]:
         return None
 
 
-def resolve_project(phone: Optional[str]) -> Optional[int]:
-    if not phone:
-        return _default_project()
-    routes = _load_routes()
+def resolve_project(phone: Optional[str], business_number: Optional[str] = None) -> Optional[int]:
+    routes = _load_routes() if phone else {}
     if phone in routes:
         return int(routes[phone])
+    # Project whose WhatsApp number received the message
+    project = project_directory.by_whatsapp(business_number)
+    if project:
+        return project.id
     return _default_project()
 
 
@@ -185,7 +487,8 @@ def extract_whatsapp_payload(payload: dict) -> Optional[dict]:
                 continue
             sender = msg.get("from")
             profile = contacts[0].get("profile", {}).get("name") if contacts else None
-            return {"from": sender, "text": text.strip(), "name": profile}
+            business_number = (value.get("metadata") or {}).get("display_phone_number")
+            return {"from": sender, "text": text.strip(), "name": profile, "to": business_number}
     return None
 
 
@@ -251,6 +554,7 @@ def whatsapp_verify(
 
 @app.post("/whatsapp/webhook")
 async def whatsapp_webhook(request: Request):
+    start = time.perf_counter()
     payload = await request.json()
     message = extract_whatsapp_payload(payload)
     if not message:
@@ -260,24 +564,29 @@ async def whatsapp_webhook(request: Request):
     if not allowed:
         LOG.warning("guard blocked message from %s: %s", message.get("from"), reason)
         if message.get("from"):
-            send_whatsapp_message(message["from"], reason)
+            await asyncio.to_thread(send_whatsapp_message, message["from"], reason)
         return {"status": "blocked"}
     retry_after = whatsapp_rate_limiter.check(message.get("from") or "anon")
     if retry_after:
         if message.get("from"):
-            send_whatsapp_message(message["from"], f"Too many questions at once. Try again in {retry_after} seconds.")
+            await asyncio.to_thread(send_whatsapp_message, message["from"], f"Too many questions at once. Try again in {retry_after} seconds.")
         return {"status": "rate-limited"}
-    project_id = resolve_project(message.get("from"))
+    await project_directory.aensure_fresh()
+    project_id = resolve_project(message.get("from"), message.get("to"))
     if not project_id:
         LOG.warning("no project mapping for %s", message.get("from"))
         if message.get("from"):
-            send_whatsapp_message(message["from"], "Thanks for reaching out. An advisor will contact you shortly.")
+            await asyncio.to_thread(send_whatsapp_message, message["from"], "Thanks for reaching out. An advisor will contact you shortly.")
         return {"status": "routed-to-human"}
     LOG.info("WhatsApp inbound from %s project=%s", message["from"], project_id)
-    retrieval = retrieve(message["text"], project_id=project_id)
-    answer = answer_from_retrieval(message["text"], retrieval, model=DEFAULT_MODEL)
-    reply = format_whatsapp_reply(answer)
-    send_whatsapp_message(message["from"], reply)
+    with collect() as timings:
+        retrieval = await aretrieve(message["text"], project_id=project_id)
+        answer = await aanswer_from_retrieval(message["text"], retrieval, model=DEFAULT_MODEL)
+        reply = format_whatsapp_reply(answer)
+        with span("send"):
+            await asyncio.to_thread(send_whatsapp_message, message["from"], reply)
+    latency = int((time.perf_counter() - start) * 1000)
+    LOG.info("whatsapp project=%s mode=%s latency_ms=%s", project_id, answer["mode"], latency)
     log_interaction(
         channel="whatsapp",
         user_id=message["from"],
@@ -285,7 +594,10 @@ async def whatsapp_webhook(request: Request):
         question=message["text"],
         answer=answer["answer"],
         mode=answer["mode"],
-        latency_ms=0,
+        latency_ms=latency,
+        answer_cache=answer.get("answer_cache"),
+        prompt_tokens=answer.get("prompt_tokens"),
+        timings=timings.as_dict(),
     )
     return {"status": "sent", "mode": answer["mode"]}
 
@@ -7,6 +7,8 @@ from typing import List, Optional
 import psycopg
 from dotenv import load_dotenv
 
+from utils.vector import register_vector, to_vector
+
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -137,17 +139,9 @@ def add_project(name: str, slug: Optional[str], whatsapp: Optional[str], source_
 
 def _embed(value: str) -> List[float]:
     _require_openai()
-    from openai import OpenAI  # type: ignore
-
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    resp = client.embeddings.create(model="text-embedding-3-small", input=[value])
-    return resp.data[0].embedding
-
+    from utils.ai import _embed as _embed_texts
 
-def _to_pgvector(vec: Optional[List[float]]) -> Optional[str]:
-    if vec is None:
-        return None
-    return "[" + ",".join(f"{x:.8f}" for x in vec) + "]"
+    return _embed_texts([value])[0]
 
 
 def upsert_fact(project_id: int, key: str, value: str, source_page: Optional[str], meta: Optional[str], embed: bool):
@@ -155,6 +149,7 @@ def upsert_fact(project_id: int, key: str, value: str, source_page: Optional[str
     vector = _embed(value) if embed else None
     meta_json = json.loads(meta) if meta else {}
     with psycopg.connect(DATABASE_URL) as con, con.cursor() as cur:
+        register_vector(con)
         cur.execute(
             """
             INSERT INTO facts (project_id, key, value, source_page, meta, embedding)
@@ -166,12 +161,24 @@ def upsert_fact(project_id: int, key: str, value: str, source_page: Optional[str
                           embedding=EXCLUDED.embedding,
                           created_at=NOW()
             """,
-            (project_id, key, value, source_page, json.dumps(meta_json), _to_pgvector(vector)),
+            (project_id, key, value, source_page, json.dumps(meta_json), to_vector(vector)),
         )
         con.commit()
     print(f"[facts] upserted ({project_id}, {key})")
 
 
+def refresh_ocr_windows(source_pdfs: Optional[List[str]]):
+    _require_db_url()
+    from retrieval.ocr_windows import ADD_WINDOW_COLUMNS_SQL, refresh_windows
+
+    with psycopg.connect(DATABASE_URL) as con, con.cursor() as cur:
+        # Databases created before the window columns: add them (one-off, locks ocr_pages)
+        cur.execute(ADD_WINDOW_COLUMNS_SQL)
+        changed = refresh_windows(cur, source_pdfs)
+        con.commit()
+    print(f"[ocr] neighbour pages updated on {changed} rows")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Database utilities")
     sub = parser.add_subparsers(dest="cmd", required=True)
@@ -195,6 +202,9 @@ def main():
     fact.add_argument("--meta", help="JSON metadata string")
     fact.add_argument("--no-embed", action="store_true", help="Skip embedding (stores NULL)")
 
+    windows = sub.add_parser("ocr-windows", help="Materialize prev/next page links on ocr_pages")
+    windows.add_argument("--source-pdf", action="append", help="Only this PDF (repeatable)")
+
     args = parser.parse_args()
 
     if args.cmd == "schema":
@@ -205,6 +215,8 @@ def main():
         add_project(args.name, args.slug, args.whatsapp, args.source_root, args.meta)
     elif args.cmd == "facts-upsert":
         upsert_fact(args.project_id, args.key, args.value, args.source_page, args.meta, embed=not args.no_embed)
+    elif args.cmd == "ocr-windows":
+        refresh_ocr_windows(args.source_pdf)
     else:
         parser.error(f"unknown command {args.cmd}")
 
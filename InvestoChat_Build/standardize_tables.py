@@ -10,6 +10,8 @@ import psycopg
 from dotenv import load_dotenv
 from typing import List
 
+from utils.vector import register_vector, to_vector
+
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -25,14 +27,8 @@ STANDARD_TABLE_TYPES = [
 
 def _embed_text(text: str) -> List[float]:
     """Generate embedding for placeholder text"""
-    from openai import OpenAI
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    resp = client.embeddings.create(model="text-embedding-3-small", input=[text])
-    return resp.data[0].embedding
-
-
-def _to_pgvector(vec: List[float]) -> str:
-    return "[" + ",".join(f"{x:.8f}" for x in vec) + "]"
+    from utils.ai import _embed
+    return _embed([text])[0]
 
 
 def get_projects():
@@ -81,6 +77,7 @@ Please contact the developer directly for:
 
     # Insert placeholder
     with psycopg.connect(DATABASE_URL) as conn:
+        register_vector(conn)
         with conn.cursor() as cur:
             cur.execute("""
                 INSERT INTO document_tables (
@@ -100,7 +97,7 @@ Please contact the developer directly for:
                 placeholder_markdown,
                 "",             # No original content
                 summary,
-                _to_pgvector(embedding)
+                to_vector(embedding)
             ))
         conn.commit()
 
@@ -16,16 +16,22 @@ def log_event(event: str, payload: Optional[Dict[str, Any]] = None) -> None:
         fh.write(json.dumps(entry) + "\n")
 
 
-def log_interaction(channel: str, user_id: str, project_id: Optional[int], question: str, answer: str, mode: str, latency_ms: int) -> None:
-    log_event(
-        "interaction",
-        {
-            "channel": channel,
-            "user": user_id,
-            "project_id": project_id,
-            "question": question,
-            "answer": answer,
-            "mode": mode,
-            "latency_ms": latency_ms,
-        },
-    )
+def log_interaction(channel: str, user_id: str, project_id: Optional[int], question: str, answer: str, mode: str, latency_ms: int,
+                    answer_cache: Optional[str] = None, prompt_tokens: Optional[int] = None,
+                    timings: Optional[Dict[str, Any]] = None) -> None:
+    payload = {
+        "channel": channel,
+        "user": user_id,
+        "project_id": project_id,
+        "question": question,
+        "answer": answer,
+        "mode": mode,
+        "latency_ms": latency_ms,
+    }
+    if answer_cache:
+        payload["answer_cache"] = answer_cache  # "hit" / "miss"; absent when no chat call was needed
+    if prompt_tokens is not None:
+        payload["prompt_tokens"] = prompt_tokens
+    if timings:
+        payload["timings"] = timings  # utils.timing breakdown: total_ms, stages_ms, cache flags, counts
+    log_event("interaction", payload)
@@ -0,0 +1,70 @@
+"""In-process vector index: exact top-k and incremental (append-only) refresh."""
+
+import numpy as np
+
+import retrieval.ann as ann
+from retrieval.ann import LocalVectorIndex, TableSpec
+
+SPEC = TableSpec("documents", "text", "count(*), max(id)")
+
+
+class FakeCursor:
+    """Serves the signature and row queries LocalVectorIndex issues."""
+
+    def __init__(self, rows):
+        self.rows = rows  # (id, project_id, text, embedding)
+        self.fetched_after = []
+        self._result = None
+
+    def execute(self, sql, params=(), binary=False):
+        if sql.startswith("SELECT count(*)"):
+            self._result = [(len(self.rows), max(r[0] for r in self.rows))]
+            return
+        after = params[0] if params else None
+        self.fetched_after.append(after)
+        self._result = [r for r in self.rows if after is None or r[0] > after]
+
+    def fetchone(self):
+        return self._result[0]
+
+    def fetchall(self):
+        return self._result
+
+
+def _rows(n, dim=16, start=1, seed=0):
+    rng = np.random.default_rng(seed)
+    return [(i, i % 2, f"chunk {i}", rng.normal(size=dim).astype(np.float32)) for i in range(start, start + n)]
+
+
+def test_search_matches_brute_force(monkeypatch):
+    monkeypatch.setattr(ann, "LOCAL_ANN", True)
+    rows = _rows(50)
+    index = LocalVectorIndex({"documents": SPEC})
+    index._refresh_table(FakeCursor(rows), SPEC)
+    assert index.serves("documents")
+
+    q = np.random.default_rng(9).normal(size=16).astype(np.float32)
+    mat = np.stack([r[3] / np.linalg.norm(r[3]) for r in rows])
+    sims = mat @ (q / np.linalg.norm(q))
+    for project_id in (None, 1):
+        allowed = [i for i, r in enumerate(rows) if project_id is None or r[1] == project_id]
+        expected = sorted(allowed, key=lambda i: -sims[i])[:5]
+        hits = index.search("documents", q, 5, project_id)
+        assert [h[0] for h in hits] == [(rows[i][2],) for i in expected]
+        assert np.allclose([h[1] for h in hits], sims[expected], atol=1e-5)
+
+
+def test_refresh_appends_new_rows_only():
+    cur = FakeCursor(_rows(10))
+    index = LocalVectorIndex({"documents": SPEC})
+    index._refresh_table(cur, SPEC)
+    cur.rows += _rows(3, start=11, seed=1)
+    index._refresh_table(cur, SPEC)
+    assert cur.fetched_after == [None, 10]
+    assert index.stats()["tables"]["documents"]["rows"] == 13
+
+    cur.rows = cur.rows[2:]  # deletions force a full reload
+    cur.rows += _rows(1, start=14, seed=2)
+    index._refresh_table(cur, SPEC)
+    assert cur.fetched_after[-1] is None
+    assert index.stats()["tables"]["documents"]["rows"] == 12
@@ -0,0 +1,68 @@
+"""Answer cache: context fingerprint, TTL, persistence and source invalidation."""
+
+import asyncio
+import sqlite3
+import threading
+
+import main
+from utils.answer_cache import AnswerCache, answer_key, context_ids
+
+METAS = [{"source": "Trevoc_56.pdf", "page": 3}, {"source": "Trevoc_56.pdf", "page": 4}]
+CHUNKS = ["Payment plan: 10% on booking", "Balance on possession"]
+
+
+def test_key_normalizes_question_but_tracks_context():
+    ids, sources = context_ids(METAS)
+    assert sources == ["Trevoc_56.pdf"]
+    key = answer_key("Trevoc  payment plan?", "gpt-4.1-mini", CHUNKS, ids)
+    assert key == answer_key("trevoc payment plan?", "gpt-4.1-mini", [" Payment plan:  10% on booking", CHUNKS[1]], ids)
+    assert key != answer_key("trevoc payment plan?", "gpt-4.1", CHUNKS, ids)
+    assert key != answer_key("trevoc payment plan?", "gpt-4.1-mini", CHUNKS[:1], ids[:1])
+    assert key != answer_key("trevoc payment plan?", "gpt-4.1-mini", CHUNKS, [("Trevoc_56.pdf", 9), ids[1]])
+
+
+def test_persisted_hits_and_invalidation_across_instances(tmp_path):
+    path = str(tmp_path / "answers.sqlite")
+    service, ingest = AnswerCache(path), AnswerCache(path)
+    service.put("k", "10/90 plan", ["Trevoc_56.pdf"], latency_ms=1200)
+    assert AnswerCache(path).get("k") == "10/90 plan"  # survives a restart
+    assert service.get("k") == "10/90 plan" and service.stats()["saved_ms"] == 1200
+    ingest.invalidate_sources(["Trevoc_56.pdf"])  # e.g. load_ocr_pages in another process
+    assert service.get("k") is None and service.stats()["stale"] == 1
+
+
+def test_async_access_keeps_sqlite_off_the_loop(tmp_path):
+    cache, threads = AnswerCache(str(tmp_path / "answers.sqlite")), set()
+    connect = cache._conn
+
+    def tracked_conn() -> sqlite3.Connection:
+        threads.add(threading.get_ident())
+        return connect()
+
+    cache._conn = tracked_conn
+
+    async def run():
+        await cache.aput("k", "10/90 plan", ["Trevoc_56.pdf"], latency_ms=900)
+        return await cache.aget("k"), threading.get_ident()
+
+    answer, loop_thread = asyncio.run(run())
+    assert answer == "10/90 plan" and threads and loop_thread not in threads
+
+
+def test_memory_only_ttl():
+    cache = AnswerCache(path="", ttl=0.0)
+    cache.put("k", "answer", [], latency_ms=5)
+    assert cache.get("k") is None and cache.stats()["hit_rate"] == 0.0
+
+
+def test_answer_from_retrieval_reuses_cached_reply(monkeypatch):
+    calls = []
+    monkeypatch.setattr(main, "OPENAI_API_KEY", "test")
+    monkeypatch.setattr(main, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(main, "answer_cache", AnswerCache(path=""))
+    monkeypatch.setattr(main, "_chat", lambda prompt, model: calls.append(prompt) or "10% on booking")
+    retrieval = {"mode": "docs", "answers": CHUNKS, "metas": METAS}
+    first = main.answer_from_retrieval("Trevoc payment plan?", retrieval)
+    second = main.answer_from_retrieval("trevoc payment  plan?", retrieval)
+    assert first["answer"] == second["answer"] == "10% on booking" and len(calls) == 1
+    assert (first["answer_cache"], second["answer_cache"]) == ("miss", "hit")
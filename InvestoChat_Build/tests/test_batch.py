@@ -0,0 +1,41 @@
+"""Batch endpoints: one shared embedding call, NDJSON lines per question."""
+
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+import service
+
+
+def test_ask_batch_streams_one_line_per_question(monkeypatch):
+    embedded, qvecs = [], []
+
+    async def fake_vectors(questions):
+        embedded.append(list(questions))
+        return [[0.1, 0.2] for _ in questions]
+
+    async def fake_retrieve(question, qvec=None, **kwargs):
+        qvecs.append(qvec)
+        await asyncio.sleep(0.05 if question.startswith("slow") else 0)
+        return {"mode": "docs", "answers": [question], "metas": [{"source": "a.pdf", "page": 1}]}
+
+    async def fake_answer(question, retrieval, model=None):
+        return {"answer": f"re: {question}", "mode": "docs", "sources": retrieval["metas"], "prompt_tokens": 9}
+
+    monkeypatch.setattr(service, "aquery_vectors", fake_vectors)
+    monkeypatch.setattr(service, "aretrieve", fake_retrieve)
+    monkeypatch.setattr(service, "aanswer_from_retrieval", fake_answer)
+    monkeypatch.setattr(service, "log_interaction", lambda **kwargs: None)
+
+    questions = ["slow payment plan", "amenities?", "email me at a@b.com"]
+    response = TestClient(service.app).post("/ask/batch", json={"questions": questions})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    assert embedded == [questions[:2]]  # one embedding request, guarded question left out
+    assert qvecs == [[0.1, 0.2], [0.1, 0.2]]
+    by_index = {line["index"]: line for line in lines}
+    assert lines[-1]["index"] == 0  # slowest question arrives last
+    assert by_index[1]["answer"] == "re: amenities?" and "latency_ms" in by_index[1]
+    assert "error" in by_index[2]
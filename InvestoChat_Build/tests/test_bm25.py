@@ -0,0 +1,130 @@
+"""In-process BM25 index: scoring, incremental segments and persistence."""
+
+from contextlib import nullcontext
+
+import numpy as np
+
+import main
+import retrieval.bm25 as bm25
+from retrieval.bm25 import BM25Index, LexicalIndex
+
+ROWS = [
+    (1, 10, ("Payment plan 10/90 with construction linked instalments", 3, "pricing", "a.pdf")),
+    (2, 10, ("Clubhouse, swimming pool and gym amenities", 5, "amenities", "a.pdf")),
+    (3, 20, ("Possession linked payment plan for tower B", 2, "pricing", "b.pdf")),
+    (4, 20, ("Location map near the expressway and metro", 1, None, "b.pdf")),
+]
+
+
+def _brute(index: BM25Index, query: str) -> dict:
+    """Reference BM25 straight from the definition."""
+    from collections import Counter
+    from utils.text import domain_tokens
+
+    docs = {_id: domain_tokens(payload[0]) for _id, _, payload in index.rows()}
+    avgdl = np.mean([len(t) for t in docs.values()])
+    out = {}
+    for _id, tokens in docs.items():
+        tf, s = Counter(tokens), 0.0
+        for term in set(domain_tokens(query)):
+            df = sum(term in t for t in docs.values())
+            if tf[term]:
+                idf = np.log1p((len(docs) - df + 0.5) / (df + 0.5))
+                s += idf * tf[term] * (index.k1 + 1) / (tf[term] + index.k1 * (1 - index.b + index.b * len(tokens) / avgdl))
+        if s:
+            out[_id] = s
+    return out
+
+
+def test_scores_match_reference_and_project_filter():
+    index = BM25Index()
+    index.add(ROWS)
+    hits = index.search("payment plan", 10)
+    assert [h[0][3] for h in hits] == ["a.pdf", "b.pdf"]
+    expected = _brute(index, "payment plan")
+    assert np.allclose(sorted(s for _, s in hits), sorted(expected.values()), rtol=1e-5)
+    assert index.search_ids("payment plan", 10, project=20) == [3]
+    assert index.search("payment plan", 10, project=99) == []
+    assert index.search("zzz unknown", 10) == []
+
+
+def test_segments_and_replacement_match_full_build():
+    incremental = BM25Index()
+    incremental.add(ROWS[:2])
+    incremental.add(ROWS[2:])
+    incremental.add([(2, 10, ("Payment plan for the clubhouse", 5, "amenities", "a.pdf"))])  # update id 2
+    full = BM25Index()
+    full.add([ROWS[0], ROWS[2], ROWS[3], (2, 10, ("Payment plan for the clubhouse", 5, "amenities", "a.pdf"))])
+    assert len(incremental) == 4
+    a = dict(zip(incremental.search_ids("payment plan clubhouse", 10),
+                 (s for _, s in incremental.search("payment plan clubhouse", 10))))
+    b = dict(zip(full.search_ids("payment plan clubhouse", 10),
+                 (s for _, s in full.search("payment plan clubhouse", 10))))
+    assert a.keys() == b.keys() and all(np.isclose(a[i], b[i]) for i in a)
+
+
+def test_save_load_roundtrip(tmp_path):
+    index = BM25Index()
+    index.add(ROWS[:3])
+    index.add(ROWS[3:])
+    path = tmp_path / "bm25_documents.npz"
+    index.save(path, (4, 4))
+    loaded, signature = BM25Index.load(path)
+    assert signature == (4, 4)
+    assert loaded.search("metro expressway", 2) == index.search("metro expressway", 2)
+    loaded.add([(5, 20, ("Metro station walking distance", 1, None, "b.pdf"))])
+    assert loaded.search_ids("metro", 1) in ([4], [5])
+
+
+def test_copy_add_leaves_serving_index_untouched():
+    serving = BM25Index()
+    serving.add(ROWS[:3])
+    before = serving.search("payment plan metro", 10)
+    appended = serving.copy()
+    appended.add([ROWS[3], (3, 20, ("Metro station next to tower B", 2, None, "b.pdf"))])  # new row + update id 3
+    assert serving.search("payment plan metro", 10) == before and len(serving) == 3
+    assert len(appended) == 4 and 4 in appended.search_ids("metro", 10)
+
+
+def test_bm25_mode_skips_embedding_and_connection(monkeypatch, tmp_path):
+    lexical = LexicalIndex(directory=tmp_path)
+    lexical._indexes["documents"] = BM25Index()
+    lexical._indexes["documents"].add(ROWS)
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("bm25 hit should not embed or borrow a connection")
+
+    monkeypatch.setattr(bm25, "BM25_INDEX", True)
+    monkeypatch.setattr(main, "lexical_index", lexical)
+    monkeypatch.setattr(main, "SEMANTIC_CACHE_ENABLED", False)
+    monkeypatch.setattr(main, "_query_cache", {})
+    monkeypatch.setattr(main, "_query_vector", unexpected)
+    monkeypatch.setattr(main, "_pg", unexpected)
+    monkeypatch.setattr(main.schema_registry, "ensure_fresh", lambda: None)
+    monkeypatch.setattr(main.project_directory, "ensure_fresh", lambda: None)
+    r = main.retrieve("construction linked payment plan", retrieval_mode="bm25")
+    assert r["mode"] == "bm25" and r["answers"]
+
+
+def test_bm25_miss_falls_through_to_vector_search_without_semantic_cache(monkeypatch, tmp_path):
+    lexical = LexicalIndex(directory=tmp_path)
+    lexical._indexes["documents"] = BM25Index()
+    lexical._indexes["documents"].add(ROWS)
+    embedded, searched = [], []
+
+    def search_vectors(qvec, **kwargs):
+        searched.append(qvec)
+        return [], [("Tower B possession in 2027", {"page": 2, "source": "b.pdf", "score": 0.8})]
+
+    monkeypatch.setattr(bm25, "BM25_INDEX", True)
+    monkeypatch.setattr(main, "lexical_index", lexical)
+    monkeypatch.setattr(main, "SEMANTIC_CACHE_ENABLED", False)
+    monkeypatch.setattr(main, "_query_cache", {})
+    monkeypatch.setattr(main, "_query_vector", lambda q: embedded.append(q) or [0.1, 0.2])
+    monkeypatch.setattr(main, "search_vectors", search_vectors)
+    monkeypatch.setattr(main, "_pg", nullcontext)
+    monkeypatch.setattr(main.schema_registry, "ensure_fresh", lambda: None)
+    monkeypatch.setattr(main.project_directory, "ensure_fresh", lambda: None)
+    r = main.retrieve("zzz unmatched wording", retrieval_mode="bm25")
+    assert embedded == ["zzz unmatched wording"] and searched == [[0.1, 0.2]]
+    assert r["answers"] == ["Tower B possession in 2027"]
@@ -0,0 +1,38 @@
+"""Context packing: budget, neighbour-page dedupe, whole tables, trimmed lines."""
+
+from retrieval.context import count_tokens, pack_context
+
+TABLE = "| Stage | Amount |\n|---|---|\n| Booking | 10% |\n| Possession | 90% |"
+
+
+def test_neighbour_pages_are_not_repeated():
+    # Legacy OCR windows: hits on pages 3 and 4 both carry pages 3-4
+    p2, p3, p4, p5 = "Site plan overview", "Payment plan: 10/90", "Booking amount 5 lakh", "Amenities list"
+    packed = pack_context([f"{p2}\n\n{p3}\n\n{p4}", f"{p3}\n\n{p4}\n\n{p5}"], budget=1000)
+    assert packed.text.count(p3) == 1 and packed.text.count(p4) == 1 and p5 in packed.text
+    assert packed.duplicate_blocks == 2 and packed.used == [0, 1]
+
+
+def test_budget_keeps_top_chunks_and_whole_tables():
+    filler = "\n".join(f"Specification line {i} with some detail" for i in range(200))
+    chunks = ["Payment schedule\n" + TABLE, filler, "Low ranked chunk"]
+    packed = pack_context(chunks, budget=120)
+    assert packed.tokens <= 120
+    assert TABLE in packed.text and "Low ranked chunk" not in packed.text
+    assert packed.used == [0, 1] and packed.dropped_blocks > 0
+    # A table that does not fit is left out entirely, never cut
+    tight = pack_context(["Intro line", TABLE], budget=count_tokens("Intro line") + 3)
+    assert "| Booking" not in tight.text
+
+
+def test_low_value_lines_trimmed_numbers_kept():
+    packed = pack_context(["Page 3\nPrice: ₹2.1 Cr onwards\n2027\n-----\nwww.example.com"], budget=1000)
+    assert packed.text == "Price: ₹2.1 Cr onwards\n2027" and packed.trimmed_lines == 3
+
+
+def test_repeats_inside_a_chunk_survive():
+    floor_plan = "\n".join(["BED ROOM", "1800", "BALCONY 1800MM WIDE"] * 3)
+    schedule = "Booking\n10%\nExcavation\n10%\nPossession\n10%"
+    packed = pack_context([floor_plan, schedule], budget=1000)
+    assert packed.text.count("BED ROOM") == 3 and packed.text.count("1800\n") == 3
+    assert packed.text.count("10%") == 3 and packed.duplicate_blocks == 0
@@ -0,0 +1,64 @@
+"""Persistent embedding store: batch lookups, dedupe and reuse across instances."""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from utils import ai
+from utils.embed_store import EmbeddingStore
+
+
+def _fake_fetch(calls):
+    def fetch(texts):
+        calls.append(list(texts))
+        return [[float(len(t)), 0.5, -1.0] for t in texts]
+    return fetch
+
+
+def test_only_missing_texts_are_fetched(tmp_path):
+    calls = []
+    store = EmbeddingStore(str(tmp_path / "emb.sqlite"))
+    first = store.embed("m", ["alpha", "beta", "alpha"], _fake_fetch(calls))
+    assert calls == [["alpha", "beta"]]
+    assert first[0] == first[2] == [5.0, 0.5, -1.0]
+
+    second = store.embed("m", ["beta", "gamma"], _fake_fetch(calls))
+    assert calls[-1] == ["gamma"]
+    assert second[0] == first[1]
+
+
+def test_store_survives_restart_and_separates_models(tmp_path):
+    path = str(tmp_path / "emb.sqlite")
+    calls = []
+    EmbeddingStore(path).embed("m", ["payment  plan "], _fake_fetch(calls))
+
+    reopened = EmbeddingStore(path)
+    assert reopened.embed("m", ["payment plan"], _fake_fetch(calls)) == [[14.0, 0.5, -1.0]]
+    assert len(calls) == 1  # whitespace-normalized key, served from disk
+    assert reopened.stats()["disk_hits"] == 1
+
+    reopened.embed("other-model", ["payment plan"], _fake_fetch(calls))
+    assert len(calls) == 2
+
+
+def test_async_embed_keeps_sqlite_off_the_loop(tmp_path, monkeypatch):
+    store, threads = EmbeddingStore(str(tmp_path / "emb.sqlite")), set()
+    connect = store._conn
+
+    def tracked_conn():
+        threads.add(threading.get_ident())
+        return connect()
+
+    async def create(model, input, timeout):
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[float(len(t)), 0.5]) for t in input])
+
+    store._conn = tracked_conn
+    monkeypatch.setattr(ai, "embedding_store", store)
+    monkeypatch.setattr(ai, "get_async_client", lambda: SimpleNamespace(embeddings=SimpleNamespace(create=create)))
+
+    async def run():
+        return await ai._aembed(["alpha", "beta"]), threading.get_ident()
+
+    vectors, loop_thread = asyncio.run(run())
+    assert vectors == [[5.0, 0.5], [4.0, 0.5]]
+    assert threads and loop_thread not in threads
@@ -0,0 +1,38 @@
+"""Hybrid (vector + trigram RRF) statement construction and row decoding."""
+
+import numpy as np
+
+from main import _hybrid_rows, _hybrid_sql
+
+QVEC = [0.1] * 4
+
+
+def test_placeholders_match_params():
+    for project_id in (None, 7):
+        sql, params = _hybrid_sql(QVEC, ["payment", "plan"], 8, 24, project_id)
+        assert sql.count("%s") == len(params)
+        qvec, *rest = params  # float32 array, sent by the binary vector dumper
+        assert qvec.dtype == np.float32 and qvec.shape == (len(QVEC),)
+        assert ["%payment%", "%plan%"] in rest
+        if project_id is not None:
+            assert rest.count(project_id) == 3  # facts, vector and lexical branches
+
+
+def test_rows_split_into_facts_and_fused_docs():
+    rows = [
+        ("facts", "10/80/10", None, "p.12", "payment_plan", None, 0.42, None, None, None),
+        ("docs", "CLP table", 12, None, "pricing", "a.pdf", 0.81, 1 / 61 + 1 / 62, 1, 2),
+        ("docs", "booking amount", 14, None, None, "a.pdf", None, 1 / 61, None, 1),
+    ]
+    facts, docs = _hybrid_rows(rows)
+    assert facts == [("10/80/10", {"page": "p.12", "key": "payment_plan", "score": 0.42})]
+    assert [d[0] for d in docs] == ["CLP table", "booking amount"]
+    assert docs[1][1]["score"] == 0.0 and docs[1][1]["lex_rank"] == 1 and docs[1][1]["vec_rank"] is None
+
+
+def test_bm25_ids_replace_trigram_branch():
+    sql, params = _hybrid_sql(QVEC, ["payment"], 8, 24, 7, lex_ids=[5, 3])
+    assert sql.count("%s") == len(params)
+    assert "unnest(" in sql and "ILIKE" not in sql
+    assert [5, 3] in params[2:]
+    assert params[2:].count(7) == 2  # facts and vector branches only
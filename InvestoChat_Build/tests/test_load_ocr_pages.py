@@ -0,0 +1,38 @@
+"""OCR JSONL parsing/cleaning for the bulk loader (no database needed)."""
+
+import json
+from pathlib import Path
+
+from load_ocr_pages import PROJECT_HINTS, _batches, _clean_batch, clean_page, project_for
+from retrieval.projects import ProjectDirectory
+
+OUTPUTS = Path(__file__).resolve().parent.parent / "outputs"
+
+
+def test_clean_page_row():
+    line = json.dumps({"pdf": "/app/brochures/Trevoc_56.pdf", "page": "3",
+                       "text": "Payment Plan\n\n\n\n• 10% on booking"})
+    source, page, text, project, tags = clean_page(line, "Trevoc 56")
+    assert (source, page, project, tags) == ("Trevoc_56.pdf", 3, "Trevoc 56", "payment")
+    assert "\n\n\n" not in text and "- 10% on booking" in text
+
+
+def test_unusable_lines_are_skipped():
+    assert clean_page("not json", None) is None
+    assert clean_page(json.dumps({"pdf": "a.pdf", "text": "no page"}), None) is None
+    assert clean_page(json.dumps({"pdf": "a.pdf", "page": 1, "text": "   "}), None) is None
+
+
+def test_project_from_file_name():
+    directory = ProjectDirectory(PROJECT_HINTS)
+    assert project_for(Path("outputs/Trevoc_56/Trevoc_56.jsonl"), directory) == "Trevoc 56"
+    assert project_for(Path("outputs/New_Tower/New_Tower.jsonl"), directory) == "New Tower"
+
+
+def test_batches_cover_every_page():
+    fp = OUTPUTS / "Trevoc_56" / "Trevoc_56.jsonl"
+    lines = [ln for ln in fp.read_text(encoding="utf-8").splitlines() if ln.strip()]
+    batches = list(_batches(fp, 40))
+    assert sum(len(b) for b in batches) == len(lines)
+    rows = [r for b in batches for r in _clean_batch((b, "Trevoc 56"))]
+    assert rows and len({(r[0], r[1]) for r in rows}) == len(rows)
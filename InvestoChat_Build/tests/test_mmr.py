@@ -0,0 +1,67 @@
+"""MMR selection must match the original per-round rescoring loop."""
+
+import random
+
+from main import mmr, score, tokenize
+from retrieval.mmr import mmr_select, token_overlap_matrix
+
+WORDS = "payment plan clp plp booking possession 3 bhk tower club pool gym sector 10% 20% | milestone".split()
+
+
+def _reference(documents, metadatas, qtokens, lambda_=0.75, topk=3, intent=None):
+    cand = list(range(len(documents)))
+    selected = []
+    token_sets = [set(d.lower().split()) for d in documents]
+    while cand and len(selected) < topk:
+        best, best_s = None, -1e9
+        for i in cand:
+            rel = score(documents[i], metadatas[i], qtokens, intent=intent)
+            div = 0
+            if selected:
+                div = max(len(token_sets[i] & token_sets[j]) / max(1, min(len(token_sets[i]), len(token_sets[j])))
+                          for j in selected)
+            s = lambda_ * rel - (1 - lambda_) * div
+            if s > best_s:
+                best, best_s = i, s
+        selected.append(best)
+        cand.remove(best)
+    return selected
+
+
+def test_matches_reference_selection():
+    rng = random.Random(3)
+    qtokens = tokenize("payment plan for 3 bhk")
+    for n in (1, 5, 24, 60):
+        docs = [" ".join(rng.choices(WORDS, k=rng.randint(3, 40))) for _ in range(n)]
+        metas = [{"page": rng.randint(1, 30), "source": "x.pdf"} for _ in range(n)]
+        for intent in (None, "payment", "amenities"):
+            expected = _reference(docs, metas, qtokens, topk=5, intent=intent)
+            _, got = mmr(docs, metas, qtokens, topk=5, intent=intent)
+            assert got == [metas[i] for i in expected]
+
+
+def test_overlap_matrix_and_ties():
+    sim = token_overlap_matrix([{"a", "b"}, {"a", "b", "c"}, {"z"}])
+    assert sim[0, 1] == 1.0 and sim[0, 2] == 0.0
+    # Equal relevance: lowest index wins, then diversity pushes away the duplicate
+    assert mmr_select([1.0, 1.0, 1.0], sim, lambda_=0.5, topk=2) == [0, 2]
+
+
+def test_empty_candidates():
+    assert mmr([], [], ["x"]) == ([], [])
+
+
+def test_embedding_diversity_skips_near_duplicate():
+    import numpy as np
+    docs = ["alpha one", "alpha two", "beta three"]
+    metas = [{"page": i} for i in range(3)]
+    vecs = [np.array([1.0, 0.0]), np.array([0.99, 0.01]), np.array([0.0, 1.0])]
+    _, got = mmr(docs, metas, [], lambda_=0.5, topk=2, diversity="embedding", embeddings=vecs)
+    assert [m["page"] for m in got] == [0, 2]
+
+
+def test_pgvector_binary_roundtrip():
+    import struct
+    from utils.vector import as_vector
+    raw = struct.pack(">HH3f", 3, 0, 0.5, -1.0, 2.0)
+    assert as_vector(raw).tolist() == [0.5, -1.0, 2.0]
@@ -0,0 +1,52 @@
+"""
+The OCR fallback statements must be able to use the ocr_pages indexes.
+
+Runs EXPLAIN against DATABASE_URL (skipped when unset or when ocr_pages is not
+the managed table from db/schema.sql). Sequential scans are disabled for the
+transaction, so any Seq Scan left in the plan means no index applies.
+"""
+
+import os
+
+import pytest
+
+from main import _ocr_ilike_sql, _ocr_trgm_sql
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="DATABASE_URL not set")
+
+
+@pytest.fixture(scope="module")
+def con():
+    psycopg = pytest.importorskip("psycopg")
+    with psycopg.connect(DATABASE_URL) as con:
+        with con.cursor() as cur:
+            cur.execute(
+                "SELECT count(*) FROM information_schema.columns "
+                "WHERE table_name = 'ocr_pages' AND column_name IN ('tsv', 'prev_page', 'next_page')"
+            )
+            if cur.fetchone()[0] < 3:
+                pytest.skip("ocr_pages is not the managed table (run setup_db.py schema)")
+        yield con
+
+
+def _scans(plan):
+    yield plan.get("Node Type"), plan.get("Relation Name")
+    for child in plan.get("Plans", []):
+        yield from _scans(child)
+
+
+def _seq_scans(con, sql, params):
+    with con.transaction(force_rollback=True), con.cursor() as cur:
+        cur.execute("SET LOCAL enable_seqscan = off")
+        cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cur.fetchone()[0][0]["Plan"]
+    return [rel for node, rel in _scans(plan) if node == "Seq Scan" and rel == "ocr_pages"]
+
+
+@pytest.mark.parametrize("build", [_ocr_ilike_sql, _ocr_trgm_sql])
+@pytest.mark.parametrize("windowed", [False, True])
+@pytest.mark.parametrize("tag", [None, "payment"])
+def test_no_seq_scan(con, build, windowed, tag):
+    sql, params = build(["payment plan", "clp"], 24, None, tag, windowed=windowed, indexed=True)
+    assert _seq_scans(con, sql, params) == []
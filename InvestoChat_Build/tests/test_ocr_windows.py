@@ -0,0 +1,77 @@
+"""OCR page-window statement construction and merging of adjacent hits."""
+
+import re
+
+from main import _ocr_ilike_sql, _ocr_trgm_sql
+from retrieval.ocr_windows import assemble, refresh_windows
+
+
+def test_placeholders_match_params():
+    for tag in (None, "payment"):
+        for project in (None, "Trevoc"):
+            for build in (_ocr_ilike_sql, _ocr_trgm_sql):
+                for windowed in (False, True):
+                    for indexed in (False, True):
+                        sql, params = build(["payment plan", "clp"], 24, project, tag, windowed, indexed)
+                        assert re.findall(r"%[%s]", sql).count("%s") == len(params)
+                        assert params[-1] == 24
+                        assert ("lag(text)" in sql) != windowed
+
+
+def test_indexed_statements_use_index_operators():
+    sql, params = _ocr_ilike_sql(["payment plan", "clp"], 24, None, None, indexed=True)
+    assert "tsv @@ websearch_to_tsquery" in sql and '"payment plan" or clp' in params
+    sql, _ = _ocr_trgm_sql(["payment plan"], 24, None, None, indexed=True)
+    assert "%s <%% text" in sql and "similarity(text" not in sql
+
+
+def test_adjacent_hits_share_one_window():
+    # hits on pages 5 and 6 of a.pdf (windows 4-6 and 5-7), one isolated hit on b.pdf
+    rows = [
+        ("a.pdf", 4, "four", None, None, None, None),
+        ("a.pdf", 5, "five", 4, 6, 0.4, 2),
+        ("a.pdf", 6, "six", 5, 7, 0.7, 1),
+        ("a.pdf", 7, "seven", None, None, None, None),
+        ("b.pdf", 2, "two", None, 3, 0.2, 3),
+        ("b.pdf", 3, "three", None, None, None, None),
+    ]
+    docs, metas = assemble(rows)
+    assert docs == ["five\n\nsix\n\nseven", "two\n\nthree"]  # page 5 is inside the better hit's window
+    assert metas[0]["page"] == 6 and metas[0]["score"] == 0.7
+    assert metas[0]["pages"] == [5, 6, 7] and metas[0]["hits"] == [5, 6]
+
+
+def test_shared_neighbour_goes_to_the_better_hit():
+    rows = [
+        ("a.pdf", 1, "one", None, 2, 0.9, 1),
+        ("a.pdf", 2, "two", None, None, None, None),
+        ("a.pdf", 3, "three", 2, 4, 0.8, 2),
+        ("a.pdf", 4, "four", None, None, None, None),
+    ]
+    docs, metas = assemble(rows)
+    assert docs == ["one\n\ntwo", "three\n\nfour"]
+    assert [m["pages"] for m in metas] == [[1, 2], [3, 4]]
+
+
+def test_run_of_adjacent_hits_keeps_windows_bounded():
+    rows = [("a.pdf", p, f"p{p}", p - 1 if p > 1 else None, p + 1 if p < 30 else None, 1.0 - p / 100, p)
+            for p in range(1, 31)]
+    docs, metas = assemble(rows)
+    assert all(len(m["pages"]) <= 3 for m in metas) and len(docs) == 15
+    pages = [p for m in metas for p in m["pages"]]
+    assert sorted(pages) == list(range(1, 31))  # every page shipped exactly once
+
+
+def test_refresh_runs_no_ddl():
+    class Cursor:
+        rowcount = 3
+
+        def __init__(self):
+            self.statements = []
+
+        def execute(self, sql, params=None):
+            self.statements.append(sql)
+
+    cur = Cursor()
+    assert refresh_windows(cur, ["a.pdf"]) == 3
+    assert len(cur.statements) == 1 and "ALTER" not in cur.statements[0].upper()
@@ -0,0 +1,58 @@
+"""In-memory project directory: one-pass alias matching and id resolution."""
+
+import datetime
+
+from main import PROJECT_HINTS
+from retrieval.projects import AhoCorasick, ProjectDirectory
+
+ROWS = [
+    (1, "Trevoc 56", "trevoc-56", "+91 98100 00001", {}, datetime.datetime(2024, 1, 1)),
+    (2, "The Sanctuaries", "the-sanctuaries", None, {"aliases": ["sanctuary"]}, datetime.datetime(2024, 1, 1)),
+    (3, "Estate 360", "estate-360", None, None, datetime.datetime(2024, 1, 1)),
+]
+
+
+def _legacy_detect(question):
+    ql = question.lower()
+    for k, v in PROJECT_HINTS.items():
+        if k in ql:
+            return v
+    return None
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    ac = AhoCorasick()
+    for p in ("he", "she", "his", "hers"):
+        ac.add(p, p)
+    ac.build()
+    found = sorted((s, e, v) for s, e, v in ac.iter("ushers"))
+    assert found == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+
+
+def test_hints_only_match_legacy_detection():
+    directory = ProjectDirectory(PROJECT_HINTS)
+    for q in [
+        "What is the payment plan for Trevoc 56?",
+        "amenities at the sanctuaries",
+        "Tell me about Estate 360 towers",
+        "price of tarc ishva 3 bhk",
+        "anything nearby?",
+    ]:
+        assert directory.match(q) == _legacy_detect(q)
+
+
+def test_directory_rows_add_aliases_and_ids():
+    directory = ProjectDirectory(PROJECT_HINTS)
+    directory.load(ROWS, version=(3, None))
+    assert directory.match("is the sanctuary gated?") == "The Sanctuaries"
+    assert directory.match("sanctuaryx") is None  # whole words only
+    assert directory.resolve_id("Trevoc 56") == 1
+    assert directory.resolve_id("the sanctuaries") == 2
+    assert directory.resolve_id("estate-360") == 3
+    assert directory.resolve_id("Godrej Sora") is None
+    assert directory.by_whatsapp("919810000001").id == 1
+
+
+def test_longest_match_wins():
+    directory = ProjectDirectory(PROJECT_HINTS)
+    assert directory.match("the estate residences floor plan") == "The Estate Residences"
@@ -0,0 +1,82 @@
+"""Schema registry: catalog snapshot, permissive checks before the first load, TTL staleness."""
+
+from utils.schema import SchemaRegistry
+
+GIN = "CREATE INDEX idx_ocr_pages_tsv ON public.ocr_pages USING gin (tsv)"
+ROWS = [
+    ("table", "documents", None, None),
+    ("table", "ocr_pages", None, None),
+    ("column", "ocr_pages", "tsv", None),
+    ("column", "ocr_pages", "prev_page", None),
+    ("extension", "vector", "0.7.0", None),
+    ("index", "idx_ocr_pages_tsv", "ocr_pages", GIN),
+]
+
+
+class Cursor:
+    def __init__(self, rows):
+        self.rows, self.statements = rows, []
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_everything_is_true_before_the_first_load():
+    reg = SchemaRegistry()
+    assert reg.is_stale()
+    assert reg.has_table("anything") and reg.has_column("ocr_pages", "next_page")
+    assert reg.has_extension("pg_trgm") and reg.has_index("idx_missing")
+    assert reg.index_on("documents", "embedding") is None
+
+
+def test_apply_answers_from_the_snapshot():
+    reg = SchemaRegistry()
+    reg._apply(ROWS)
+    assert reg.has_table("documents") and not reg.has_table("facts")
+    assert reg.has_column("ocr_pages", "prev_page") and not reg.has_column("ocr_pages", "next_page")
+    assert not reg.has_column("facts", "embedding")
+    assert reg.has_extension("vector") and not reg.has_extension("pg_trgm")
+    assert reg.has_index("idx_ocr_pages_tsv") and reg.index_method("ocr_pages", "tsv") == "gin"
+    assert reg.snapshot()["extensions"] == {"vector": "0.7.0"}
+
+
+def test_reload_replaces_the_snapshot():
+    reg = SchemaRegistry()
+    reg._apply(ROWS)
+    reg._apply([("table", "facts", None, None)])
+    assert reg.has_table("facts") and not reg.has_table("documents") and not reg.has_extension("vector")
+
+
+def test_load_through_a_script_cursor():
+    reg, cur = SchemaRegistry(), Cursor(ROWS)
+    reg.load(cur)
+    assert len(cur.statements) == 1 and reg.has_table("ocr_pages") and not reg.has_table("facts")
+
+
+def test_ttl_staleness_and_ensure_fresh(monkeypatch):
+    reg = SchemaRegistry(ttl=60)
+    reg._apply(ROWS)
+    refreshed = []
+    monkeypatch.setattr(reg, "refresh", lambda: refreshed.append(1))
+    reg.ensure_fresh()
+    assert not reg.is_stale() and refreshed == []
+    reg.loaded_at -= 61
+    assert reg.is_stale()
+    reg.ensure_fresh()
+    assert refreshed == [1]
+
+
+def test_failed_refresh_keeps_the_old_snapshot(monkeypatch):
+    reg = SchemaRegistry(ttl=60)
+    reg._apply(ROWS)
+    reg.loaded_at -= 61
+
+    def fail():
+        raise OSError("database unavailable")
+
+    monkeypatch.setattr(reg, "refresh", fail)
+    reg.ensure_fresh()
+    assert reg.has_table("documents") and not reg.has_table("facts")
@@ -0,0 +1,41 @@
+"""Gated facts + documents vector statement construction and row decoding."""
+
+import numpy as np
+
+from main import FACTS_SCORE_THRESHOLD, _vectors_rows, _vectors_sql
+
+QVEC = [0.1] * 4
+
+
+def test_placeholders_match_params_and_gate_is_bound():
+    for project_id in (None, 7):
+        sql, params = _vectors_sql(QVEC, 8, 24, project_id)
+        assert sql.count("%s") == len(params)
+        qvec, *rest = params  # sent once, through the `q` CTE
+        assert qvec.dtype == np.float32 and qvec.shape == (len(QVEC),)
+        assert "NOT EXISTS (SELECT 1 FROM f WHERE f.score >= %s)" in sql
+        assert rest[-2:] == [FACTS_SCORE_THRESHOLD, 24]  # gate threshold, then k_docs
+        assert rest.count(project_id) == (2 if project_id is not None else 0)  # facts and documents branches
+        assert 8 in rest
+
+
+def test_with_embeddings_adds_a_column_to_both_branches():
+    plain, _ = _vectors_sql(QVEC, 8, 24, None)
+    sql, params = _vectors_sql(QVEC, 8, 24, 7, with_embeddings=True)
+    assert sql.count("%s") == len(params)
+    assert "score, NULL::vector FROM f" in sql and "score, embedding FROM d" in sql
+    assert "NULL::vector" not in plain and "score, embedding" not in plain
+
+
+def test_rows_decode_with_and_without_embeddings():
+    rows = [
+        ("facts", "10/80/10", None, "p.12", "payment_plan", None, 0.91),
+        ("docs", "CLP table", 12, None, "pricing", "a.pdf", 0.81),
+    ]
+    facts, docs = _vectors_rows(rows)
+    assert facts == [("10/80/10", {"page": "p.12", "key": "payment_plan", "score": 0.91})]
+    assert docs[0][0] == "CLP table" and len(docs[0]) == 2
+
+    vec = np.asarray([0.5, 0.5], dtype=np.float32)
+    _, docs = _vectors_rows([(*rows[0], None), (*rows[1], vec)], with_embeddings=True)
+    assert np.allclose(docs[0][2], vec)
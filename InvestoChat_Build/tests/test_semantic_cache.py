@@ -0,0 +1,49 @@
+"""Semantic retrieval cache: similarity hits, partitions, TTL and byte bounds."""
+
+import numpy as np
+
+from retrieval.semantic_cache import SemanticCache
+
+RESULT = {"mode": "docs", "answers": ["chunk"], "metas": [{"page": 3}]}
+
+
+def _vec(seed, dim=64):
+    return np.random.default_rng(seed).normal(size=dim).astype(np.float32)
+
+
+def test_paraphrase_hits_and_unrelated_misses():
+    cache = SemanticCache(threshold=0.95)
+    base = _vec(1)
+    cache.put(("trevoc", 3), base, RESULT)
+    near = base + 0.05 * _vec(2)
+    assert cache.get(("trevoc", 3), near) is RESULT
+    assert cache.get(("trevoc", 3), _vec(3)) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_partitions_never_share_results():
+    cache = SemanticCache(threshold=0.95)
+    v = _vec(1)
+    cache.put(("trevoc", 3), v, RESULT)
+    assert cache.get(("estate 360", 3), v) is None
+    assert cache.get(("trevoc", 5), v) is None
+
+
+def test_ttl_expiry():
+    cache = SemanticCache(ttl=-1)
+    cache.put("p", _vec(1), RESULT)
+    assert cache.get("p", _vec(1)) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction_respects_byte_bound():
+    one = SemanticCache()
+    one.put("p", _vec(0), RESULT)
+    per_entry = one.stats()["bytes"]
+    cache = SemanticCache(max_bytes=per_entry * 2)
+    for i in range(3):
+        cache.put("p", _vec(i), RESULT)
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] <= per_entry * 2
+    assert cache.get("p", _vec(0)) is None  # oldest evicted
+    assert cache.get("p", _vec(2)) is RESULT
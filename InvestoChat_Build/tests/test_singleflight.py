@@ -0,0 +1,65 @@
+"""Request coalescing: one leader per key, followers share its result or error."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+
+def test_threads_share_one_call():
+    flight, calls, gate = SingleFlight("t"), [], threading.Event()
+
+    def work():
+        calls.append(1)
+        gate.wait(2)
+        return {"answer": 42}
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(flight.do, "k", work) for _ in range(8)]
+        time.sleep(0.1)
+        gate.set()
+        results = [f.result() for f in futures]
+    assert len(calls) == 1 and all(r is results[0] for r in results)
+    assert flight.stats()["coalesced"] == 7 and flight.stats()["in_flight"] == 0
+    assert flight.do("k", lambda: "fresh") == "fresh"  # nothing is cached after the call
+
+
+def test_followers_see_leader_error():
+    flight, gate = SingleFlight("t"), threading.Event()
+
+    def fail():
+        gate.wait(2)
+        raise RuntimeError("embedding API down")
+
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(flight.do, "k", fail) for _ in range(3)]
+        time.sleep(0.1)
+        gate.set()
+        for f in futures:
+            with pytest.raises(RuntimeError):
+                f.result()
+
+
+def test_async_coalesces_and_survives_leader_cancel():
+    flight, calls = SingleFlight("a"), []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "reply"
+
+    async def run():
+        leader = asyncio.ensure_future(flight.ado("k", work))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(flight.ado("k", work)) for _ in range(4)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await asyncio.gather(*followers)
+
+    results = asyncio.run(run())
+    assert results == ["reply"] * 4 and len(calls) == 1
+    assert flight.stats()["coalesced"] == 4
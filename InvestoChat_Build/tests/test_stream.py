@@ -0,0 +1,43 @@
+"""Streaming answers: event order, token assembly and the shared answer cache."""
+
+import asyncio
+
+import main
+from utils.answer_cache import AnswerCache
+
+RETRIEVAL = {"mode": "docs", "answers": ["Payment plan: 10% on booking"], "metas": [{"source": "Trevoc_56.pdf", "page": 3}]}
+
+
+def _collect(q, retrieval):
+    async def run():
+        return [event async for event in main.astream_answer(q, retrieval)]
+    return asyncio.run(run())
+
+
+def test_sources_then_tokens_then_done(monkeypatch):
+    async def fake_stream(prompt, model=None):
+        for delta in ("10% ", "on ", "booking"):
+            yield delta
+
+    monkeypatch.setattr(main, "OPENAI_API_KEY", "test")
+    monkeypatch.setattr(main, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(main, "answer_cache", AnswerCache(path=""))
+    monkeypatch.setattr(main, "_achat_stream", fake_stream)
+
+    events = _collect("Trevoc payment plan?", RETRIEVAL)
+    assert [e for e, _ in events] == ["sources", "token", "token", "token", "done"]
+    assert events[0][1]["sources"] == RETRIEVAL["metas"]
+    assert events[-1][1]["answer"] == "10% on booking" and events[-1][1]["answer_cache"] == "miss"
+
+    # Same question + context again: one token from the cache, no chat call
+    monkeypatch.setattr(main, "_achat_stream", None)
+    events = _collect("trevoc payment plan?", RETRIEVAL)
+    assert events[1] == ("token", "10% on booking") and events[-1][1]["answer_cache"] == "hit"
+
+
+def test_empty_context_needs_no_chat(monkeypatch):
+    monkeypatch.setattr(main, "_achat_stream", None)
+    events = _collect("anything", {"mode": "empty", "answers": [], "metas": []})
+    assert events == [("sources", {"mode": "empty", "sources": []}),
+                      ("token", "Not in the documents."),
+                      ("done", {"answer": "Not in the documents.", "mode": "empty", "sources": []})]
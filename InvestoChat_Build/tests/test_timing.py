@@ -0,0 +1,80 @@
+"""Per-request stage timings: spans add up, notes stick, work outside a collector is untouched."""
+
+import asyncio
+import time
+
+import main
+from utils.answer_cache import AnswerCache
+from utils.singleflight import SingleFlight
+from utils.timing import collect, current, note, span
+
+
+def test_spans_accumulate_and_notes_merge():
+    with collect() as t:
+        with span("sql"):
+            time.sleep(0.01)
+        with span("sql"):
+            time.sleep(0.01)
+        note(query_cache="miss", candidates=24)
+    out = t.as_dict()
+    assert out["stages_ms"]["sql"] >= 20 and out["total_ms"] >= out["stages_ms"]["sql"]
+    assert (out["query_cache"], out["candidates"]) == ("miss", 24)
+    assert current() is None
+
+
+def test_noop_outside_collector():
+    with span("sql"):
+        note(candidates=3)
+    assert current() is None
+
+
+def test_follows_tasks_and_threads():
+    async def run():
+        with collect() as t:
+            async def stage():
+                with span("embed"):
+                    await asyncio.sleep(0.01)
+            await asyncio.gather(asyncio.ensure_future(stage()), asyncio.to_thread(note, semantic_cache="hit"))
+        return t.as_dict()
+
+    out = asyncio.run(run())
+    assert "embed" in out["stages_ms"] and out["semantic_cache"] == "hit"
+
+
+def test_coalesced_follower_is_noted():
+    flight = SingleFlight("retrieve")
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    async def ask():
+        with collect() as t:
+            await flight.ado("k", work)
+        return t.as_dict()
+
+    async def run():
+        return await asyncio.gather(ask(), ask())
+
+    leader, follower = asyncio.run(run())
+    assert "retrieve_coalesced" not in leader and follower["retrieve_coalesced"] is True
+
+
+def test_rag_reports_stages(monkeypatch):
+    monkeypatch.setattr(main, "OPENAI_API_KEY", "test")
+    monkeypatch.setattr(main, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(main, "answer_cache", AnswerCache(path=""))
+    monkeypatch.setattr(main, "_chat", lambda prompt, model: "10% on booking")
+
+    def fake_retrieve(q, **kwargs):
+        note(query_cache="miss")
+        return {"mode": "docs", "answers": ["Payment plan: 10% on booking."],
+                "metas": [{"source": "trevoc.pdf", "page": 4}]}
+
+    monkeypatch.setattr(main, "retrieve", fake_retrieve)
+    result = main.rag("Trevoc payment plan?")
+    timings = result["timings"]
+    assert result["answer"] == "10% on booking"
+    assert {"pack", "chat"} <= set(timings["stages_ms"])
+    assert timings["query_cache"] == "miss" and timings["answer_cache"] == "miss"
+    assert timings["prompt_tokens"] == result["prompt_tokens"]
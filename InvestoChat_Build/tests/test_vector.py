@@ -0,0 +1,38 @@
+"""pgvector binary adapter (no database needed)."""
+
+import numpy as np
+import psycopg
+
+from utils.vector import (
+    VectorBinaryDumper,
+    VectorBinaryLoader,
+    VectorTextLoader,
+    from_pgvector_binary,
+    to_pgvector_binary,
+    to_vector,
+)
+
+
+def test_binary_roundtrip_is_exact_for_float32():
+    vec = np.random.default_rng(0).standard_normal(1536).astype(np.float32)
+    data = to_pgvector_binary(vec)
+    assert len(data) == 4 + 4 * 1536
+    assert np.array_equal(from_pgvector_binary(data), vec)
+
+
+def test_dumper_and_loaders():
+    dumper = VectorBinaryDumper(np.ndarray)
+    data = dumper.dump(to_vector([0.5, -1.0, 2.0]))
+    assert VectorBinaryLoader(0).load(memoryview(data)).tolist() == [0.5, -1.0, 2.0]
+    assert VectorTextLoader(0).load(b"[0.5,-1,2]").tolist() == [0.5, -1.0, 2.0]
+
+
+def test_to_vector_passes_null_through():
+    assert to_vector(None) is None
+    assert to_vector([1, 2]).dtype == np.float32
+
+
+def test_dumper_registers_on_adapters_map():
+    adapters = psycopg.adapt.AdaptersMap(psycopg.adapters)
+    adapters.register_dumper(np.ndarray, VectorBinaryDumper)
+    assert adapters.get_dumper(np.ndarray, psycopg.adapt.PyFormat.AUTO) is VectorBinaryDumper
@@ -0,0 +1,76 @@
+"""Recall target -> hnsw.ef_search / ivfflat.probes selection."""
+
+import pytest
+
+import retrieval.vector_index as vi
+from utils.schema import SchemaRegistry
+
+HNSW = "CREATE INDEX idx_documents_embedding ON public.documents USING hnsw (embedding vector_cosine_ops) WITH (m='16', ef_construction='64')"
+IVF = "CREATE INDEX idx_facts_embedding ON public.facts USING ivfflat (embedding vector_cosine_ops) WITH (lists='50')"
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    reg = SchemaRegistry()
+    reg._apply([
+        ("table", "documents", None, None),
+        ("table", "facts", None, None),
+        ("index", "idx_documents_embedding", "documents", HNSW),
+        ("index", "idx_facts_embedding", "facts", IVF),
+    ])
+    monkeypatch.setattr(vi, "schema_registry", reg)
+    monkeypatch.setattr(vi, "_calibration", {})
+    monkeypatch.setattr(vi, "VECTOR_RECALL_TARGET", None)
+    return reg
+
+
+def test_registry_parses_index_options(registry):
+    assert registry.index_on("facts", "embedding")["options"] == {"lists": "50"}
+    assert registry.index_method("documents", "embedding") == "hnsw"
+
+
+def test_ef_search_never_below_limit(registry):
+    assert vi.search_settings(("documents",), 12) == []
+    assert vi.search_settings(("documents",), 96) == [("hnsw.ef_search", "96")]
+
+
+def test_recall_target_uses_defaults_then_calibration(registry, monkeypatch):
+    assert dict(vi.search_settings(("documents", "facts"), 12, 0.95)) == {"hnsw.ef_search": "80", "ivfflat.probes": "5"}
+    monkeypatch.setattr(vi, "_calibration", {
+        "documents": {"method": "hnsw", "points": [[20, 0.91, 1.0], [40, 0.96, 1.4], [80, 0.99, 2.1]]},
+    })
+    # 40 reaches 0.95 in the sweep and is already the server default: nothing to set
+    assert vi.search_settings(("documents",), 12, 0.95) == []
+    assert vi.search_settings(("documents",), 12, 0.98) == [("hnsw.ef_search", "80")]
+
+
+def test_ivfflat_lists_sizing():
+    assert vi.ivfflat_lists_for(500) == 1
+    assert vi.ivfflat_lists_for(250_000) == 250
+    assert vi.ivfflat_lists_for(4_000_000) == 2000
+
+
+def test_compact_mode_reranks_candidates(registry, monkeypatch):
+    registry._apply([
+        ("table", "documents", None, None),
+        ("index", "idx_documents_embedding", "documents", HNSW),
+        ("index", "idx_documents_embedding_halfvec", "documents",
+         "CREATE INDEX idx_documents_embedding_halfvec ON public.documents USING hnsw "
+         "(((embedding)::halfvec(1536)) halfvec_cosine_ops) WITH (m='16', ef_construction='64')"),
+    ])
+    assert set(vi.vector_indexes("documents")) == {"full", "halfvec"}
+    full = vi.nearest_sql("documents", "id", "", "(SELECT v FROM q)", 12)
+    assert full.endswith("ORDER BY embedding <=> (SELECT v FROM q) LIMIT %s")
+
+    monkeypatch.setattr(vi, "VECTOR_STORAGE", "halfvec")
+    monkeypatch.setattr(vi, "VECTOR_RERANK_FACTOR", 4)
+    sql = vi.nearest_sql("documents", "id", "project_id = %s", "(SELECT v FROM q)", 12)
+    assert "ORDER BY (embedding::halfvec(1536)) <=> ((SELECT v FROM q)::halfvec(1536)) LIMIT 48" in sql
+    assert sql.endswith(") c ORDER BY embedding <=> (SELECT v FROM q) LIMIT %s")
+    assert sql.count("%s") == full.count("%s") + 1  # only the WHERE placeholder is added
+    assert vi.search_settings(("documents",), 12) == [("hnsw.ef_search", "48")]
+
+
+def test_compact_mode_falls_back_without_index(registry, monkeypatch):
+    monkeypatch.setattr(vi, "VECTOR_STORAGE", "bit")
+    assert vi.storage_mode("documents").name == "full"
@@ -1,58 +1,35 @@
 """AI/ML utilities for embeddings and chat"""
 
 import os
-from typing import List
-from functools import lru_cache
-from openai import OpenAI
+import asyncio
+from typing import AsyncIterator, List
+
+from utils.embed_store import embedding_store
+from utils.openai_client import get_client, get_async_client, OPENAI_EMBED_TIMEOUT, OPENAI_CHAT_TIMEOUT
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
 CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4.1-mini")
 
 
-@lru_cache(maxsize=1000)
-def _embed_single_cached(text: str) -> tuple:
-    """
-    Cache embeddings for individual text strings.
-    Returns tuple (can be cached) instead of list.
-    """
-    client = OpenAI(
-        api_key=OPENAI_API_KEY,
-        base_url=OPENAI_BASE_URL
-    )
-
-    resp = client.embeddings.create(
+def _fetch_embeddings(texts: List[str]) -> List[List[float]]:
+    resp = get_client().embeddings.create(
         model=EMBEDDING_MODEL,
-        input=[text]
+        input=texts,
+        timeout=OPENAI_EMBED_TIMEOUT
     )
 
-    # Return as tuple (hashable for cache)
-    return tuple(resp.data[0].embedding)
+    return [d.embedding for d in resp.data]
 
 
 def _embed(texts: List[str]) -> List[List[float]]:
-    """Generate embeddings for texts using OpenAI (with caching for single queries)"""
+    """
+    Generate embeddings for texts using OpenAI. Texts already in the
+    persistent embedding store (any worker, any earlier run) are not re-sent.
+    """
     if not texts:
         return []
 
-    # Use cache for single queries (most common case in RAG)
-    if len(texts) == 1:
-        cached_result = _embed_single_cached(texts[0])
-        return [list(cached_result)]
-
-    # Batch queries go directly to API (less common)
-    client = OpenAI(
-        api_key=OPENAI_API_KEY,
-        base_url=OPENAI_BASE_URL
-    )
-
-    resp = client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=texts
-    )
-
-    return [d.embedding for d in resp.data]
+    return embedding_store.embed(EMBEDDING_MODEL, texts, _fetch_embeddings)
 
 
 def _chat(prompt: str, model: str = None) -> str:
@@ -60,20 +37,62 @@ def _chat(prompt: str, model: str = None) -> str:
     if model is None:
         model = CHAT_MODEL
 
-    client = OpenAI(
-        api_key=OPENAI_API_KEY,
-        base_url=OPENAI_BASE_URL
+    resp = get_client().chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.0,
+        timeout=OPENAI_CHAT_TIMEOUT
     )
 
-    resp = client.chat.completions.create(
+    return resp.choices[0].message.content
+
+
+async def _aembed(texts: List[str]) -> List[List[float]]:
+    """Async variant of _embed (same persistent embedding store, read and written off the event loop)"""
+    if not texts:
+        return []
+
+    vectors, todo = await asyncio.to_thread(embedding_store.missing, EMBEDDING_MODEL, texts)
+    fetched = []
+    if todo:
+        resp = await get_async_client().embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=todo,
+            timeout=OPENAI_EMBED_TIMEOUT
+        )
+        fetched = [d.embedding for d in resp.data]
+    return await asyncio.to_thread(embedding_store.fill, EMBEDDING_MODEL, texts, vectors, todo, fetched)
+
+
+async def _achat(prompt: str, model: str = None) -> str:
+    """Async variant of _chat"""
+    if model is None:
+        model = CHAT_MODEL
+
+    resp = await get_async_client().chat.completions.create(
         model=model,
         messages=[{"role": "user", "content": prompt}],
-        temperature=0.0
+        temperature=0.0,
+        timeout=OPENAI_CHAT_TIMEOUT
     )
 
     return resp.choices[0].message.content
 
 
-def _to_pgvector(vec: List[float]) -> str:
-    """Convert embedding list to pgvector format string"""
-    return "[" + ",".join(f"{x:.8f}" for x in vec) + "]"
+async def _achat_stream(prompt: str, model: str = None) -> AsyncIterator[str]:
+    """Streaming variant of _achat: yields content deltas as they arrive"""
+    if model is None:
+        model = CHAT_MODEL
+
+    stream = await get_async_client().chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.0,
+        timeout=OPENAI_CHAT_TIMEOUT,
+        stream=True
+    )
+
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            yield delta
@@ -0,0 +1,213 @@
+"""
+Cache of chat-completion answers.
+
+An answer is reused when the same (case/whitespace-normalized) question is
+asked of the same model over the same retrieved context. The key hashes the
+question, model, whitespace-normalized context chunks and their (source,
+page) ids, so a retrieval that returns different or re-worded chunks never
+hits an old answer.
+
+Entries sit in an in-process LRU with a TTL, optionally backed by a SQLite
+file (ANSWER_CACHE_PATH, "" for memory only) so answers survive restarts and
+are shared by uvicorn workers. Re-ingesting a source records an
+invalidation in the same file; any entry built from that source before the
+invalidation is treated as a miss, in this process or any other. Async
+callers use aget()/aput(), which run the SQLite work in a worker thread so
+a locked or slow file never blocks the event loop.
+"""
+
+import os
+import asyncio
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from cachetools import TTLCache
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "1") == "1"
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_PATH = os.getenv(
+    "ANSWER_CACHE_PATH",
+    str(Path(__file__).resolve().parent.parent / "workspace" / "answers.sqlite"),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key        TEXT PRIMARY KEY,
+    answer     TEXT NOT NULL,
+    sources    TEXT NOT NULL,
+    latency_ms REAL NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS invalidations (
+    source TEXT PRIMARY KEY,
+    at     REAL NOT NULL
+);
+"""
+
+# (answer, sources, chat latency it saves, created_at)
+Entry = Tuple[str, Tuple[str, ...], float, float]
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def answer_key(question: str, model: str, chunks: Sequence[str], source_ids: Sequence[tuple]) -> str:
+    """sha256 over the normalized question, model and a fingerprint of the context."""
+    h = hashlib.sha256()
+    for part in (_normalize(question).casefold(), model, *map(_normalize, chunks), json.dumps(list(source_ids), default=str)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def context_ids(metas: Sequence[dict]) -> Tuple[List[tuple], List[str]]:
+    """(source, page) ids of the retrieved chunks, and the distinct sources to invalidate on."""
+    ids = [(m.get("source"), m.get("page")) for m in metas]
+    return ids, sorted({str(s) for s, _ in ids if s})
+
+
+class AnswerCache:
+    def __init__(self, path: str = ANSWER_CACHE_PATH, ttl: float = ANSWER_CACHE_TTL,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.path = path or None
+        self.ttl = ttl
+        self._memory: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl)
+        self._invalidated: dict = {}  # source -> time, for this process
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.saved_ms = 0.0
+
+    def _conn(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.executescript(_SCHEMA)
+            self._local.con = con
+        return con
+
+    def _invalidated_after(self, sources: Sequence[str], created_at: float) -> bool:
+        if any(self._invalidated.get(s, 0.0) >= created_at for s in sources):
+            return True
+        if not (self.path and sources):
+            return False
+        try:
+            row = self._conn().execute(
+                f"SELECT max(at) FROM invalidations WHERE source IN ({','.join('?' * len(sources))})",
+                list(sources),
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"[warn] answer cache read failed: {e}")
+            return False
+        return row[0] is not None and row[0] >= created_at
+
+    def _load(self, key: str) -> Optional[Entry]:
+        if not self.path:
+            return None
+        try:
+            row = self._conn().execute(
+                "SELECT answer, sources, latency_ms, created_at FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"[warn] answer cache read failed: {e}")
+            return None
+        if row is None or time.time() - row[3] > self.ttl:
+            return None
+        return row[0], tuple(json.loads(row[1])), row[2], row[3]
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached answer for key, or None (expired, invalidated or never stored)."""
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is None:
+            entry = self._load(key)
+        if entry is not None and self._invalidated_after(entry[1], entry[3]):
+            entry = None
+            with self._lock:
+                self._memory.pop(key, None)
+                self.stale += 1
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self._memory[key] = entry
+            self.hits += 1
+            self.saved_ms += entry[2]
+        return entry[0]
+
+    def put(self, key: str, answer: str, sources: Iterable[str], latency_ms: float) -> None:
+        entry: Entry = (answer, tuple(sorted(set(sources))), float(latency_ms), time.time())
+        with self._lock:
+            self._memory[key] = entry
+        if not self.path:
+            return
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)",
+                (key, entry[0], json.dumps(entry[1]), entry[2], entry[3]),
+            )
+        except sqlite3.Error as e:
+            print(f"[warn] answer cache write failed: {e}")
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get() from the event loop."""
+        if not self.path:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, answer: str, sources: Iterable[str], latency_ms: float) -> None:
+        """put() from the event loop."""
+        if not self.path:
+            return self.put(key, answer, sources, latency_ms)
+        await asyncio.to_thread(self.put, key, answer, sources, latency_ms)
+
+    def invalidate_sources(self, sources: Iterable[str]) -> int:
+        """Drop answers built from any of `sources` (call after re-ingesting them). Returns entries dropped here."""
+        sources = {s for s in sources if s}
+        if not sources:
+            return 0
+        now = time.time()
+        with self._lock:
+            self._invalidated.update((s, now) for s in sources)
+            keys = [k for k, entry in self._memory.items() if sources & set(entry[1])]
+            for k in keys:
+                self._memory.pop(k, None)
+        if self.path:
+            try:
+                con = self._conn()
+                con.execute("BEGIN")
+                con.executemany("INSERT OR REPLACE INTO invalidations VALUES (?, ?)", [(s, now) for s in sources])
+                con.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl,))  # expired anyway
+                con.execute("COMMIT")
+            except sqlite3.Error as e:
+                print(f"[warn] answer cache invalidation failed: {e}")
+        return len(keys)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": ANSWER_CACHE_ENABLED,
+            "path": self.path,
+            "memory_entries": len(self._memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "saved_ms": round(self.saved_ms, 1),
+        }
+
+
+answer_cache = AnswerCache()
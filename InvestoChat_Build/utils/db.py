@@ -1,28 +1,154 @@
 """Database utilities"""
 
 import os
+import asyncio
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator, Optional
+
 import psycopg
-from typing import Optional
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
+
+from utils.vector import aregister_vector, register_vector
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Pool sizing/lifetime knobs (seconds for time values)
+PG_POOL_MIN_SIZE = int(os.getenv("PG_POOL_MIN_SIZE", "2"))
+PG_POOL_MAX_SIZE = int(os.getenv("PG_POOL_MAX_SIZE", "10"))
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "10"))
+PG_POOL_MAX_LIFETIME = float(os.getenv("PG_POOL_MAX_LIFETIME", "1800"))
+PG_POOL_MAX_IDLE = float(os.getenv("PG_POOL_MAX_IDLE", "300"))
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+_apool: Optional[AsyncConnectionPool] = None
+_apool_lock: Optional[asyncio.Lock] = None
 
-def _pg() -> psycopg.Connection:
-    """Get PostgreSQL connection"""
-    if not DATABASE_URL:
+# Connection currently borrowed by this thread/task, so nested _pg() calls
+# (e.g. project lookup -> vector search -> OCR fallback) share one connection.
+_current_con: ContextVar[Optional[psycopg.Connection]] = ContextVar("_current_con", default=None)
+_current_acon: ContextVar[Optional[psycopg.AsyncConnection]] = ContextVar("_current_acon", default=None)
+
+
+def _database_url() -> str:
+    url = os.getenv("DATABASE_URL") or DATABASE_URL
+    if not url:
         raise RuntimeError("DATABASE_URL not set")
-    return psycopg.connect(DATABASE_URL)
-
-
-def _table_exists(cur, name: str) -> bool:
-    """Check if a table exists in the database"""
-    cur.execute("""
-        SELECT EXISTS (
-            SELECT FROM information_schema.tables
-            WHERE table_name = %s
-        )
-    """, (name,))
-    return cur.fetchone()[0]
+    return url
+
+
+def _pool_kwargs() -> dict:
+    return dict(
+        min_size=PG_POOL_MIN_SIZE,
+        max_size=max(PG_POOL_MIN_SIZE, PG_POOL_MAX_SIZE),
+        timeout=PG_POOL_TIMEOUT,
+        max_lifetime=PG_POOL_MAX_LIFETIME,
+        max_idle=PG_POOL_MAX_IDLE,
+        # Retrieval is read-only; autocommit keeps a failed query from
+        # poisoning the borrowed connection for the next one.
+        kwargs={"autocommit": True},
+    )
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    _database_url(),
+                    check=ConnectionPool.check_connection,
+                    name="investochat",
+                    configure=register_vector,
+                    open=True,
+                    **_pool_kwargs(),
+                )
+    return _pool
+
+
+async def get_async_pool() -> AsyncConnectionPool:
+    """Return the process-wide async pool (opened inside the running event loop)."""
+    global _apool, _apool_lock
+    if _apool is None:
+        if _apool_lock is None:
+            _apool_lock = asyncio.Lock()
+        async with _apool_lock:
+            if _apool is None:
+                pool = AsyncConnectionPool(
+                    _database_url(),
+                    check=AsyncConnectionPool.check_connection,
+                    name="investochat-async",
+                    configure=aregister_vector,
+                    open=False,
+                    **_pool_kwargs(),
+                )
+                await pool.open()
+                _apool = pool
+    return _apool
+
+
+def close_pool() -> None:
+    """Close the process-wide pool (service shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+async def close_async_pool() -> None:
+    """Close the process-wide async pool (service shutdown)."""
+    global _apool
+    if _apool is not None:
+        pool, _apool = _apool, None
+        await pool.close()
+
+
+def pool_stats() -> dict:
+    """Pool counters (size, idle, waiting, connections opened, ...)."""
+    out = {}
+    for label, pool in (("sync", _pool), ("async", _apool)):
+        out[label] = {"open": True, **pool.get_stats()} if pool is not None else {"open": False}
+    return out
+
+
+@contextmanager
+def _pg() -> Iterator[psycopg.Connection]:
+    """
+    Borrow a PostgreSQL connection from the pool.
+
+    Re-entrant: if the caller already holds a connection in this context,
+    the same connection is yielded instead of borrowing a second one.
+    """
+    current = _current_con.get()
+    if current is not None:
+        yield current
+        return
+    with get_pool().connection() as con:
+        token = _current_con.set(con)
+        try:
+            yield con
+        finally:
+            _current_con.reset(token)
+
+
+@asynccontextmanager
+async def _apg() -> AsyncIterator[psycopg.AsyncConnection]:
+    """Async counterpart of _pg(): borrow from the async pool, re-entrant per task."""
+    current = _current_acon.get()
+    if current is not None:
+        yield current
+        return
+    pool = await get_async_pool()
+    async with pool.connection() as con:
+        token = _current_acon.set(con)
+        try:
+            yield con
+        finally:
+            _current_acon.reset(token)
 
 
 def _doc_tuple_to_meta(row) -> dict:
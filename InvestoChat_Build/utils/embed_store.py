@@ -0,0 +1,174 @@
+"""
+Persistent embedding store shared by every worker and script.
+
+Vectors live in a local SQLite file (WAL mode, so concurrent uvicorn workers
+and ingest runs can read while one writes) as packed float32 blobs, keyed by
+sha256(model + whitespace-normalized text). A small in-process LRU sits in
+front so hot queries never touch the file.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from cachetools import LRUCache
+
+EMBED_STORE_PATH = os.getenv(
+    "EMBED_STORE_PATH",
+    str(Path(__file__).resolve().parent.parent / "workspace" / "embeddings.sqlite"),
+)
+EMBED_STORE_MEMORY_SIZE = int(os.getenv("EMBED_STORE_MEMORY_SIZE", "2048"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key        TEXT PRIMARY KEY,
+    model      TEXT NOT NULL,
+    dim        INTEGER NOT NULL,
+    vector     BLOB NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+# SQLite's default host-parameter limit is 999 on older builds
+_BATCH = 500
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def embedding_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{_normalize(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    def __init__(self, path: str = EMBED_STORE_PATH, memory_size: int = EMBED_STORE_MEMORY_SIZE):
+        self.path = path
+        self._memory = LRUCache(maxsize=memory_size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections are not shareable across threads; one per thread
+        con = getattr(self._local, "con", None)
+        if con is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.execute(_SCHEMA)
+            self._local.con = con
+        return con
+
+    # -- batch primitives -----------------------------------------------------
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Vectors for `texts` (None where not stored), memory first, then one disk query per batch."""
+        keys = [embedding_key(model, t) for t in texts]
+        out: List[Optional[np.ndarray]] = [None] * len(keys)
+        pending = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vec = self._memory.get(key)
+                if vec is not None:
+                    out[i] = vec
+                    self.memory_hits += 1
+                else:
+                    pending.setdefault(key, []).append(i)
+        if pending:
+            found = {}
+            try:
+                con = self._conn()
+                wanted = list(pending)
+                for start in range(0, len(wanted), _BATCH):
+                    chunk = wanted[start:start + _BATCH]
+                    rows = con.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                    found.update((k, np.frombuffer(blob, dtype=np.float32)) for k, blob in rows)
+            except sqlite3.Error as e:
+                print(f"[warn] embedding store read failed: {e}")
+            with self._lock:
+                for key, idxs in pending.items():
+                    vec = found.get(key)
+                    if vec is None:
+                        self.misses += len(idxs)
+                        continue
+                    self._memory[key] = vec
+                    self.disk_hits += len(idxs)
+                    for i in idxs:
+                        out[i] = vec
+        return out
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        rows, now = [], time.time()
+        with self._lock:
+            for text, vec in zip(texts, vectors):
+                arr = np.asarray(vec, dtype=np.float32)
+                key = embedding_key(model, text)
+                self._memory[key] = arr
+                rows.append((key, model, int(arr.shape[0]), arr.tobytes(), now))
+        if not rows:
+            return
+        try:
+            con = self._conn()
+            con.execute("BEGIN")
+            con.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            con.execute("COMMIT")
+        except sqlite3.Error as e:
+            print(f"[warn] embedding store write failed: {e}")
+
+    # -- read-through helpers -------------------------------------------------
+    def missing(self, model: str, texts: Sequence[str]) -> Tuple[List[Optional[np.ndarray]], List[str]]:
+        """Stored vectors plus the distinct texts that still need embedding."""
+        vectors = self.get_many(model, texts)
+        todo, seen = [], set()
+        for text, vec in zip(texts, vectors):
+            key = embedding_key(model, text)
+            if vec is None and key not in seen:
+                seen.add(key)
+                todo.append(text)
+        return vectors, todo
+
+    def fill(self, model: str, texts: Sequence[str], vectors: List[Optional[np.ndarray]],
+             fetched_texts: Sequence[str], fetched: Sequence[Sequence[float]]) -> List[List[float]]:
+        """Store freshly fetched vectors and return the complete list in input order."""
+        self.put_many(model, fetched_texts, fetched)
+        by_key = {embedding_key(model, t): v for t, v in zip(fetched_texts, fetched)}
+        return [
+            list(by_key[embedding_key(model, t)]) if v is None else v.tolist()
+            for t, v in zip(texts, vectors)
+        ]
+
+    def embed(self, model: str, texts: Sequence[str], fetch: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """Return embeddings for `texts`, calling `fetch` only for texts not already stored."""
+        vectors, todo = self.missing(model, texts)
+        fetched = fetch(todo) if todo else []
+        return self.fill(model, texts, vectors, todo, fetched)
+
+    def stats(self) -> dict:
+        rows = None
+        try:
+            rows = self._conn().execute("SELECT count(*) FROM embeddings").fetchone()[0]
+        except sqlite3.Error:
+            pass
+        return {
+            "path": self.path,
+            "rows": rows,
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+
+embedding_store = EmbeddingStore()
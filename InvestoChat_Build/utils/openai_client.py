@@ -0,0 +1,183 @@
+"""
+Process-wide OpenAI clients.
+
+Every embedding/chat call in the service and the ingest scripts goes through
+get_client() / get_async_client(), so TLS sessions and keep-alive connections
+are reused instead of being rebuilt per call. Transport knobs (env):
+
+    OPENAI_MAX_CONNECTIONS     total connections per client (20)
+    OPENAI_MAX_KEEPALIVE       idle connections kept open (10)
+    OPENAI_KEEPALIVE_EXPIRY    seconds an idle connection is kept (60)
+    OPENAI_HTTP2               "auto" (when `h2` is installed), "1" or "0"
+    OPENAI_CONNECT_TIMEOUT     connect timeout in seconds (5)
+    OPENAI_EMBED_TIMEOUT       per-call timeout for embeddings (20)
+    OPENAI_CHAT_TIMEOUT        per-call timeout for chat completions (60)
+    OPENAI_MAX_RETRIES         SDK retries on connection errors / 429 / 5xx (2)
+"""
+
+import os
+import time
+import threading
+import importlib.util
+from typing import Optional
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "10"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "auto")
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_EMBED_TIMEOUT = float(os.getenv("OPENAI_EMBED_TIMEOUT", "20"))
+OPENAI_CHAT_TIMEOUT = float(os.getenv("OPENAI_CHAT_TIMEOUT", "60"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+_client: Optional[OpenAI] = None
+_async_client: Optional[AsyncOpenAI] = None
+_lock = threading.Lock()
+
+
+class TransportMetrics:
+    """Request count/latency and new-connection count for one client."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.connections_opened = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def on_connect(self) -> None:
+        with self._lock:
+            self.connections_opened += 1
+
+    def on_response(self, elapsed_ms: float, ok: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.errors += 0 if ok else 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def snapshot(self) -> dict:
+        reused = max(0, self.requests - self.connections_opened)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "connections_opened": self.connections_opened,
+            "connection_reuse_rate": round(reused / self.requests, 4) if self.requests else 0.0,
+            "avg_latency_ms": round(self.total_ms / self.requests, 1) if self.requests else 0.0,
+            "max_latency_ms": round(self.max_ms, 1),
+        }
+
+
+sync_metrics = TransportMetrics()
+async_metrics = TransportMetrics()
+
+
+def _http2_enabled() -> bool:
+    if OPENAI_HTTP2 == "auto":
+        return importlib.util.find_spec("h2") is not None
+    return OPENAI_HTTP2 == "1"
+
+
+def _transport_kwargs() -> dict:
+    import httpx
+
+    return dict(
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(OPENAI_CHAT_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+        http2=_http2_enabled(),
+    )
+
+
+def _client_kwargs() -> dict:
+    # Read at first use so scripts that call load_dotenv() late still work
+    return dict(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=os.getenv("OPENAI_BASE_URL") or None,
+        max_retries=OPENAI_MAX_RETRIES,
+    )
+
+
+def get_client() -> OpenAI:
+    """Shared sync client (thread-safe; httpx.Client pools connections across threads)."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                metrics = sync_metrics
+
+                def _on_request(request):
+                    request.extensions["investochat_start"] = time.perf_counter()
+                    # httpcore trace hook: count connections actually opened
+                    request.extensions["trace"] = lambda name, info: (
+                        metrics.on_connect() if name == "connection.connect_tcp.complete" else None
+                    )
+
+                def _on_response(response):
+                    start = response.request.extensions.get("investochat_start", time.perf_counter())
+                    metrics.on_response((time.perf_counter() - start) * 1000, response.status_code < 400)
+
+                http_client = DefaultHttpxClient(
+                    event_hooks={"request": [_on_request], "response": [_on_response]},
+                    **_transport_kwargs(),
+                )
+                _client = OpenAI(http_client=http_client, **_client_kwargs())
+    return _client
+
+
+def get_async_client() -> AsyncOpenAI:
+    """Shared async client; its connection pool is multiplexed by the event loop."""
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                metrics = async_metrics
+
+                async def _trace(name, info):
+                    if name == "connection.connect_tcp.complete":
+                        metrics.on_connect()
+
+                async def _on_request(request):
+                    request.extensions["investochat_start"] = time.perf_counter()
+                    request.extensions["trace"] = _trace
+
+                async def _on_response(response):
+                    start = response.request.extensions.get("investochat_start", time.perf_counter())
+                    metrics.on_response((time.perf_counter() - start) * 1000, response.status_code < 400)
+
+                http_client = DefaultAsyncHttpxClient(
+                    event_hooks={"request": [_on_request], "response": [_on_response]},
+                    **_transport_kwargs(),
+                )
+                _async_client = AsyncOpenAI(http_client=http_client, **_client_kwargs())
+    return _async_client
+
+
+def close_client() -> None:
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+async def close_async_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        client, _async_client = _async_client, None
+        await client.close()
+
+
+def client_stats() -> dict:
+    return {
+        "http2": _http2_enabled(),
+        "max_connections": OPENAI_MAX_CONNECTIONS,
+        "sync": {"open": _client is not None, **sync_metrics.snapshot()},
+        "async": {"open": _async_client is not None, **async_metrics.snapshot()},
+    }
@@ -0,0 +1,145 @@
+"""Schema capability registry (tables, columns, extensions, indexes)"""
+
+import os
+import re
+import time
+import threading
+from typing import Dict, Optional, Set
+
+from utils.db import _pg, _apg
+
+SCHEMA_CACHE_TTL = float(os.getenv("SCHEMA_CACHE_TTL", "600"))
+
+# One round trip for the whole catalog snapshot of the visible schemas
+_CATALOG_SQL = """
+    SELECT 'table', c.relname, NULL, NULL
+    FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = ANY(current_schemas(false)) AND c.relkind IN ('r', 'p', 'v', 'm')
+    UNION ALL
+    SELECT 'column', table_name, column_name, NULL
+    FROM information_schema.columns
+    WHERE table_schema = ANY(current_schemas(false))
+    UNION ALL
+    SELECT 'extension', extname, extversion, NULL FROM pg_extension
+    UNION ALL
+    SELECT 'index', indexname, tablename, indexdef
+    FROM pg_indexes
+    WHERE schemaname = ANY(current_schemas(false))
+"""
+
+_USING = re.compile(r"\bUSING\s+(\w+)", re.IGNORECASE)
+_WITH = re.compile(r"\bWITH\s*\(([^)]*)\)", re.IGNORECASE)
+_OPTION = re.compile(r"(\w+)\s*=\s*'?([\w.]+)'?")
+
+
+class SchemaRegistry:
+    """
+    In-memory view of what the database supports, loaded once and refreshed
+    on a TTL (or explicitly), so request paths never probe the catalog.
+
+    Until the first successful load every check answers True and the real
+    query decides, which matches the behaviour without a registry.
+    """
+
+    def __init__(self, ttl: float = SCHEMA_CACHE_TTL):
+        self.ttl = ttl
+        self.loaded_at: Optional[float] = None
+        self.tables: Set[str] = set()
+        self.columns: Dict[str, Set[str]] = {}
+        self.extensions: Dict[str, str] = {}
+        self.indexes: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    # -- loading -------------------------------------------------------------
+    def _apply(self, rows) -> None:
+        tables, columns, extensions, indexes = set(), {}, {}, {}
+        for kind, name, extra, definition in rows:
+            if kind == "table":
+                tables.add(name)
+            elif kind == "column":
+                columns.setdefault(name, set()).add(extra)
+            elif kind == "extension":
+                extensions[name] = extra
+            elif kind == "index":
+                m = _USING.search(definition or "")
+                w = _WITH.search(definition or "")
+                indexes[name] = {
+                    "table": extra,
+                    "method": m.group(1).lower() if m else None,
+                    "options": dict(_OPTION.findall(w.group(1))) if w else {},
+                    "definition": definition,
+                }
+        with self._lock:
+            self.tables, self.columns = tables, columns
+            self.extensions, self.indexes = extensions, indexes
+            self.loaded_at = time.time()
+
+    def load(self, cur) -> None:
+        """Load the snapshot through `cur` (scripts with their own connection)."""
+        cur.execute(_CATALOG_SQL)
+        self._apply(cur.fetchall())
+
+    def refresh(self) -> None:
+        with _pg() as con, con.cursor() as cur:
+            self.load(cur)
+
+    async def arefresh(self) -> None:
+        async with _apg() as con, con.cursor() as cur:
+            await cur.execute(_CATALOG_SQL)
+            rows = await cur.fetchall()
+        self._apply(rows)
+
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.time() - self.loaded_at > self.ttl
+
+    def ensure_fresh(self) -> None:
+        if not self.is_stale():
+            return
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"[warn] schema registry refresh failed: {e}")
+
+    async def aensure_fresh(self) -> None:
+        if not self.is_stale():
+            return
+        try:
+            await self.arefresh()
+        except Exception as e:
+            print(f"[warn] schema registry refresh failed: {e}")
+
+    # -- lookups -------------------------------------------------------------
+    def has_table(self, name: str) -> bool:
+        return self.loaded_at is None or name in self.tables
+
+    def has_column(self, table: str, column: str) -> bool:
+        return self.loaded_at is None or column in self.columns.get(table, ())
+
+    def has_extension(self, name: str) -> bool:
+        return self.loaded_at is None or name in self.extensions
+
+    def has_index(self, name: str) -> bool:
+        return self.loaded_at is None or name in self.indexes
+
+    def index_on(self, table: str, column: str) -> Optional[dict]:
+        """Catalog info (name, method, options, definition) of an index on table(column...)."""
+        for name, info in self.indexes.items():
+            if info["table"] == table and re.search(rf"\(\s*\(?\s*{re.escape(column)}\b", info["definition"] or ""):
+                return {"name": name, **info}
+        return None
+
+    def index_method(self, table: str, column: str) -> Optional[str]:
+        """Access method (hnsw, ivfflat, gin, btree, ...) of an index on table(column...)."""
+        info = self.index_on(table, column)
+        return info["method"] if info else None
+
+    def snapshot(self) -> dict:
+        return {
+            "loaded_at": self.loaded_at,
+            "tables": sorted(self.tables),
+            "extensions": dict(self.extensions),
+            "indexes": {name: {k: v for k, v in info.items() if k != "definition"} for name, info in self.indexes.items()},
+        }
+
+
+schema_registry = SchemaRegistry()
@@ -0,0 +1,91 @@
+"""
+Request coalescing ("single flight").
+
+When many identical requests arrive together (a brochure link forwarded to a
+WhatsApp group), only the first one (the leader) runs the work; the others
+(followers) wait for the leader's result instead of each paying for their
+own embedding, SQL and chat completion. Followers see the leader's exception
+if it fails. Nothing is kept once the call finishes; caching is the caller's
+job.
+
+The sync path (do) coalesces across threads; the async path (ado) runs the
+leader's coroutine as a task, so a cancelled request does not cancel the
+work its followers are waiting on. A follower notes `<name>_coalesced` in
+its request timings (utils.timing); the stage timings stay with the leader.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from utils.timing import note
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, Future] = {}
+        self._tasks: Dict[Hashable, Tuple[asyncio.AbstractEventLoop, asyncio.Task]] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run fn() unless an identical call is already in flight, in which case wait for its result."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            note(**{f"{self.name}_coalesced": True})
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant of do(); coalesces callers on the same event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._tasks.get(key)
+            follower = entry is not None and entry[0] is loop and not entry[1].done()
+            if follower:
+                task = entry[1]
+                self.coalesced += 1
+            else:
+                task = loop.create_task(fn())
+                self._tasks[key] = (loop, task)
+                self.leaders += 1
+                task.add_done_callback(lambda t, key=key: self._forget(key, t))
+        if follower:
+            note(**{f"{self.name}_coalesced": True})
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        with self._lock:
+            if key in self._tasks and self._tasks[key][1] is task:
+                del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved: every waiter may have gone away
+
+    def stats(self) -> dict:
+        total = self.leaders + self.coalesced
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0,
+            "in_flight": len(self._calls) + len(self._tasks),
+        }
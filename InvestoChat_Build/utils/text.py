@@ -17,6 +17,26 @@ def tokenize(text: str) -> Set[str]:
     return set(tokens)
 
 
+SAFE_CHARS = r"[^a-z0-9 ₹.%/-]+"
+_SAFE_CHARS_RE = re.compile(SAFE_CHARS)
+STOPWORDS = {"the","a","an","and","or","of","to","in","on","for","with","at","by","from",
+             "is","are","was","were","be","as","that","this","these","those"}
+
+
+def domain_tokens(text: str) -> List[str]:
+    """
+    Retrieval tokens in order, duplicates kept: lowercase, brochure-safe
+    characters only (₹ . % / - survive, so "3.5", "₹2.1cr" and "10%" stay
+    whole), stopwords dropped.
+    """
+    keep = []
+    for w in _SAFE_CHARS_RE.sub(" ", text.lower()).split():
+        if w in STOPWORDS:
+            continue
+        keep.append(w)
+    return keep
+
+
 def normalize(ctx: str) -> str:
     """
     Enhanced text normalization for RAG retrieval context.
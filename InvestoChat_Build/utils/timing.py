@@ -0,0 +1,86 @@
+"""
+Per-request stage timings.
+
+A request opens a collector with `collect()`; code anywhere below it wraps
+stages in `span("name")` and records flags/counts with `note(...)`. The
+collector travels in a contextvar, so it follows the request through
+awaits, tasks it creates and asyncio.to_thread, and nothing has to be passed
+down explicitly. Outside a collector, span() and note() cost one contextvar
+lookup and do nothing.
+
+    with collect() as timings:
+        result = rag(question)
+    timings.as_dict()
+    # {"total_ms": 812.4, "stages_ms": {"embed": 95.1, "vector_sql": 14.2, "mmr": 0.8, "chat": 690.3},
+    #  "query_cache": "miss", "candidates": 24, ...}
+
+Repeated stages add up (e.g. the trigram and ILIKE fallbacks both running).
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+
+class Timings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.notes: Dict[str, Any] = {}
+
+    def add(self, stage: str, ms: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + ms
+
+    def note(self, **values: Any) -> None:
+        self.notes.update(values)
+
+    def as_dict(self) -> dict:
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "stages_ms": {stage: round(ms, 1) for stage, ms in self.stages.items()},
+            **self.notes,
+        }
+
+
+_current: ContextVar[Optional[Timings]] = ContextVar("investochat_timings", default=None)
+
+
+def current() -> Optional[Timings]:
+    return _current.get()
+
+
+@contextmanager
+def collect() -> Iterator[Timings]:
+    """Start collecting timings for the enclosed work."""
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # Exited from another context (e.g. a streaming response generator)
+            _current.set(None)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time the enclosed block as `stage` in the active collector, if any."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(stage, (time.perf_counter() - start) * 1000)
+
+
+def note(**values: Any) -> None:
+    """Record flags / counts (cache hits, candidate counts) in the active collector, if any."""
+    timings = _current.get()
+    if timings is not None:
+        timings.note(**values)
@@ -0,0 +1,101 @@
+"""pgvector value helpers and psycopg binary adapter"""
+
+import struct
+from typing import Any, Optional, Sequence
+
+import numpy as np
+from psycopg.adapt import Dumper, Loader
+from psycopg.pq import Format
+from psycopg.types import TypeInfo
+
+# pgvector binary wire format: uint16 dim, uint16 unused, dim x float4 (big-endian)
+_HEADER = struct.Struct(">HH")
+_WIRE_DTYPE = np.dtype(">f4")
+
+
+def from_pgvector_binary(data: bytes) -> np.ndarray:
+    """Decode a pgvector value received in binary format into float32."""
+    dim, _ = _HEADER.unpack_from(data)
+    return np.frombuffer(data, dtype=_WIRE_DTYPE, count=dim, offset=_HEADER.size).astype(np.float32)
+
+
+def to_pgvector_binary(vec: Any) -> bytes:
+    """Encode a vector in pgvector's binary wire format (one buffer copy, no text)."""
+    arr = np.asarray(vec, dtype=_WIRE_DTYPE)
+    if arr.ndim != 1:
+        raise ValueError(f"expected a 1-d vector, got shape {arr.shape}")
+    return _HEADER.pack(arr.shape[0], 0) + arr.tobytes()
+
+
+def from_pgvector_text(data: bytes) -> np.ndarray:
+    """Decode pgvector text output ("[1,2,3]") into float32."""
+    return np.array(bytes(data).strip(b"[]").split(b","), dtype=np.float32)
+
+
+def as_vector(value: Any) -> np.ndarray:
+    """Coerce a fetched embedding (binary bytes or sequence) to a float32 array."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return from_pgvector_binary(bytes(value))
+    return np.asarray(value, dtype=np.float32)
+
+
+def to_vector(vec: Optional[Sequence[float]]) -> Optional[np.ndarray]:
+    """
+    Query/insert parameter for a vector column. NumPy arrays are sent by the
+    registered binary dumper; None passes through as SQL NULL.
+    """
+    if vec is None:
+        return None
+    return np.asarray(vec, dtype=np.float32)
+
+
+# -- psycopg adapters ----------------------------------------------------------
+class VectorBinaryDumper(Dumper):
+    """np.ndarray -> vector, binary format. Statements keep their %s::vector casts,
+    so the dumper also works where the vector oid was not looked up."""
+
+    format = Format.BINARY
+
+    def dump(self, obj: Any) -> bytes:
+        return to_pgvector_binary(obj)
+
+
+class VectorBinaryLoader(Loader):
+    format = Format.BINARY
+
+    def load(self, data) -> np.ndarray:
+        return from_pgvector_binary(bytes(data))
+
+
+class VectorTextLoader(Loader):
+    format = Format.TEXT
+
+    def load(self, data) -> np.ndarray:
+        return from_pgvector_text(data)
+
+
+def _register(context, info: Optional[TypeInfo]) -> bool:
+    adapters = context.adapters
+    if info is None:
+        # Extension not installed (yet): dump only, relying on the explicit casts
+        adapters.register_dumper(np.ndarray, VectorBinaryDumper)
+        return False
+    dumper = type("VectorBinaryDumper", (VectorBinaryDumper,), {"oid": info.oid})
+    adapters.register_dumper(np.ndarray, dumper)
+    adapters.register_loader(info.oid, VectorBinaryLoader)
+    adapters.register_loader(info.oid, VectorTextLoader)
+    return True
+
+
+def register_vector(con) -> bool:
+    """
+    Register the vector adapters on a psycopg connection: NumPy arrays are
+    sent in binary and vector columns come back as float32 arrays (binary or
+    text results). Returns False when the vector type does not exist.
+    """
+    return _register(con, TypeInfo.fetch(con, "vector"))
+
+
+async def aregister_vector(con) -> bool:
+    """Async variant of register_vector()."""
+    return _register(con, await TypeInfo.fetch(con, "vector"))